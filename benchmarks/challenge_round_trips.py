@@ -0,0 +1,168 @@
+"""Count MongoDB round trips and bytes per render of the peer challenge tabs.
+
+Seeds a scratch database with one learner's challenges, then renders the Attempt Challenge
+and Results tabs' data both the old way (one query per challenge) and through the
+challenge repository (one aggregation, and one read of the stored scoreboards), counting
+every command sent. The pending aggregation's query plan is explained too, and any
+collection scan is reported.
+
+Needs a MongoDB server (5.0+), given by $MONGODB_URI; the scratch database is dropped afterwards unless --keep is given.
+
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/challenge_round_trips.py --challenges 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import bson
+from pymongo import MongoClient, monitoring
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+URI = os.environ.get("MONGODB_URI", "mongodb://localhost:27017")
+
+
+def use_scratch_secrets(uri):
+    """Point the app's `db` module at the benchmark server through a throwaway secrets file, and skip its index build."""
+    workdir = tempfile.mkdtemp(prefix="challenge_bench_")
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+        f.write(f"MONGODB_URI = {uri!r}\nMONGO_ENSURE_INDEXES = false\n")
+    os.chdir(workdir)
+
+
+use_scratch_secrets(URI)
+
+from pages.modules.challenge_repo import ATTEMPTS, CHALLENGE_QUIZ, CHALLENGES, SCOREBOARD_FIELDS, pending_pipeline
+from pages.modules.indexes import ensure_indexes, explain_pipeline
+
+LEARNER = "learner"
+# Connection handshakes and session bookkeeping are not part of a render
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "endSessions"}
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = 0
+        self.reply_bytes = 0
+
+    def reset(self):
+        self.commands = 0
+        self.reply_bytes = 0
+
+    def started(self, event):
+        if event.command_name not in IGNORED_COMMANDS:
+            self.commands += 1
+
+    def succeeded(self, event):
+        if event.command_name not in IGNORED_COMMANDS:
+            self.reply_bytes += len(bson.encode(event.reply))
+
+    def failed(self, event):
+        pass
+
+
+def seed(db, challenges, questions):
+    quiz_data = [{
+        "scenario": "A scenario description long enough to be representative of a generated one. " * 3,
+        "questions": [{
+            "question": f"Question {i} about the scenario?",
+            "choices": [f"Choice {c}" for c in "ABCD"],
+            "answer": "Choice A",
+        } for i in range(questions)],
+    }]
+    quiz_ids = db[CHALLENGE_QUIZ].insert_many([
+        {"selected_topic": "Networking", "difficulty": "Medium", "created_at": datetime.now(),
+         "total_questions": questions, "quiz_data": quiz_data}
+        for _ in range(challenges)
+    ]).inserted_ids
+
+    challenge_docs, attempt_docs = [], []
+    for i, quiz_id in enumerate(quiz_ids):
+        opponent = f"player{i}"
+        completed = i % 2 == 0
+        challenge = {
+            "challenger": LEARNER if i % 4 < 2 else opponent,
+            "opponent": opponent if i % 4 < 2 else LEARNER,
+            "quiz_id": quiz_id,
+            "selected_topic": "Networking",
+            "difficulty": "Medium",
+            "status": "completed" if completed else "pending",
+            "completed_by": [LEARNER, opponent] if completed else [],
+            "created_at": datetime.now(),
+        }
+        if completed:
+            score = {"correct_answers_count": i % questions, "total_questions": questions}
+            challenge.update(challenger_score=score, opponent_score=score, winner=None, completed_at=datetime.now())
+        challenge_docs.append(challenge)
+        for player in ([LEARNER, opponent] if completed else []):
+            attempt_docs.append({"quiz_id": quiz_id, "attempted_by": player, "attempted_at": datetime.now(),
+                                 "answers": [], "correct_answers_count": i % questions, "total_questions": questions})
+    db[CHALLENGES].insert_many(challenge_docs)
+    if attempt_docs:
+        db[ATTEMPTS].insert_many(attempt_docs)
+    ensure_indexes(db, [CHALLENGES, ATTEMPTS])
+
+
+def involving(status):
+    return {"$or": [{"challenger": LEARNER}, {"opponent": LEARNER}], "status": status}
+
+
+def per_challenge_queries(db):
+    """The tabs' data as it used to be read: one query per challenge, or two on the Results tab."""
+    pending = [c for c in db[CHALLENGES].find(involving("pending")) if LEARNER not in c.get("completed_by", [])]
+    for challenge in pending:
+        db[CHALLENGE_QUIZ].find_one({"_id": challenge["quiz_id"]})
+    for challenge in db[CHALLENGES].find(involving("completed")):
+        db[CHALLENGE_QUIZ].find_one({"_id": challenge["quiz_id"]})
+        list(db[ATTEMPTS].find({"quiz_id": challenge["quiz_id"]}))
+
+
+def repository_reads(db):
+    """The tabs' data through the challenge repository: one query per tab."""
+    list(db[CHALLENGES].aggregate(pending_pipeline(LEARNER)))
+    list(db[CHALLENGES].find(involving("completed"), SCOREBOARD_FIELDS))
+
+
+def measure(name, render, db, counter, runs):
+    render(db)  # Warm up connections and caches
+    counter.reset()
+    started = time.perf_counter()
+    for _ in range(runs):
+        render(db)
+    elapsed = (time.perf_counter() - started) / runs
+    print(f"{name:<24} {counter.commands / runs:>12.0f} {counter.reply_bytes / runs / 1024:>12.1f} {elapsed * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default="aiquizzer_challenge_bench")
+    parser.add_argument("--challenges", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=15, help="questions per challenge quiz")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database")
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    client = MongoClient(URI, event_listeners=[counter])
+    client.drop_database(args.database)
+    db = client[args.database]
+    try:
+        seed(db, args.challenges, args.questions)
+        print(f"{args.challenges} challenges, {args.questions} questions each, mean of {args.runs} renders")
+        print(f"{'data access':<24} {'round trips':>12} {'reply KB':>12} {'ms':>10}")
+        measure("per-challenge queries", per_challenge_queries, db, counter, args.runs)
+        measure("challenge repository", repository_reads, db, counter, args.runs)
+
+        stages, lookup_scans = explain_pipeline(db, CHALLENGES, pending_pipeline(LEARNER))
+        scanned = "COLLSCAN" in stages or lookup_scans
+        print(f"{'COLLSCAN' if scanned else 'ok':<9} pending aggregation {' > '.join(stages)}  ($lookup collection scans: {lookup_scans})")
+    finally:
+        if not args.keep:
+            client.drop_database(args.database)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Measure the app's own overhead around MCQ and feedback generation.
+
+Runs the real chains against the offline LLM backend so provider latency is either zero
+(the default, isolating prompt formatting, parsing and limiter overhead) or a fixed,
+repeatable simulation.
+
+    LLM_BACKEND=fake python benchmarks/generation_overhead.py --runs 20
+    LLM_BACKEND=replay python benchmarks/generation_overhead.py --latency 0.8 --tokens-per-second 300
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def summarize(name, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{name:<28} mean {statistics.mean(samples) * 1000:8.2f} ms   p50 {statistics.median(samples) * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--topic", default="CYBER SECURITY")
+    parser.add_argument("--difficulty", default="medium")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated time to first token in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="simulated throughput (0 = unpaced)")
+    args = parser.parse_args()
+
+    # Settings must be in place before the generation modules read them at import time
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    os.environ.setdefault("DEDUP_ENABLED", "false")
+    os.environ["LLM_SIMULATED_LATENCY"] = str(args.latency)
+    os.environ["LLM_SIMULATED_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+
+    from pages.modules.generate_from_topic import request_mcqs_from_topic, stream_mcqs_from_topic
+    from pages.modules.feedback_generation import generate_feedback_from_results
+
+    print(f"backend={os.environ['LLM_BACKEND']} runs={args.runs} latency={args.latency}s tokens/s={args.tokens_per_second or 'unpaced'}")
+
+    invoke_samples, first_question_samples, stream_samples, feedback_samples = [], [], [], []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        request_mcqs_from_topic(args.topic, args.difficulty, coalesce=False)
+        invoke_samples.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        first_question = None
+        for kind, _ in stream_mcqs_from_topic(args.topic, args.difficulty):
+            if kind == "question" and first_question is None:
+                first_question = time.perf_counter() - started
+        stream_samples.append(time.perf_counter() - started)
+        first_question_samples.append(first_question)
+
+        started = time.perf_counter()
+        generate_feedback_from_results(args.topic, 14, 20, 14, 6, args.difficulty, "Moderate performance on hard questions")
+        feedback_samples.append(time.perf_counter() - started)
+
+    summarize("MCQ invoke", invoke_samples)
+    summarize("MCQ stream (first question)", first_question_samples)
+    summarize("MCQ stream (complete)", stream_samples)
+    summarize("Feedback invoke", feedback_samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Profile import time for the app's entry point and every page against an import-time budget.
+
+Each measurement runs in a fresh interpreter:
+  - main.py is timed cold, as on a Streamlit server start;
+  - each page is timed with main.py's imports already loaded, as on the first navigation to it.
+
+Only the imports at the top level of each script are timed, not the script body. The interpreters
+run with a throwaway secrets file pointing MongoDB at an unreachable address, so the real `db`
+module is imported but no query ever leaves the machine.
+
+    python benchmarks/import_profile.py --runs 5
+    python benchmarks/import_profile.py --budget-ms 1500 --top 8
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINT = "main.py"
+PAGES = [
+    "home.py",
+    "settings.py",
+    "pages/user/welcome.py",
+    "pages/user/adaptive.py",
+    "pages/user/scenario.py",
+    "pages/user/report.py",
+    "pages/user/challenge.py",
+    "pages/admin/dashboard.py",
+    "pages/admin/reports.py",
+    "pages/admin/admin.py",
+    "pages/admin/super_admin.py",
+]
+# Secrets used by the timed interpreters; nothing listens on this port
+SECRETS = 'MONGODB_URI = "mongodb://127.0.0.1:9/?serverSelectionTimeoutMS=100"\nGROQ_API_KEY = "unused"\n'
+
+_TIMER = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+for name in {preload!r}:
+    __import__(name)
+sys.stderr.write("-- timed imports --\\n")
+started = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+print("import seconds:", json.dumps(time.perf_counter() - started), flush=True)
+"""
+
+
+def script_imports(path):
+    """Modules imported at the top level of a script."""
+    with open(os.path.join(ROOT, path)) as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        modules.extend(name for name in names if name not in modules)
+    return modules
+
+
+def _run(code, workdir, *flags):
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=workdir, capture_output=True, text=True, check=True)
+
+
+def time_imports(modules, workdir, preload=(), runs=5):
+    """Median seconds to import `modules` in a fresh interpreter that has already imported `preload`."""
+    code = _TIMER.format(root=ROOT, preload=list(preload), modules=list(modules))
+    samples = []
+    for _ in range(runs):
+        output = _run(code, workdir).stdout
+        line = next(line for line in output.splitlines() if line.startswith("import seconds:"))
+        samples.append(json.loads(line.split(":", 1)[1]))
+    return statistics.median(samples)
+
+
+def heaviest_imports(modules, workdir, preload=(), top=5):
+    """The `top` imports with the largest cumulative time, from python -X importtime."""
+    code = _TIMER.format(root=ROOT, preload=list(preload), modules=list(modules))
+    stderr = _run(code, workdir, "-X", "importtime").stderr
+    _, _, timed = stderr.partition("-- timed imports --")
+    rows = []
+    for line in timed.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Top-level entries only; nested imports are already included in their parent's cumulative time
+        if not name[1:].startswith(" "):
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per target (the median is reported)")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if any target imports slower than this")
+    parser.add_argument("--top", type=int, default=0, help="list the N heaviest imports of each target")
+    args = parser.parse_args()
+
+    entry_imports = script_imports(ENTRY_POINT)
+    targets = [(ENTRY_POINT, entry_imports, [])] + [(page, script_imports(page), entry_imports) for page in PAGES]
+
+    workdir = tempfile.mkdtemp(prefix="import_profile_")
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+        f.write(SECRETS)
+
+    print(f"python {sys.version.split()[0]}, median of {args.runs} runs")
+    print(f"{'target':<28} {'mode':<16} {'import ms':>10}")
+    over_budget = []
+    for path, modules, preload in targets:
+        seconds = time_imports(modules, workdir, preload, args.runs)
+        mode = "cold start" if not preload else "first navigation"
+        flag = ""
+        if args.budget_ms is not None and seconds * 1000 > args.budget_ms:
+            over_budget.append(path)
+            flag = "  over budget"
+        print(f"{path:<28} {mode:<16} {seconds * 1000:>10.1f}{flag}")
+        for ms, name in heaviest_imports(modules, workdir, preload, args.top) if args.top else []:
+            print(f"{'':<30}{name:<40} {ms:>8.1f} ms")
+
+    if over_budget:
+        print(f"Over the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compare per-page MongoDB wall time with reads run one after another and through db.parallel_reads.
+
+Runs each page's read set, as the page issues it on a rerun, against the database configured in
+.streamlit/secrets.toml. Every read is read-only except the Results tab, which backfills the
+scoreboard of challenges completed before scores were stored (as viewing the page would).
+Run from the repository root:
+
+    python benchmarks/page_reads.py --username learner --runs 20
+    python benchmarks/page_reads.py --added-latency-ms 40   # model a remote cluster from a local server
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import READ_WORKERS, count_users, find_users, parallel_reads
+from pages.modules.challenge_repo import get_completed_challenges, get_opponent_names, get_pending_challenges
+
+
+def page_reads(username):
+    """Each page's independent reads, as built on a rerun of its first page."""
+    return {
+        "super_admin.py": {
+            "counts": count_users,
+            "pending": lambda: find_users(status="pending"),
+            "admins": lambda: find_users(role="Admin"),
+            "users": lambda: find_users(role="User"),
+        },
+        "admin.py": {
+            "counts": count_users,
+            "users": lambda: find_users(),
+        },
+        "challenge.py": {
+            "opponents": lambda: get_opponent_names(username),
+            "pending": lambda: get_pending_challenges(username),
+            "completed": lambda: get_completed_challenges(username),
+        },
+    }
+
+
+def with_latency(read, seconds):
+    def delayed():
+        time.sleep(seconds)
+        return read()
+    return delayed
+
+
+def median_ms(render, runs):
+    render()  # Warm up connections and the read pool
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        render()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--username", default="learner", help="learner whose challenges are read")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--added-latency-ms", type=float, default=0.0, help="fixed delay added to every read")
+    args = parser.parse_args()
+
+    print(f"median of {args.runs} renders, {READ_WORKERS} read workers, {args.added_latency_ms:.0f} ms added per read")
+    print(f"{'page':<18} {'reads':>6} {'sequential ms':>14} {'parallel ms':>12} {'speedup':>8}")
+    for page, reads in page_reads(args.username).items():
+        reads = {name: with_latency(read, args.added_latency_ms / 1000) for name, read in reads.items()}
+        sequential = median_ms(lambda: {name: read() for name, read in reads.items()}, args.runs)
+        parallel = median_ms(lambda: parallel_reads(**reads), args.runs)
+        print(f"{page:<18} {len(reads):>6} {sequential:>14.1f} {parallel:>12.1f} {sequential / parallel:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
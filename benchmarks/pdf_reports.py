@@ -0,0 +1,69 @@
+"""Check that PDF report generation runs in flat memory and never touches the temp directory.
+
+Generates reports back to back (optionally from several threads, like concurrent sessions)
+and prints peak RSS and the temp-dir file count at each checkpoint.
+
+    python benchmarks/pdf_reports.py --reports 10000 --threads 4
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FEEDBACK = {
+    "overall_performance": "Good: you answered 14 out of 20 questions correctly.",
+    "correct_vs_incorrect": {
+        "correct_count": "14",
+        "incorrect_count": "6",
+        "analysis": "Most of your incorrect answers came from hard level questions (2/6 correct) — review them.",
+    },
+    "areas_of_improvement": "You struggled with hard level questions. Consider revisiting this topic for better understanding.",
+    "topic_specific_feedback": "Revisit the core concepts of CYBER SECURITY and practise applying them to realistic scenarios.",
+    "next_steps": "Focus your revision on hard level questions, then retake the adaptive quiz.",
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def temp_file_count():
+    return len(os.listdir(tempfile.gettempdir()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--checkpoints", type=int, default=10)
+    args = parser.parse_args()
+
+    from pages.modules.pdf_export import generate_pdf_with_feedback_and_analytics
+
+    def render(i):
+        correct = i % 21
+        return len(generate_pdf_with_feedback_and_analytics({"total_correct": correct, "total_questions": 20}, FEEDBACK))
+
+    step = max(1, args.reports // args.checkpoints)
+    temp_before = temp_file_count()
+    started = time.perf_counter()
+    print(f"reports={args.reports} threads={args.threads}")
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        for done in range(0, args.reports, step):
+            sizes = list(executor.map(render, range(done, min(done + step, args.reports))))
+            elapsed = time.perf_counter() - started
+            print(
+                f"{done + len(sizes):>7} reports   {elapsed:7.1f}s   peak RSS {peak_rss_mb():7.1f} MB   "
+                f"temp files +{temp_file_count() - temp_before}   last PDF {sizes[-1] / 1024:.1f} KB"
+            )
+
+
+if __name__ == "__main__":
+    main()
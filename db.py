@@ -2,27 +2,126 @@ import streamlit as st
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 import bcrypt
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pages.modules.config import get_setting
+from pages.modules.indexes import ensure_indexes
+from pages.modules.metrics import MongoCommandMetrics
+
+# Apply the declared indexes at startup; turn off where they are managed with the CLI instead
+ENSURE_INDEXES = get_setting("MONGO_ENSURE_INDEXES", True, bool)
+# Threads shared by every session for a page's concurrent reads; 1 runs them one after another
+READ_WORKERS = get_setting("MONGO_READ_WORKERS", 8, int)
 
 
 # MongoDB connection setup
 @st.cache_resource
 def init_connection():
-    return MongoClient(st.secrets["MONGODB_URI"], server_api=ServerApi('1'))
+    return MongoClient(st.secrets["MONGODB_URI"], server_api=ServerApi('1'), event_listeners=[MongoCommandMetrics()])
 
 
 client = init_connection()
 db = client["user_database"]
 users_collection = db["users"]
 quiz_results_collection = db["quiz_results"]
+quiz_result_summaries_collection = db["quiz_result_summaries"]
 quiz_collection = db["quizzes"]
+question_bank_collection = db["question_bank"]
+question_fingerprints_collection = db["question_fingerprints"]
+profile_photos_collection = db["profile_photos"]
+
+# Declared indexes are applied off the import path, so the first page load never waits on them
+@st.cache_resource
+def start_index_creation():
+    thread = threading.Thread(target=ensure_indexes, args=(db,), name="ensure-indexes", daemon=True)
+    thread.start()
+    return thread
+
+if ENSURE_INDEXES:
+    start_index_creation()
+
+@st.cache_resource
+def _read_pool():
+    return ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="mongo-read")
+
+def parallel_reads(**reads):
+    """Run a page's independent reads concurrently and return {name: result}.
 
-quiz_results_collection.create_index([("quiz_started_at", 1)], expireAfterSeconds=86400)  # 86400 seconds = 24 hours
+    Each read is a zero-argument callable. The page waits for the slowest read rather than the
+    sum of all of them. Reads run off the script thread, so read session state before building
+    them, not inside them. The first read to fail re-raises its exception here.
+    """
+    if len(reads) < 2 or READ_WORKERS < 2:
+        return {name: read() for name, read in reads.items()}
+    pool = _read_pool()
+    futures = {name: pool.submit(read) for name, read in reads.items()}
+    return {name: future.result() for name, future in futures.items()}
 
-def get_users(role=None, status=None):
-    """Fetch users based on role (optional)"""
+# Fields shown in the admin user lists; password hashes and profile photos are never loaded
+USER_LIST_FIELDS = {"username": 1, "email": 1, "gender": 1, "role": 1, "status": 1, "created_at": 1}
+USER_PAGE_SIZE = get_setting("USER_PAGE_SIZE", 50, int)
+
+def get_users(role=None, status=None, fields=None):
+    """Fetch users based on role (optional), without password hashes or profile photos unless `fields` asks for them"""
+    projection = fields or {"password": 0, "profile_photo": 0}
     if role:
-        return list(users_collection.find({"role": role}))
+        return list(users_collection.find({"role": role}, projection))
     
     if status:
-        return list(users_collection.find({"status": status}))
-    return list(users_collection.find())
\ No newline at end of file
+        return list(users_collection.find({"status": status}, projection))
+    return list(users_collection.find({}, projection))
+
+def _user_query(role=None, status=None, search=None):
+    query = {}
+    if role is not None:
+        query["role"] = role
+    if status is not None:
+        query["status"] = status
+    if search:
+        # Anchored, case-sensitive prefix matches can use the username and email indexes
+        prefix = {"$regex": "^" + re.escape(search)}
+        query["$or"] = [{"username": prefix}, {"email": prefix}]
+    return query
+
+def find_users(role=None, status=None, search=None, after=None, limit=USER_PAGE_SIZE, fields=USER_LIST_FIELDS):
+    """Fetch one page of users ordered by username.
+
+    Returns (users, next_after); pass next_after back as `after` for the following page. It is None on the last page.
+    """
+    query = _user_query(role, status, search)
+    if after is not None:
+        query["username"] = {"$gt": after}
+    users = list(users_collection.find(query, fields).sort("username", 1).limit(limit + 1))
+    if len(users) > limit:
+        return users[:limit], users[limit - 1]["username"]
+    return users, None
+
+def count_users():
+    """Total users and counts per role and per status, in one round trip."""
+    pipeline = [
+        {"$project": {"role": 1, "status": 1}},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "roles": [{"$group": {"_id": "$role", "count": {"$sum": 1}}}],
+            "statuses": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+        }},
+    ]
+    result = next(users_collection.aggregate(pipeline), {})
+    total = result.get("total") or [{"count": 0}]
+    return {
+        "total": total[0]["count"],
+        "roles": {row["_id"]: row["count"] for row in result.get("roles", [])},
+        "statuses": {row["_id"]: row["count"] for row in result.get("statuses", [])},
+    }
+
+def review_admin_requests(user_ids, approve):
+    """Approve or decline pending admin requests with a single bulk write. Returns the number of users updated."""
+    now = datetime.now()
+    if approve:
+        update = {"role": "Admin", "status": "approved", "approved_at": now, "declined_at": None}
+    else:
+        update = {"role": "", "status": "declined", "declined_at": now, "approved_at": None}
+    result = users_collection.update_many({"_id": {"$in": list(user_ids)}, "status": "pending"}, {"$set": update})
+    return result.modified_count
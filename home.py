@@ -1,5 +1,6 @@
 import streamlit as st
-from streamlit_extras.row import row
+from pages.modules.metrics import track_page_rerun
+from pages.modules.photo_store import get_thumbnail
 
 
 # Function to handle logout logic
@@ -58,11 +59,14 @@ def home():
             # with st.container(border=True):
             # row2 = row([0.3,1], vertical_align="bottom")
             col1,col2 = st.columns([0.6,1])
-            col1.image(st.session_state["profile_photo"],use_container_width=True)
+            thumbnail = get_thumbnail(st.session_state.get("photo_id"))
+            if thumbnail:
+                col1.image(thumbnail, use_container_width=True)
             col2.write(f"**{st.session_state['username']}**")
             col2.write(f"**{st.session_state.role}**")
 
         # Display the pages based on the user's role
         if len(page_dict) > 0:
             pg = st.navigation({"Account": account_pages} | page_dict)
-            pg.run()
\ No newline at end of file
+            with track_page_rerun(pg.url_path or pg.title):
+                pg.run()
\ No newline at end of file
@@ -12,15 +12,29 @@ st.set_page_config(
 
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 from home import home
-from db import users_collection
+from db import quiz_results_collection, users_collection
+from pages.modules.metrics import start_metrics_server, track_page_rerun
+from pages.modules.chart_cache import prewarm_in_background
+from pages.modules.photo_store import default_photo_id, migrate_user_photo
+from pages.modules.write_behind import start_write_behind
+from pages.modules.feedback_worker import resume_replayed_result
 import bcrypt
 import os
-from bson import Binary
 
 
 
+# Serve Prometheus metrics alongside the Streamlit server (once per process)
+start_metrics_server()
+
+# Render the report charts for every possible score before the first report needs them
+prewarm_in_background()
+
+# Start flushing quiz submissions to MongoDB, replaying any a crashed process logged but never wrote
+start_write_behind(replay_hooks={quiz_results_collection.name: resume_replayed_result})
+
 # Initialize session state if not set
 if "role" not in st.session_state:
     st.session_state.role = None
@@ -39,8 +53,10 @@ def login():
     if st.button("Log in"):
         with st.spinner("Logging in..."):
             # Check if input is an email or username
+            # Inline legacy photos are not loaded here; migrate_user_photo fetches one only if it is needed
             user = users_collection.find_one(
-                {"$or": [{"username": login_input}, {"email": login_input}]}
+                {"$or": [{"username": login_input}, {"email": login_input}]},
+                {"profile_photo": 0}
             )
             
             if user and bcrypt.checkpw(password.encode('utf-8'), user["password"].encode('utf-8')):
@@ -49,7 +65,7 @@ def login():
                 st.session_state["username"] = user["username"]
                 st.session_state["email"] = user["email"]
                 st.session_state.role = user["role"]
-                st.session_state["profile_photo"] = user["profile_photo"]
+                st.session_state["photo_id"] = migrate_user_photo(user)
                 st.session_state["gender"] = user["gender"]
                 st.success("Login successful!")
                 st.session_state.layout = "wide"
@@ -58,18 +74,6 @@ def login():
                 st.error("Invalid username/email or password!")
 
 
-def generate_random_profile_photo(gender):
-    """Generate a random profile photo based on gender, store as binary data."""
-    
-    # Determine image file based on gender
-    image_path = "pages/images/man.png" if gender == "Male" else "pages/images/woman.png"
-    
-    # Read the image file as binary data
-    with open(image_path, "rb") as img_file:
-        image_binary = Binary(img_file.read())
-    
-    return image_binary
-
 def signup():
     """User Signup Page"""
     st.header("Signup Page")
@@ -97,13 +101,17 @@ def signup():
                 "gender": gender,
                 "role": role,
                 "password": hashed_password,
-                "profile_photo": generate_random_profile_photo(gender),
+                "photo_id": default_photo_id(gender),  # Stock avatars are stored once and shared
                 "created_at": datetime.now(),
                 "status": status
             }
 
-            users_collection.insert_one(user_data)
-            st.success("Signup successful! Please log in.")
+            try:
+                users_collection.insert_one(user_data)
+                st.success("Signup successful! Please log in.")
+            except DuplicateKeyError:
+                # A concurrent signup took the username or email after the check above
+                st.error("Username or Email already exists!")
             
             
 
@@ -114,6 +122,7 @@ st.logo("pages/images/horizontal_logo.png", icon_image="pages/images/quiz.png")
 if st.session_state.role is None or not st.session_state.logged_in:
     # If user is not logged in, show login/signup pages
     pg = st.navigation([st.Page(login), st.Page(signup)])  # Login and Signup are separate pages
-    pg.run()      
+    with track_page_rerun(pg.url_path or pg.title):
+        pg.run()      
 else:
     home()
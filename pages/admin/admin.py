@@ -1,17 +1,25 @@
 import streamlit as st
-from db import get_users
-import pandas as pd
+from db import count_users, parallel_reads
+from pages.modules.user_table import paged_user_table, user_page_loader
 
 
 """Admin Dashboard - View & Manage Users"""
 st.title("🔧 Admin Panel")
 
-# Fetch Users (Admins can only view, not approve)
-users = get_users()
-user_data = [{**user, "_id": str(user["_id"])} for user in users]
+search = st.text_input("Search by username or email prefix").strip()
+role = st.selectbox("Role", ["All", "User", "Admin"])
 
-# Display Users in a Table
+# Per-role counts come from one aggregation and the list is loaded a page at a time, both at once
+reads = parallel_reads(
+    counts=count_users,
+    users=user_page_loader("admin_users", role=None if role == "All" else role, search=search or None),
+)
+counts = reads["counts"]
+col1, col2, col3 = st.columns(3)
+col1.metric("Total Users", counts["total"])
+col2.metric("Admins", counts["roles"].get("Admin", 0))
+col3.metric("Learners", counts["roles"].get("User", 0))
+
+# Display Users in a Table (Admins can only view, not approve)
 st.subheader("📋 All Users")
-# st.table(user_data)
-user_data = pd.DataFrame(user_data)
-st.dataframe(user_data)
+paged_user_table("admin_users", reads["users"])
@@ -1,6 +1,7 @@
 import streamlit as st
 from db import db
 import json
+import sys
 import time
 from datetime import datetime
 
@@ -9,8 +10,14 @@ st.write("---")
 # MongoDB collection
 quiz_collection = db["quizzes"]  # Ensure this is correctly connected to your MongoDB instance
 
-# Import the generate_mcqs_from_topic function
-from pages.modules.generate_from_topic import generate_mcqs_from_topic  # Replace with the correct path
+# Import the question bank, which loads generate_mcqs_from_topic only on a miss
+from pages.modules.question_bank import get_scenario_set, get_bank_stats, get_pool_sizes
+from pages.modules.prefetch import get_prefetch_stats
+from pages.modules.feedback_worker import get_feedback_stats
+from pages.modules.feedback_cache import get_feedback_cache_stats
+from pages.modules.chart_cache import get_chart_cache_stats
+from pages.modules.quiz_catalog import get_catalog_options
+from pages.modules.write_behind import get_write_behind_stats
 
 # Initialize session state variables
 if "quiz_generated" not in st.session_state:
@@ -91,6 +98,7 @@ def display_mcqs(quiz_data, topic, difficulty):
                 }
                 result = quiz_collection.insert_one(quiz_entry)  # Insert into MongoDB
                 if result.inserted_id:
+                    get_catalog_options.clear()  # A new topic or difficulty shows up in the learners' filters straight away
                     st.toast("Quiz saved successfully!", icon="✅")  # Success toast
                     st.toast(f"Quiz saved successfully! ID: {result.inserted_id}")
                     time.sleep(5)
@@ -129,7 +137,7 @@ if not st.session_state.quiz_generated:
     if generate_button:
         if selected_topic and selected_difficulty:
             with st.spinner(f"Generating MCQs for '{selected_topic}' at '{selected_difficulty}' level. Please wait..."):
-                mcq_data = generate_mcqs_from_topic(selected_topic, difficulty=selected_difficulty)
+                mcq_data = get_scenario_set(selected_topic, difficulty=selected_difficulty)
 
             if mcq_data:
                 if isinstance(mcq_data, list):
@@ -150,3 +158,96 @@ if not st.session_state.quiz_generated:
 # Display the edit and save quiz form if a quiz has been generated
 if st.session_state.quiz_generated:
     display_mcqs(st.session_state.quiz_data, st.session_state.selected_topic, st.session_state.selected_difficulty)
+
+# Question bank health
+with st.expander("Question Bank", icon=":material/inventory_2:"):
+    bank_stats = get_bank_stats()
+    stat1, stat2, stat3, stat4 = st.columns(4)
+    stat1.metric("Hits", bank_stats["hits"])
+    stat2.metric("Misses", bank_stats["misses"])
+    stat3.metric("Hit Rate", f"{bank_stats['hit_rate']:.0%}")
+    stat4.metric("Pool Checks Queued", bank_stats["refill_queue"])
+
+    pool_sizes = get_pool_sizes()
+    if pool_sizes:
+        st.dataframe(pool_sizes, use_container_width=True)
+    else:
+        st.info("The question bank is empty. It fills up in the background as quizzes are requested.")
+
+# Adaptive quiz speculation
+with st.expander("Adaptive Quiz Prefetch", icon=":material/bolt:"):
+    prefetch_stats = get_prefetch_stats()
+    stat1, stat2, stat3, stat4 = st.columns(4)
+    stat1.metric("Speculation Hit Rate", f"{prefetch_stats['hit_rate']:.0%}")
+    stat2.metric("Ready On Submit", prefetch_stats["hits"])
+    stat3.metric("Still Generating On Submit", prefetch_stats["late_hits"])
+    stat4.metric("Avg Wait", f"{prefetch_stats['avg_wait_seconds']:.2f}s")
+    st.caption(f"{prefetch_stats['misses']} misses, {prefetch_stats['discarded']} discarded batches returned to the question bank.")
+
+# LLM question generation
+with st.expander("Question Generation", icon=":material/auto_awesome:"):
+    # Generation counters only exist once this process has generated something; checking first
+    # keeps the dashboard from loading the whole LLM stack just to show zeros
+    if "pages.modules.generate_from_topic" in sys.modules:
+        from pages.modules.generate_from_topic import get_stream_stats, get_coalescing_stats
+        from pages.modules.llm_service import get_limiter_stats
+        from pages.modules.output_repair import get_repair_stats
+        from pages.modules.dedup import get_dedup_stats
+        from pages.modules.fanout import get_fanout_stats
+        fanout_stats = get_fanout_stats()
+        st.caption(f"Multi-topic batches: {fanout_stats['batches']}, average {fanout_stats['avg_batch_seconds']:.2f}s versus {fanout_stats['avg_sequential_seconds']:.2f}s of per-topic generation run concurrently, {fanout_stats['topic_failures']} topic failures.")
+        stream_stats = get_stream_stats()
+        st.caption(f"Streamed generations: {stream_stats['streams']}, average time to first question {stream_stats['avg_first_question_seconds']:.2f}s.")
+        limiter_stats = get_limiter_stats()
+        st.caption(f"LLM requests in flight: {limiter_stats['in_flight']}/{limiter_stats['limit']}, waiting: {limiter_stats['waiting']}.")
+        coalescing_stats = get_coalescing_stats()
+        st.caption(f"Generation requests: {coalescing_stats['calls']}, LLM calls made: {coalescing_stats['executed']}, coalesced into an in-flight call: {coalescing_stats['coalesced']} ({coalescing_stats['coalesced_rate']:.0%}).")
+        repair_stats = get_repair_stats()
+        st.caption(f"LLM responses: {repair_stats['responses']}, clean: {repair_stats['clean']}, salvaged locally: {repair_stats['salvaged']} ({repair_stats['salvage_rate']:.0%} of damaged responses), failed: {repair_stats['failed']}. Top-up calls: {repair_stats['topup_calls']} ({repair_stats['topup_failures']} failed) for {repair_stats['questions_topped_up']} questions instead of {repair_stats['regenerations_saved']} full regenerations.")
+        dedup_stats = get_dedup_stats()
+        st.caption(f"Duplicate checks: {dedup_stats['checked']} questions, {dedup_stats['rejected']} near-duplicates rejected ({dedup_stats['rejection_rate']:.0%}), {dedup_stats['indexed']} fingerprints added, {dedup_stats['avg_check_ms']:.2f} ms per question, {dedup_stats['capped_rate']:.0%} of lookups hit the candidate limit.")
+    else:
+        st.info("No questions have been generated by this server process yet.")
+
+# Quiz feedback generated after submission
+with st.expander("Background Feedback", icon=":material/rate_review:"):
+    feedback_stats = get_feedback_stats()
+    stat1, stat2, stat3, stat4 = st.columns(4)
+    stat1.metric("Submitted", feedback_stats["submitted"])
+    stat2.metric("Completed", feedback_stats["completed"])
+    stat3.metric("Failed", feedback_stats["failed"])
+    stat4.metric("Avg Generation", f"{feedback_stats['avg_generation_seconds']:.1f}s")
+    st.caption(f"{feedback_stats['retries']} retries, {feedback_stats['resumed']} resumed after a restart.")
+
+# Submission log health
+with st.expander("Submission Write-Behind", icon=":material/save:"):
+    write_stats = get_write_behind_stats()
+    stat1, stat2, stat3, stat4 = st.columns(4)
+    stat1.metric("Logged", write_stats["logged"])
+    stat2.metric("Written", write_stats["flushed"])
+    stat3.metric("Waiting", write_stats["depth"])
+    stat4.metric("Avg Flush", f"{write_stats['avg_flush_seconds'] * 1000:.0f} ms")
+    st.caption(f"{write_stats['flushes']} batches, {write_stats['replayed']} replayed after a crash, {write_stats['flush_errors']} failed flushes, {write_stats['dead_lettered']} rejected documents dead-lettered.")
+
+# Cached LLM feedback
+with st.expander("Feedback Cache", icon=":material/cached:"):
+    cache_stats = get_feedback_cache_stats()
+    stat1, stat2, stat3, stat4 = st.columns(4)
+    stat1.metric("Hit Rate", f"{cache_stats['hit_ratio']:.0%}")
+    stat2.metric("Profiles Cached", cache_stats["size"])
+    stat3.metric("LLM Calls Made", cache_stats["llm_calls"])
+    stat4.metric("Saved Today", cache_stats["llm_calls_saved_today"])
+    st.caption(f"{cache_stats['hits']} hits out of {cache_stats['requests']} requests.")
+    if cache_stats['llm_calls_saved_per_day']:
+        saved_per_day = cache_stats['llm_calls_saved_per_day']
+        st.bar_chart({"day": list(saved_per_day), "LLM calls saved": list(saved_per_day.values())}, x="day", y="LLM calls saved")
+
+# Cached report charts
+with st.expander("Report Charts", icon=":material/bar_chart:"):
+    chart_stats = get_chart_cache_stats()
+    stat1, stat2, stat3, stat4 = st.columns(4)
+    stat1.metric("Requests", chart_stats["requests"])
+    stat2.metric("Hit Rate", f"{chart_stats['hit_ratio']:.0%}")
+    stat3.metric("Rendered", chart_stats["renders"])
+    stat4.metric("Cached In Memory", chart_stats["size"])
+    st.caption(f"{chart_stats['disk_hits']} served from disk.")
@@ -1,40 +1,73 @@
 import streamlit as st
-import base64
-
-# Function to convert image to base64 string
-def convert_to_base64(image_path):
-    with open(image_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode('utf-8')
-
-# Convert your work-in-progress image to base64
-work_in_progress_image_path = "pages/images/dark.png"  # Replace with your image path
-work_in_progress_base64 = convert_to_base64(work_in_progress_image_path)
-
-# Inject custom CSS to set the work in progress image as the background
-background_css = f"""
-    <style>
-        .stApp {{
-            background-image: url(data:image/png;base64,{work_in_progress_base64});
-            background-size: transparent;
-            background-position: center center;
-            background-repeat: no-repeat;
-            height: 100vh;
-            color: white;  /* Text color to be visible on the background */
-        }}
-        .stApp .block-container {{
-            background: rgba(0, 0, 0, 0);  /* Optional: Adds a semi-transparent overlay to the content */
-            padding: 50px;
-        }}
-    </style>
-"""
-st.markdown(background_css, unsafe_allow_html=True)
-
-# Add content with markdown text
-st.markdown("""
-# Work in Progress
-
-This page is currently under maintenance. Please check back later.
-
-We are working hard to improve the page. Thank you for your patience!
-
-""", unsafe_allow_html=True)
+import os
+import tempfile
+from datetime import datetime, time, timedelta
+from db import get_users
+from pages.modules.bulk_export import EXPORT_WORKERS, export_reports
+
+st.title("Admin Reports")
+st.write("---")
+
+# Remove the previous archive before building a new one, so exports never accumulate on disk
+def discard_previous_export():
+    path = st.session_state.pop("bulk_export_path", None)
+    if path and os.path.exists(path):
+        os.remove(path)
+
+# Build the archive on disk, updating a progress bar as each report is written
+def run_export(usernames, since, until, workers):
+    discard_previous_export()
+    progress_bar = st.progress(0.0, text="Starting report workers...")
+
+    def report_progress(done, total, elapsed):
+        rate = done / elapsed if elapsed else 0.0
+        progress_bar.progress(done / total if total else 1.0, text=f"{done}/{total} reports · {rate:.1f} reports/s")
+
+    with tempfile.NamedTemporaryFile(prefix="quiz_reports_", suffix=".zip", delete=False) as archive:
+        path = archive.name
+    try:
+        stats = export_reports(path, usernames, since, until, workers, report_progress)
+    except Exception:
+        os.remove(path)
+        raise
+    progress_bar.empty()
+    st.session_state.bulk_export_path = path
+    st.session_state.bulk_export_stats = stats
+
+def main():
+    st.subheader("Bulk PDF Export")
+    st.caption("Render a PDF report for every learner's quiz attempts into a single ZIP archive.")
+
+    users = [user["username"] for user in get_users(role="User", fields={"username": 1})]
+    today = datetime.now().date()
+    with st.form("bulk_export_form"):
+        selected_users = st.multiselect("Learners (leave empty for all)", users)
+        col1, col2 = st.columns(2)
+        since = col1.date_input("From", today - timedelta(days=90))
+        until = col2.date_input("To", today)
+        workers = st.slider("Rendering processes", 1, max(EXPORT_WORKERS, 1), EXPORT_WORKERS)
+        submitted = st.form_submit_button("Export reports", icon=":material/folder_zip:")
+
+    if submitted:
+        # The "To" date is inclusive
+        run_export(selected_users, datetime.combine(since, time.min), datetime.combine(until + timedelta(days=1), time.min), workers)
+
+    stats = st.session_state.get("bulk_export_stats")
+    path = st.session_state.get("bulk_export_path")
+    if stats and path and os.path.exists(path):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Reports", stats["reports"])
+        col2.metric("Failed", stats["failed"])
+        col3.metric("Throughput", f"{stats['reports_per_second']:.1f} reports/s")
+        if not stats["total"]:
+            st.info("No quiz attempts with feedback matched these filters.")
+        with open(path, "rb") as archive:
+            st.download_button(
+                "Download ZIP archive",
+                data=archive,
+                file_name=f"quiz_reports_{today:%Y%m%d}.zip",
+                mime="application/zip",
+                icon=":material/download:",
+            )
+
+main()
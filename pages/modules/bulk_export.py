@@ -0,0 +1,163 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+from pages.modules.config import get_setting
+from pages.modules.pdf_export import generate_pdf_with_feedback_and_analytics, track_performance_by_difficulty
+
+# Export settings, configurable through Streamlit secrets or environment variables
+EXPORT_WORKERS = get_setting("EXPORT_WORKERS", os.cpu_count() or 1, int)
+# Reports rendered or waiting to be written at once; bounds memory however many results are exported
+EXPORT_MAX_IN_FLIGHT = get_setting("EXPORT_MAX_IN_FLIGHT", 4 * EXPORT_WORKERS, int)
+EXPORT_BATCH_SIZE = get_setting("EXPORT_BATCH_SIZE", 200, int)
+
+# Only the fields a report needs are read from quiz_results
+_PROJECTION = {"username": 1, "total_correct": 1, "total_questions": 1, "results": 1, "feedback": 1, "quiz_started_at": 1}
+_UNSAFE_NAME_RE = re.compile(r"[^\w.-]+")
+
+
+def _render(job):
+    """Render one report in a worker process. Returns (arcname, pdf bytes or None, error)."""
+    arcname, quiz_results, feedback = job
+    try:
+        return arcname, generate_pdf_with_feedback_and_analytics(quiz_results, feedback), None
+    except Exception as e:
+        return arcname, None, f"{type(e).__name__}: {e}"
+
+
+def results_query(usernames=None, since=None, until=None):
+    """quiz_results filter for the attempts to export; only attempts with feedback can be rendered."""
+    query = {"feedback": {"$ne": None}}
+    if usernames:
+        query["username"] = {"$in": list(usernames)}
+    if since or until:
+        query["quiz_started_at"] = {}
+        if since:
+            query["quiz_started_at"]["$gte"] = since
+        if until:
+            query["quiz_started_at"]["$lt"] = until
+    return query
+
+
+def summaries_query(usernames=None, since=None, until=None):
+    """quiz_result_summaries filter for the compacted months an export reaches into."""
+    # Imported here: retention imports db, which spawned render workers must not load
+    from pages.modules.retention import month_of
+    query = {}
+    if usernames:
+        query["username"] = {"$in": list(usernames)}
+    if since or until:
+        query["month"] = {}
+        if since:
+            query["month"]["$gte"] = month_of(since)
+        if until:
+            query["month"]["$lte"] = month_of(until - timedelta(microseconds=1))
+    return query
+
+
+def _archived_results(summaries, since=None, until=None):
+    """Compacted attempts in the export's range, read from the Parquet archive one month at a time."""
+    from pages.modules.retention import read_parts
+    for summary in summaries:
+        for row in read_parts(summary["parts"]):
+            started_at = row["quiz_started_at"]
+            if row["feedback"] is None or (since and started_at < since) or (until and started_at >= until):
+                continue
+            yield row
+
+
+def _job(doc):
+    username = _UNSAFE_NAME_RE.sub("_", str(doc.get("username") or "unknown"))
+    started_at = doc.get("quiz_started_at")
+    stamp = started_at.strftime("%Y%m%d_%H%M%S") if isinstance(started_at, datetime) else "undated"
+    total_questions = doc.get("total_questions") or len(doc.get("results") or [])
+    quiz_results = {"total_correct": doc.get("total_correct", 0), "total_questions": total_questions}
+    if doc.get("results"):
+        quiz_results["difficulty_scores"] = track_performance_by_difficulty(doc["results"])
+    return f"{username}/{stamp}_{doc['_id']}.pdf", quiz_results, doc["feedback"]
+
+
+def export_reports(output, usernames=None, since=None, until=None, workers=None, progress=None):
+    """Render a PDF report for every matching quiz result into a ZIP archive written to `output`.
+
+    `output` is a path or a writable binary file. Results are streamed from a cursor and rendered
+    across a process pool; each PDF is written to the archive as soon as it is ready, so at most
+    EXPORT_MAX_IN_FLIGHT reports are held in memory. Attempts already compacted out of quiz_results
+    are read from the retention archive after the recent ones. `progress(done, total, elapsed)` is
+    called after every report; archived months count every attempt in them toward `total`, so it
+    can overstate a range that starts or ends mid-month. Returns the export counters, including
+    reports per second.
+    """
+    from db import quiz_result_summaries_collection, quiz_results_collection
+
+    workers = max(1, workers or EXPORT_WORKERS)
+    max_in_flight = max(workers, EXPORT_MAX_IN_FLIGHT)
+    query = results_query(usernames, since, until)
+    summaries = list(quiz_result_summaries_collection.find(summaries_query(usernames, since, until), {"attempts": 1, "parts": 1}))
+    total = quiz_results_collection.count_documents(query) + sum(summary["attempts"] for summary in summaries)
+    cursor = quiz_results_collection.find(query, _PROJECTION).batch_size(EXPORT_BATCH_SIZE)
+    docs = itertools.chain(cursor, _archived_results(summaries, since, until))
+
+    stats = {"total": total, "reports": 0, "failed": 0, "bytes": 0}
+    started = time.perf_counter()
+
+    def collect(futures):
+        for future in futures:
+            arcname, pdf, error = future.result()
+            if pdf is None:
+                stats["failed"] += 1
+                print(f"Report {arcname} failed: {error}")
+            else:
+                archive.writestr(arcname, pdf)
+                stats["reports"] += 1
+                stats["bytes"] += len(pdf)
+            if progress:
+                progress(stats["reports"] + stats["failed"], total, time.perf_counter() - started)
+
+    # Spawned workers do not inherit the Streamlit server's threads or the Mongo client
+    context = multiprocessing.get_context("spawn")
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archive, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = set()
+        for doc in docs:
+            pending.add(executor.submit(_render, _job(doc)))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    stats["total"] = stats["reports"] + stats["failed"]
+    stats["seconds"] = time.perf_counter() - started
+    stats["reports_per_second"] = stats["reports"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def _date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a PDF report for every quiz result into one ZIP archive.")
+    parser.add_argument("--output", default="quiz_reports.zip", help="ZIP file to write")
+    parser.add_argument("--users", nargs="+", help="usernames to export (default: all)")
+    parser.add_argument("--since", type=_date, help="first attempt date to include, YYYY-MM-DD")
+    parser.add_argument("--until", type=_date, help="attempt date to stop before, YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=EXPORT_WORKERS, help="rendering processes (default: one per core)")
+    args = parser.parse_args()
+
+    def report_progress(done, total, elapsed):
+        if done == total or done % 100 == 0:
+            print(f"{done}/{total} reports, {done / elapsed if elapsed else 0.0:.1f} reports/s")
+
+    result = export_reports(args.output, args.users, args.since, args.until, args.workers, report_progress)
+    print(
+        f"Wrote {result['reports']} reports ({result['failed']} failed) to {args.output} "
+        f"in {result['seconds']:.1f}s, {result['reports_per_second']:.1f} reports/s"
+    )
@@ -0,0 +1,148 @@
+from pymongo import ReturnDocument
+from db import db, users_collection
+
+# MongoDB collections
+CHALLENGE_QUIZ = "challenge_quiz"
+CHALLENGES = "challenges"
+ATTEMPTS = "challenge_attempts"
+challenge_quiz_collection = db[CHALLENGE_QUIZ]
+challenges_collection = db[CHALLENGES]
+attempts_collection = db[ATTEMPTS]
+
+# Quiz metadata shown on the challenge cards; quiz_data is only loaded once a challenge is attempted
+QUIZ_SUMMARY_FIELDS = {"selected_topic": 1, "difficulty": 1, "total_questions": 1, "created_at": 1}
+ATTEMPT_SCORE_FIELDS = {"_id": 0, "correct_answers_count": 1, "total_questions": 1}
+# The scoreboard is written onto the challenge when it completes, so results need no other collection
+SCOREBOARD_FIELDS = {
+    "challenger": 1, "opponent": 1, "quiz_id": 1, "selected_topic": 1, "difficulty": 1,
+    "challenger_score": 1, "opponent_score": 1, "winner": 1, "completed_at": 1, "scoreboard_backfilled": 1,
+}
+
+
+def _involving(username, status):
+    # Each $or branch is answered by its (player, status) index
+    return {"$or": [{"challenger": username}, {"opponent": username}], "status": status}
+
+
+def _quiz_lookup():
+    return {"$lookup": {
+        "from": CHALLENGE_QUIZ,
+        "localField": "quiz_id",
+        "foreignField": "_id",
+        "pipeline": [{"$project": QUIZ_SUMMARY_FIELDS}],
+        "as": "quiz",
+    }}
+
+
+def pending_pipeline(username):
+    """Pending challenges the user has not finished yet, each with its quiz summary."""
+    match = _involving(username, "pending")
+    match["completed_by"] = {"$ne": username}
+    return [
+        {"$match": match},
+        _quiz_lookup(),
+        # Challenges whose quiz is missing are skipped, as before
+        {"$unwind": "$quiz"},
+    ]
+
+
+def get_pending_challenges(username):
+    """One round trip for the Attempt Challenge tab (MongoDB 5.0+ for $lookup with localField and pipeline)."""
+    return list(challenges_collection.aggregate(pending_pipeline(username)))
+
+
+def _score(attempt):
+    return {field: attempt.get(field, 0) for field in ("correct_answers_count", "total_questions")}
+
+
+def _winner(challenge):
+    # None for a tie
+    challenger_score = challenge["challenger_score"]["correct_answers_count"]
+    opponent_score = challenge["opponent_score"]["correct_answers_count"]
+    if challenger_score == opponent_score:
+        return None
+    return challenge["challenger"] if challenger_score > opponent_score else challenge["opponent"]
+
+
+def completion_update(username, correct_answers, total_questions):
+    """Update pipeline that records a player's score and completes the challenge once both players have one."""
+    score = {"correct_answers_count": correct_answers, "total_questions": total_questions}
+    player = {"$literal": username}  # Never read as a field path, whatever the username
+
+    def first_score(role):
+        # A player's first attempt counts; a later resubmission keeps the stored score
+        return {"$cond": [{"$eq": [f"${role}", player]}, {"$ifNull": [f"${role}_score", {"$literal": score}]}, f"${role}_score"]}
+
+    both_done = {"$and": [{"$in": ["$challenger", "$completed_by"]}, {"$in": ["$opponent", "$completed_by"]}]}
+    # A player who finished before scores were stored has none; get_completed_challenges backfills the winner
+    both_scored = {"$and": [both_done] + [{"$ne": [{"$ifNull": [f"${role}_score", None]}, None]} for role in ("challenger", "opponent")]}
+    challenger_correct = "$challenger_score.correct_answers_count"
+    opponent_correct = "$opponent_score.correct_answers_count"
+    return [
+        {"$set": {
+            # $addToSet semantics for completed_by inside an update pipeline
+            "completed_by": {"$setUnion": [{"$ifNull": ["$completed_by", []]}, {"$literal": [username]}]},
+            "challenger_score": first_score("challenger"),
+            "opponent_score": first_score("opponent"),
+        }},
+        {"$set": {
+            "status": {"$cond": [both_done, "completed", "$status"]},
+            "completed_at": {"$cond": [both_done, {"$ifNull": ["$completed_at", "$$NOW"]}, "$$REMOVE"]},
+            "winner": {"$cond": [both_scored, {"$switch": {
+                "branches": [
+                    {"case": {"$gt": [challenger_correct, opponent_correct]}, "then": "$challenger"},
+                    {"case": {"$lt": [challenger_correct, opponent_correct]}, "then": "$opponent"},
+                ],
+                "default": None,
+            }}, "$$REMOVE"]},
+        }},
+    ]
+
+
+def record_challenge_completion(quiz_id, username, correct_answers, total_questions):
+    """Atomically add a player's result to their challenge. Returns the updated challenge, or None if there is none.
+
+    Simultaneous submissions are applied one after the other, so the later one always sees the earlier
+    result and completes the challenge.
+    """
+    return challenges_collection.find_one_and_update(
+        {"quiz_id": quiz_id},
+        completion_update(username, correct_answers, total_questions),
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _backfill_scoreboard(challenge):
+    """Write scores, winner and topic onto a challenge completed before they were stored on it."""
+    quiz = challenge_quiz_collection.find_one({"_id": challenge["quiz_id"]}, {"selected_topic": 1, "difficulty": 1}) or {}
+    update = {"selected_topic": quiz.get("selected_topic"), "difficulty": quiz.get("difficulty")}
+    for role in ("challenger", "opponent"):
+        attempt = attempts_collection.find_one({"quiz_id": challenge["quiz_id"], "attempted_by": challenge[role]}, ATTEMPT_SCORE_FIELDS)
+        if attempt:
+            update[f"{role}_score"] = _score(attempt)
+    challenge.update(update)
+    # Incomplete results stay without a winner; their missing attempt predates the scoreboard, so they are
+    # marked as backfilled rather than looked up again on every visit
+    if "challenger_score" in challenge and "opponent_score" in challenge:
+        update["winner"] = challenge["winner"] = _winner(challenge)
+    update["scoreboard_backfilled"] = True
+    challenges_collection.update_one({"_id": challenge["_id"]}, {"$set": update})
+
+
+def get_completed_challenges(username):
+    """Completed challenges with their stored topic, scores and winner, from one indexed read."""
+    challenges = list(challenges_collection.find(_involving(username, "completed"), SCOREBOARD_FIELDS))
+    for challenge in challenges:
+        if "winner" not in challenge and not challenge.get("scoreboard_backfilled"):
+            _backfill_scoreboard(challenge)
+    return challenges
+
+
+def get_opponent_names(username):
+    """Usernames the user can challenge."""
+    return [user["username"] for user in users_collection.find({"username": {"$ne": username}}, {"_id": 0, "username": 1})]
+
+
+def load_challenge_quiz(quiz_id):
+    """The full quiz, questions included, for a challenge being attempted."""
+    return challenge_quiz_collection.find_one({"_id": quiz_id})
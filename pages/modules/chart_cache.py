@@ -0,0 +1,187 @@
+import io
+import os
+import tempfile
+import threading
+from cachetools import LRUCache
+from pages.modules.config import get_setting
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+# Cache settings, configurable through Streamlit secrets or environment variables
+CHART_CACHE_SIZE = get_setting("CHART_CACHE_SIZE", 1024, int)
+# Directory for rendered charts shared across processes and restarts; empty disables the disk cache
+CHART_CACHE_DIR = get_setting("CHART_CACHE_DIR", "")
+# Width, in percentage points, of the accuracy buckets the per-difficulty chart is drawn from
+CHART_ACCURACY_BUCKET = get_setting("CHART_ACCURACY_BUCKET", 10, int)
+CHART_PREWARM = get_setting("CHART_PREWARM", True, bool)
+# Pie charts are pre-rendered for every score out of 0..CHART_PREWARM_MAX_QUESTIONS questions
+CHART_PREWARM_MAX_QUESTIONS = get_setting("CHART_PREWARM_MAX_QUESTIONS", 20, int)
+
+# Rendered PNGs are small (~12 KB), so the default bound is roughly 12 MB
+_cache = LRUCache(maxsize=CHART_CACHE_SIZE)
+_cache_lock = threading.Lock()
+_prewarm_lock = threading.Lock()
+_prewarm_started = False
+
+_stats = {"requests": 0, "memory_hits": 0, "disk_hits": 0, "renders": 0, "prewarmed": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _figure(width, height):
+    # matplotlib is only imported once a chart actually has to be rendered
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(width, height))
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _png(fig):
+    # Flattened to RGB: the PDF writer embeds an opaque PNG without splitting out an alpha mask
+    from PIL import Image
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", facecolor="white")
+    buffer.seek(0)
+    flattened = io.BytesIO()
+    Image.open(buffer).convert("RGB").save(flattened, format="PNG")
+    return flattened.getvalue()
+
+
+def render_pie_chart(correct_count, incorrect_count):
+    """Draw the correct vs incorrect pie chart as PNG bytes, on a standalone Agg figure."""
+    fig = _figure(3, 3)
+    ax = fig.add_subplot()
+    labels = ['Correct', 'Incorrect']
+    sizes = [correct_count, incorrect_count]
+    colors = ['green', 'red']
+    if correct_count or incorrect_count:
+        ax.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90, shadow=True)
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+    return _png(fig)
+
+
+def render_difficulty_chart(buckets):
+    """Draw per-difficulty accuracy bars from bucketed percentages (None for levels not attempted)."""
+    fig = _figure(4, 2.5)
+    ax = fig.add_subplot()
+    values = [bucket or 0 for bucket in buckets]
+    colors = ['green' if value >= 80 else 'orange' if value >= 50 else 'red' for value in values]
+    bars = ax.bar([level.capitalize() for level in DIFFICULTIES], values, color=colors)
+    for bar, bucket in zip(bars, buckets):
+        label = "n/a" if bucket is None else f"{bucket}%+"
+        ax.annotate(label, (bar.get_x() + bar.get_width() / 2, bar.get_height()), ha="center", va="bottom", fontsize=8)
+    ax.set_ylim(0, 110)
+    ax.set_ylabel("Accuracy (%)")
+    fig.tight_layout()
+    return _png(fig)
+
+
+def _disk_path(key):
+    return os.path.join(CHART_CACHE_DIR, "_".join(str(part) for part in key) + ".png")
+
+
+def _read_disk(key):
+    if not CHART_CACHE_DIR:
+        return None
+    try:
+        with open(_disk_path(key), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_disk(key, png):
+    if not CHART_CACHE_DIR:
+        return
+    try:
+        os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+        # Written under a temporary name and renamed, so concurrent processes never read half a file
+        fd, temp_path = tempfile.mkstemp(dir=CHART_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(png)
+        os.replace(temp_path, _disk_path(key))
+    except OSError as e:
+        print(f"Chart cache write skipped: {e}")
+
+
+def _cached(key, render, *args):
+    _count("requests")
+    with _cache_lock:
+        png = _cache.get(key)
+    if png is not None:
+        _count("memory_hits")
+        return png
+
+    png = _read_disk(key)
+    if png is not None:
+        _count("disk_hits")
+    else:
+        _count("renders")
+        png = render(*args)
+        _write_disk(key, png)
+    with _cache_lock:
+        _cache[key] = png
+    return png
+
+
+def pie_chart(correct_count, incorrect_count):
+    """PNG bytes of the correct vs incorrect pie chart, rendered once per distinct pair."""
+    return _cached(("pie", correct_count, incorrect_count), render_pie_chart, correct_count, incorrect_count)
+
+
+def accuracy_bucket(correct, total, size=None):
+    """Accuracy as a bucketed percentage (100% shares the top bucket), or None if nothing was attempted."""
+    if not total:
+        return None
+    size = size or CHART_ACCURACY_BUCKET
+    top = (100 - 1) // size * size
+    return min(int(correct / total * 100) // size * size, top)
+
+
+def difficulty_chart(difficulty_scores):
+    """PNG bytes of the per-difficulty accuracy chart, rendered once per distinct set of buckets."""
+    buckets = tuple(
+        accuracy_bucket(difficulty_scores.get(level, {}).get("correct", 0), difficulty_scores.get(level, {}).get("total", 0))
+        for level in DIFFICULTIES
+    )
+    return _cached(("difficulty", CHART_ACCURACY_BUCKET) + buckets, render_difficulty_chart, buckets)
+
+
+def prewarm(max_questions=None):
+    """Render the pie chart for every score out of 0..max_questions questions. Returns the charts warmed."""
+    max_questions = CHART_PREWARM_MAX_QUESTIONS if max_questions is None else max_questions
+    warmed = 0
+    for total in range(max_questions + 1):
+        for correct in range(total + 1):
+            pie_chart(correct, total - correct)
+            warmed += 1
+    _count("prewarmed", warmed)
+    return warmed
+
+
+def prewarm_in_background():
+    """Start pre-warming on a daemon thread, once per process."""
+    global _prewarm_started
+    if not CHART_PREWARM:
+        return
+    with _prewarm_lock:
+        if _prewarm_started:
+            return
+        _prewarm_started = True
+    threading.Thread(target=prewarm, name="chart-prewarm", daemon=True).start()
+
+
+def get_chart_cache_stats():
+    """Chart cache counters for this process."""
+    with _stats_lock:
+        stats = dict(_stats)
+    with _cache_lock:
+        stats["size"] = len(_cache)
+    hits = stats["memory_hits"] + stats["disk_hits"]
+    stats["hit_ratio"] = hits / stats["requests"] if stats["requests"] else 0.0
+    return stats
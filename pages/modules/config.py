@@ -0,0 +1,30 @@
+import os
+import streamlit as st
+
+
+def get_setting(name, default=None, cast=None):
+    """Read a setting from Streamlit secrets, falling back to environment variables and then the default."""
+    value = None
+
+    # Streamlit secrets take precedence, mirroring how API keys are configured
+    try:
+        if name in st.secrets:
+            value = st.secrets[name]
+    except FileNotFoundError:
+        # No secrets.toml available (e.g. CLI scripts or background jobs)
+        value = None
+
+    if value is None:
+        value = os.environ.get(name)
+
+    if value is None:
+        return default
+
+    if cast is bool and isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if cast is not None:
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            return default
+    return value
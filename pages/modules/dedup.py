@@ -0,0 +1,272 @@
+import argparse
+import hashlib
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+import numpy as np
+from bson.binary import Binary
+from pymongo import UpdateOne
+from pages.modules.config import get_setting
+
+# Detection settings, configurable through Streamlit secrets or environment variables
+DEDUP_ENABLED = get_setting("DEDUP_ENABLED", True, bool)
+DEDUP_THRESHOLD = get_setting("DEDUP_THRESHOLD", 0.8, float)
+CANDIDATE_LIMIT = get_setting("DEDUP_CANDIDATE_LIMIT", 500, int)
+
+# MinHash signature layout: BANDS x ROWS permutations. Two texts become LSH candidates when any
+# band matches, which happens with probability 1 - (1 - s**ROWS)**BANDS for Jaccard similarity s
+# (about 0.9998 at 0.8 and 0.64 at 0.5); candidates are then verified against the full signature.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+# Fixed seed so fingerprints stay comparable across processes and deployments
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_rng = np.random.RandomState(20250301)
+_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+# Option labels and anything that is not a letter, digit or space
+_LABEL_RE = re.compile(r"^\s*\(?[a-dA-D]\s*[\).:]\s*")
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Sources walked by the bulk backfill: collection -> how to pull question and scenario texts out of a document
+BACKFILL_SOURCES = {
+    "quizzes": {"mcqs.question": 1, "quiz_data.scenario": 1, "quiz_data.questions.question": 1},
+    "challenge_quiz": {"quiz_data.scenario": 1, "quiz_data.questions.question": 1},
+    "quiz_results": {"results.question": 1},
+    "question_bank": {"scenario_set.scenario": 1, "scenario_set.questions.question": 1},
+}
+
+_stats = {"checked": 0, "rejected": 0, "indexed": 0, "check_seconds": 0.0, "errors": 0, "lookups": 0, "capped": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _collection():
+    # Imported on first use so offline tools (benchmarks, the fake backend) never open a Mongo connection
+    from db import question_fingerprints_collection
+    return question_fingerprints_collection
+
+
+def normalize_text(text):
+    """Lowercase, drop option labels and punctuation, and collapse whitespace."""
+    text = _LABEL_RE.sub("", str(text or ""))
+    text = _PUNCTUATION_RE.sub(" ", text.lower())
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def _shingle_hashes(normalized):
+    if len(normalized) <= SHINGLE_SIZE:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def minhash(normalized):
+    """MinHash signature (NUM_PERM uint32 values) of a normalized text's character shingles."""
+    hashes = _shingle_hashes(normalized)
+    permuted = ((hashes[:, None] * _A + _B) % _MERSENNE_PRIME) & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def band_keys(signature):
+    """One signed 64-bit bucket key per LSH band, small enough for a compact multikey index."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS].tobytes()
+        digest = hashlib.blake2b(bytes([band]) + rows, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def fingerprint(text):
+    """Return (key, signature, bands) for a text, or None if nothing is left after normalization."""
+    normalized = normalize_text(text)
+    if not normalized:
+        return None
+    signature = minhash(normalized)
+    key = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+    return key, signature, band_keys(signature)
+
+
+def _signature(doc):
+    return np.frombuffer(doc["signature"], dtype="<u4")
+
+
+def candidate_pipeline(kind, bands):
+    """Fingerprints sharing any of `bands`, most shared bands first, capped at CANDIDATE_LIMIT.
+
+    Near-duplicates share most of their bands while chance collisions share one, so ranking on
+    the server keeps the likely matches when common bands hold more than the cap.
+    """
+    return [
+        {"$match": {"kind": kind, "bands": {"$in": bands}}},
+        {"$project": {"signature": 1, "shared": {"$size": {"$filter": {"input": "$bands", "cond": {"$in": ["$$this", bands]}}}}}},
+        {"$sort": {"shared": -1}},
+        {"$limit": CANDIDATE_LIMIT},
+    ]
+
+
+def find_near_duplicates(texts, kind="question", existing=()):
+    """Return a list of booleans marking which texts are near-duplicates of indexed texts or of each other.
+
+    `existing` texts (already accepted alongside these) are compared against but not reported.
+    All texts are looked up with a single indexed aggregation on their LSH bands. Lookups fail open:
+    if the store is unreachable nothing is reported as a duplicate.
+    """
+    started = time.perf_counter()
+    prints = [fingerprint(text) for text in texts]
+    duplicates = [False] * len(texts)
+    if not DEDUP_ENABLED or not any(prints):
+        return duplicates
+
+    bands = sorted({band for fp in prints if fp for band in fp[2]})
+    try:
+        candidates = list(_collection().aggregate(candidate_pipeline(kind, bands)))
+    except Exception as e:
+        print(f"Duplicate check skipped: {e}")
+        _count("errors")
+        return duplicates
+
+    _count("lookups")
+    if len(candidates) >= CANDIDATE_LIMIT:
+        # Only the matches sharing the fewest bands were cut, but a high rate means the cap is too low
+        _count("capped")
+
+    pool = [_signature(doc) for doc in candidates]
+    pool += [fp[1] for fp in map(fingerprint, existing) if fp]
+    for i, fp in enumerate(prints):
+        if fp is None:
+            continue
+        if pool and (np.stack(pool) == fp[1]).mean(axis=1).max() >= DEDUP_THRESHOLD:
+            duplicates[i] = True
+        else:
+            pool.append(fp[1])
+
+    _count("checked", len(texts))
+    _count("rejected", sum(duplicates))
+    _count("check_seconds", time.perf_counter() - started)
+    return duplicates
+
+
+def split_duplicates(questions, existing=()):
+    """Split questions into (fresh, rejected), comparing against the index, each other and `existing` questions."""
+    flags = find_near_duplicates([question["question"] for question in questions], existing=[question["question"] for question in existing])
+    fresh = [question for question, duplicate in zip(questions, flags) if not duplicate]
+    rejected = [question for question, duplicate in zip(questions, flags) if duplicate]
+    return fresh, rejected
+
+
+def _index_operations(texts, kind, source):
+    now = datetime.now()
+    operations = []
+    for text in texts:
+        fp = fingerprint(text)
+        if fp is None:
+            continue
+        key, signature, bands = fp
+        operations.append(UpdateOne({"_id": key}, {"$setOnInsert": {
+            "kind": kind,
+            "text": str(text),
+            "signature": Binary(signature.astype("<u4").tobytes()),
+            "bands": bands,
+            "source": source,
+            "created_at": now,
+        }}, upsert=True))
+    return operations
+
+
+def index_texts(texts, kind="question", source=None):
+    """Add texts to the fingerprint index; re-indexing the same text is a no-op."""
+    if not DEDUP_ENABLED:
+        return 0
+    operations = _index_operations(texts, kind, source or {})
+    if not operations:
+        return 0
+    try:
+        result = _collection().bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f"Fingerprint indexing skipped: {e}")
+        _count("errors")
+        return 0
+    _count("indexed", result.upserted_count)
+    return result.upserted_count
+
+
+def index_scenario_set(scenario_set, source=None):
+    """Index every scenario and question of a generated scenario set."""
+    index_texts([scenario.get("scenario", "") for scenario in scenario_set], "scenario", source)
+    return index_texts([question["question"] for scenario in scenario_set for question in scenario.get("questions", [])], "question", source)
+
+
+def get_dedup_stats():
+    """Duplicate check counters for this process."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["rejection_rate"] = stats["rejected"] / stats["checked"] if stats["checked"] else 0.0
+    stats["avg_check_ms"] = 1000 * stats["check_seconds"] / stats["checked"] if stats["checked"] else 0.0
+    stats["capped_rate"] = stats["capped"] / stats["lookups"] if stats["lookups"] else 0.0
+    return stats
+
+
+def _extract_texts(value, path):
+    """Walk a dotted projection path through nested lists and dicts, yielding the strings at its end."""
+    if isinstance(value, list):
+        for item in value:
+            yield from _extract_texts(item, path)
+        return
+    if not path:
+        if isinstance(value, str) and value.strip():
+            yield value
+        return
+    if isinstance(value, dict):
+        head, _, rest = path.partition(".")
+        yield from _extract_texts(value.get(head), rest)
+
+
+def backfill(collections=None, batch_size=1000):
+    """Fingerprint every scenario and question already stored in the given collections."""
+    from db import db
+    fingerprints = _collection()
+    totals = {}
+
+    for name in collections or BACKFILL_SOURCES:
+        projection = BACKFILL_SOURCES[name]
+        operations = []
+        scanned = added = 0
+        started = time.perf_counter()
+
+        for doc in db[name].find({}, projection).batch_size(batch_size):
+            scanned += 1
+            source = {"collection": name, "id": doc["_id"]}
+            for path in projection:
+                kind = "scenario" if path.endswith("scenario") else "question"
+                operations.extend(_index_operations(_extract_texts(doc, path), kind, source))
+            if len(operations) >= batch_size:
+                added += fingerprints.bulk_write(operations, ordered=False).upserted_count
+                operations = []
+
+        if operations:
+            added += fingerprints.bulk_write(operations, ordered=False).upserted_count
+        totals[name] = added
+        print(f"{name}: scanned {scanned} documents, added {added} fingerprints in {time.perf_counter() - started:.1f}s")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the near-duplicate question index from existing collections.")
+    parser.add_argument("--collections", nargs="+", choices=sorted(BACKFILL_SOURCES), help="collections to scan (default: all)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="documents per cursor batch and fingerprints per bulk write")
+    args = parser.parse_args()
+    backfill(args.collections, args.batch_size)
@@ -0,0 +1,178 @@
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pages.modules.config import get_setting
+from pages.modules.generate_from_topic import EXPECTED_QUESTIONS, request_mcqs_from_topic, stream_mcqs_from_topic
+from pages.modules.quiz_format import scenario_set_events
+
+# Multi-topic batches are generated one topic per call, concurrently, then merged
+FANOUT_ENABLED = get_setting("FANOUT_ENABLED", True, bool)
+FANOUT_WORKERS = get_setting("FANOUT_WORKERS", 8, int)
+
+# Shared across all sessions in this Streamlit process; LLM calls are still bounded by the LLM limiter
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+
+_stats = {"batches": 0, "topic_calls": 0, "topic_failures": 0, "batch_seconds": 0.0, "topic_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+def _record(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _topic_list(topic):
+    return list(topic) if isinstance(topic, (list, tuple, set)) else [topic]
+
+
+def uses_fanout(topic):
+    """Whether a topic selection is generated per topic rather than as one combined prompt."""
+    return FANOUT_ENABLED and len(_topic_list(topic)) > 1
+
+
+def allocate_questions(topics, batch_size=EXPECTED_QUESTIONS, offset=None):
+    """Split a batch's questions across topics as evenly as possible.
+
+    Every topic gets at least one question while batch_size allows. The leftover questions start
+    at `offset` (random by default), so no topic is favoured over the course of a quiz.
+    """
+    topics = _topic_list(topics)
+    if offset is None:
+        offset = random.randrange(len(topics))
+    base, extra = divmod(batch_size, len(topics))
+    allocation = {topic: base for topic in topics}
+    for i in range(extra):
+        allocation[topics[(offset + i) % len(topics)]] += 1
+    return {topic: count for topic, count in allocation.items() if count}
+
+
+def _generate_topic(topic, difficulty, count, coalesce):
+    """One topic's share of the batch, retried once so a single bad response does not cost the topic its coverage."""
+    started = time.perf_counter()
+    try:
+        for attempt in range(2):
+            try:
+                _record("topic_calls")
+                return request_mcqs_from_topic(topic, difficulty, coalesce=coalesce, count=count)
+            except Exception as e:
+                _record("topic_failures")
+                print(f"Fan-out generation failed for {topic} ({difficulty}), attempt {attempt + 1}: {e}")
+                if attempt:
+                    raise
+    finally:
+        _record("topic_seconds", time.perf_counter() - started)
+
+
+def _trim(scenario_set, count):
+    """Keep at most `count` questions, in order, dropping scenarios left without any."""
+    trimmed = []
+    for scenario in scenario_set:
+        questions = scenario.get("questions", [])[:count]
+        count -= len(questions)
+        if questions:
+            trimmed.append(dict(scenario, questions=questions))
+    return trimmed
+
+
+def request_fanout_batch(topics, difficulty, coalesce=True, batch_size=EXPECTED_QUESTIONS):
+    """Generate each topic's share of the batch concurrently and merge them, one scenario per topic.
+
+    Latency is that of the slowest single-topic call. Raises only if every topic failed.
+    """
+    started = time.perf_counter()
+    allocation = allocate_questions(topics, batch_size)
+    futures = {
+        topic: _executor.submit(_generate_topic, topic, difficulty, count, coalesce)
+        for topic, count in allocation.items()
+    }
+
+    merged = []
+    errors = []
+    for topic, future in futures.items():
+        try:
+            merged.extend(_trim(future.result(), allocation[topic]))
+        except Exception as e:
+            errors.append(e)
+
+    _record("batches")
+    _record("batch_seconds", time.perf_counter() - started)
+    if not merged:
+        raise errors[0]
+    return merged
+
+
+def stream_fanout_batch(topics, difficulty, batch_size=EXPECTED_QUESTIONS):
+    """Stream each topic's share of the batch concurrently, yielding events grouped by topic.
+
+    The first topic's questions are yielded as they arrive while the others buffer, so the time to
+    the first question matches a single-topic stream and the batch completes with the slowest topic.
+    """
+    started = time.perf_counter()
+    allocation = allocate_questions(topics, batch_size)
+    queues = {topic: queue.Queue() for topic in allocation}
+
+    def pump(topic, count):
+        events = queues[topic]
+        topic_started = time.perf_counter()
+        sent = 0
+        try:
+            _record("topic_calls")
+            for kind, payload in stream_mcqs_from_topic(topic, difficulty, count=count):
+                sent += kind == "question"
+                events.put((kind, payload))
+        except Exception as e:
+            _record("topic_failures")
+            print(f"Fan-out stream failed for {topic} ({difficulty}): {e}")
+            if not sent:
+                # Nothing usable arrived; fall back to a regular call so the topic is still covered
+                try:
+                    for event in scenario_set_events(_trim(request_mcqs_from_topic(topic, difficulty, count=count), count)):
+                        events.put(event)
+                except Exception as e:
+                    print(f"Fan-out fallback failed for {topic} ({difficulty}): {e}")
+        finally:
+            _record("topic_seconds", time.perf_counter() - topic_started)
+            events.put(None)
+
+    for topic, count in allocation.items():
+        _executor.submit(pump, topic, count)
+
+    for topic, count in allocation.items():
+        sent = 0
+        while True:
+            event = queues[topic].get()
+            if event is None:
+                break
+            if event[0] == "question":
+                if sent >= count:
+                    continue
+                sent += 1
+            yield event
+
+    _record("batches")
+    _record("batch_seconds", time.perf_counter() - started)
+
+
+def request_batch(topic, difficulty, coalesce=True):
+    """Generate a batch for a topic selection, fanning out across topics when there are several."""
+    if uses_fanout(topic):
+        return request_fanout_batch(_topic_list(topic), difficulty, coalesce=coalesce)
+    return request_mcqs_from_topic(topic, difficulty, coalesce=coalesce)
+
+
+def stream_batch(topic, difficulty):
+    """Stream a batch for a topic selection, fanning out across topics when there are several."""
+    if uses_fanout(topic):
+        return stream_fanout_batch(_topic_list(topic), difficulty)
+    return stream_mcqs_from_topic(topic, difficulty)
+
+
+def get_fanout_stats():
+    """Fan-out batch latency versus the summed single-topic latency it ran concurrently."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["avg_batch_seconds"] = stats["batch_seconds"] / stats["batches"] if stats["batches"] else 0.0
+    stats["avg_sequential_seconds"] = stats["topic_seconds"] / stats["batches"] if stats["batches"] else 0.0
+    return stats
@@ -0,0 +1,212 @@
+import copy
+import math
+import threading
+from datetime import date
+from cachetools import TTLCache
+from pages.modules.config import get_setting
+from pages.modules.pdf_export import generate_difficulty_performance_feedback, track_performance_by_difficulty
+from pages.modules.quiz_format import normalize_topic, normalize_difficulty
+from pages.modules.singleflight import SingleFlight
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+# Cache settings, configurable through Streamlit secrets or environment variables
+CACHE_SIZE = get_setting("FEEDBACK_CACHE_SIZE", 512, int)
+CACHE_TTL = get_setting("FEEDBACK_CACHE_TTL", 86400, float)
+SCORE_BUCKET = get_setting("FEEDBACK_SCORE_BUCKET", 10, int)
+LLM_UPGRADE = get_setting("FEEDBACK_LLM_UPGRADE", True, bool)
+
+# Days of per-day counters kept for reporting
+STATS_DAYS = 30
+
+# TTLCache evicts expired entries first, then the least recently used one
+_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+_cache_lock = threading.Lock()
+_flights = SingleFlight()
+
+_stats = {"requests": 0, "hits": 0, "misses": 0, "llm_calls": 0}
+_daily = {}
+_stats_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+        if name in ("requests", "llm_calls"):
+            day = _daily.setdefault(date.today().isoformat(), {"requests": 0, "llm_calls": 0})
+            day[name] += amount
+            for old in sorted(_daily)[:-STATS_DAYS]:
+                del _daily[old]
+
+
+def _bucket(percentage, size):
+    # 100% shares the top bucket
+    return min(int(percentage // size) * size, (math.ceil(100 / size) - 1) * size)
+
+
+def _percentage(correct, total):
+    return correct / total * 100 if total else 0.0
+
+
+def _accuracy_band(scores):
+    """Per-difficulty accuracy band, using the same thresholds as generate_difficulty_performance_feedback."""
+    if not scores["total"]:
+        return "-"
+    percentage = _percentage(scores["correct"], scores["total"])
+    if percentage >= 80:
+        return "high"
+    if percentage >= 50:
+        return "mid"
+    return "low"
+
+
+def _count_range(bucket, size, total):
+    """Answer counts out of `total` whose percentage falls in [bucket, bucket + size)."""
+    low = math.ceil(bucket / 100 * total)
+    high = total if bucket + size >= 100 else math.ceil((bucket + size) / 100 * total) - 1
+    return low, max(low, high)
+
+
+def performance_profile(topics, total_correct, total_questions, difficulty_scores, difficulty):
+    """Normalized performance profile used as the cache key; quizzes with the same profile share feedback."""
+    levels = ",".join(
+        f"{level}:{_accuracy_band(difficulty_scores.get(level, {'correct': 0, 'total': 0}))}" for level in DIFFICULTIES
+    )
+    score = _bucket(_percentage(total_correct, total_questions), SCORE_BUCKET)
+    return f"{normalize_topic(topics)}|{total_questions}|{score}|{levels}|{normalize_difficulty(difficulty)}"
+
+
+def _performance_label(percentage):
+    if percentage >= 80:
+        return "Excellent"
+    if percentage >= 50:
+        return "Good"
+    return "Needs Improvement"
+
+
+def rule_based_feedback(topics, total_correct, total_questions, difficulty_scores):
+    """Deterministic feedback built from per-difficulty scoring, available instantly without an LLM call."""
+    percentage = _percentage(total_correct, total_questions)
+    level_feedback = generate_difficulty_performance_feedback(
+        {level: scores for level, scores in difficulty_scores.items() if scores["total"]}
+    )
+    attempted = [level for level in DIFFICULTIES if difficulty_scores.get(level, {}).get("total")]
+    ranked = sorted(attempted, key=lambda level: _percentage(difficulty_scores[level]["correct"], difficulty_scores[level]["total"]))
+    weak = [level for level in ranked if _percentage(difficulty_scores[level]["correct"], difficulty_scores[level]["total"]) < 80]
+    topic_text = ", ".join(topics) if isinstance(topics, (list, tuple)) else str(topics)
+
+    if ranked:
+        weakest = ranked[0]
+        scores = difficulty_scores[weakest]
+        analysis = f"Most of your incorrect answers came from {weakest} level questions ({scores['correct']}/{scores['total']} correct)."
+    else:
+        analysis = "No questions were answered."
+
+    return {
+        "overall_performance": f"{_performance_label(percentage)}: you answered {total_correct} out of {total_questions} questions correctly.",
+        "correct_vs_incorrect": {
+            "correct_count": str(total_correct),
+            "incorrect_count": str(total_questions - total_correct),
+            "analysis": analysis,
+        },
+        "areas_of_improvement": " ".join(level_feedback[level] for level in weak) or "Keep challenging yourself with hard level questions.",
+        "topic_specific_feedback": f"Revisit the core concepts of {topic_text} and practise applying them to realistic scenarios.",
+        "next_steps": (
+            f"Focus your revision on {weak[0]} level questions, then retake the adaptive quiz."
+            if weak else "Retake the adaptive quiz with new topics to broaden your knowledge."
+        ),
+    }
+
+
+def _llm_inputs(topics, total_questions, difficulty_scores, difficulty, profile):
+    """Prompt inputs that describe the performance bucket rather than one quiz, so the text fits every quiz sharing the key."""
+    score_bucket = int(profile.split("|")[2])
+    low, high = _count_range(score_bucket, SCORE_BUCKET, total_questions)
+    correct = f"{low}" if low == high else f"{low}-{high}"
+    incorrect = f"{total_questions - low}" if low == high else f"{total_questions - high}-{total_questions - low}"
+    levels = generate_difficulty_performance_feedback(
+        {level: scores for level, scores in difficulty_scores.items() if scores["total"]}
+    )
+    return {
+        "topic": topics,
+        "total_score": correct,
+        "total_questions": total_questions,
+        "correct_count": correct,
+        "incorrect_count": incorrect,
+        "difficulty": difficulty,
+        "difficulty_performance": " ".join(levels.values()),
+    }
+
+
+def _personalize(feedback, counts):
+    feedback = copy.deepcopy(feedback)
+    if counts:
+        feedback["correct_vs_incorrect"].update(counts)
+    return feedback
+
+
+def feedback_for_quiz(topics, total_answers, difficulty):
+    """Return (feedback, source, upgrade_inputs) for a finished quiz.
+
+    source is "cache" for a cached LLM response or "rules" for the instant rule-based feedback.
+    upgrade_inputs, when not None, are the inputs for a background LLM upgrade of rule-based feedback.
+    """
+    difficulty_scores = track_performance_by_difficulty(total_answers)
+    total_questions = len(total_answers)
+    total_correct = sum(scores["correct"] for scores in difficulty_scores.values())
+    profile = performance_profile(topics, total_correct, total_questions, difficulty_scores, difficulty)
+    counts = {"correct_count": str(total_correct), "incorrect_count": str(total_questions - total_correct)}
+
+    _count("requests")
+    with _cache_lock:
+        cached = _cache.get(profile)
+    if cached is not None:
+        _count("hits")
+        return _personalize(cached, counts), "cache", None
+
+    _count("misses")
+    feedback = rule_based_feedback(topics, total_correct, total_questions, difficulty_scores)
+    if not LLM_UPGRADE:
+        return feedback, "rules", None
+
+    upgrade_inputs = _llm_inputs(topics, total_questions, difficulty_scores, difficulty, profile)
+    upgrade_inputs.update(cache_key=profile, counts=counts)
+    return feedback, "rules", upgrade_inputs
+
+
+def upgrade_feedback(feedback_inputs):
+    """Produce LLM feedback for a stored result, reusing the cache and any identical in-flight call."""
+    # Imported here so pages that only serve cached or rule-based feedback never load the LLM stack
+    from pages.modules.feedback_generation import request_feedback_from_results
+    inputs = dict(feedback_inputs)
+    profile = inputs.pop("cache_key", None)
+    counts = inputs.pop("counts", None)
+    if profile is None:
+        return request_feedback_from_results(**inputs)
+
+    def generate():
+        with _cache_lock:
+            cached = _cache.get(profile)
+        if cached is not None:
+            return cached
+        _count("llm_calls")
+        feedback = request_feedback_from_results(**inputs)
+        with _cache_lock:
+            _cache[profile] = feedback
+        return feedback
+
+    feedback, _ = _flights.do(profile, generate)
+    return _personalize(feedback, counts)
+
+
+def get_feedback_cache_stats():
+    """Hit ratio, current size and the LLM calls the cache saved per day."""
+    with _stats_lock:
+        stats = dict(_stats)
+        daily = {day: counts["requests"] - counts["llm_calls"] for day, counts in sorted(_daily.items())}
+    with _cache_lock:
+        stats["size"] = len(_cache)
+    stats["hit_ratio"] = stats["hits"] / stats["requests"] if stats["requests"] else 0.0
+    stats["llm_calls_saved_per_day"] = daily
+    stats["llm_calls_saved_today"] = daily.get(date.today().isoformat(), 0)
+    return stats
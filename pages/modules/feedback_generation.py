@@ -1,24 +1,14 @@
 # feedback_generation.py
 from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.exceptions import OutputParserException
-from langchain_groq import ChatGroq
-from dotenv import load_dotenv
+from pages.modules.llm_service import register_chain, invoke_chain
+from pages.modules.output_repair import record, record_outcome, repair_json, validate_feedback
 import streamlit as st
 import random
 
-# Load environment variables
-load_dotenv()
-
-# Get the Groq API key from Streamlit secrets
-groq_api_key = st.secrets["GROQ_API_KEY"]
-
-# Initialize Groq LLM
-llm = ChatGroq(temperature=0.7, groq_api_key=groq_api_key, model_name="llama-3.3-70b-versatile")
-
-# Define the output parser
-json_parser = JsonOutputParser()
-
+# Define the output parser; the JSON is repaired and validated locally
+text_parser = StrOutputParser()
 
 # Define a new prompt template for feedback generation
 feedback_prompt_template = PromptTemplate(
@@ -46,17 +36,17 @@ feedback_prompt_template = PromptTemplate(
     ### Output:
     The response should be structured as a JSON array with the following details:
     ```json
-    {
+    {{
         "overall_performance": "[Short performance summary]",
-        "correct_vs_incorrect": {
+        "correct_vs_incorrect": {{
             "correct_count": "[Number of correct answers]",
             "incorrect_count": "[Number of incorrect answers]",
             "analysis": "[Analysis of why certain questions might have been answered incorrectly]"
-        },
+        }},
         "areas_of_improvement": "[Specific areas to improve based on performance]",
         "topic_specific_feedback": "[Topic-specific suggestions to deepen knowledge]",
         "next_steps": "[Actions to take next for improvement]"
-    }
+    }}
     ```
 
     ### Example:
@@ -79,27 +69,51 @@ feedback_prompt_template = PromptTemplate(
     """
 )
 
-# Define the feedback prompt chain
-feedback_chain = feedback_prompt_template | llm | json_parser
+# Define the feedback prompt chain, compiled once by the shared LLM service
+register_chain("feedback", feedback_prompt_template, text_parser)
+
+
+def request_feedback_from_results(topic, total_score, total_questions, correct_count, incorrect_count, difficulty, difficulty_performance):
+    """Invoke the feedback chain and return the validated feedback, raising on failure."""
+    # Generate a unique seed for feedback generation to introduce variety in responses
+    seed = random.randint(1, 100000)
+
+    # Invoke the feedback generation chain
+    feedback_text = invoke_chain("feedback", {
+        "topic": topic,
+        "total_score": total_score,
+        "total_questions": total_questions,
+        "correct_count": correct_count,
+        "incorrect_count": incorrect_count,
+        "difficulty": difficulty,
+        "difficulty_performance": difficulty_performance,
+        "seed": seed
+    })
+
+    # Fields the model left out fall back to the known counts rather than failing the report
+    record("responses")
+    data, repaired = repair_json(feedback_text)
+    feedback_result = validate_feedback(data, {
+        "overall_performance": f"You answered {correct_count} out of {total_questions} questions correctly.",
+        "correct_vs_incorrect": {"correct_count": str(correct_count), "incorrect_count": str(incorrect_count), "analysis": ""},
+        "areas_of_improvement": "",
+        "topic_specific_feedback": "",
+        "next_steps": "",
+    })
+    if feedback_result is None:
+        record_outcome("feedback", "failed")
+        raise OutputParserException(f"No usable feedback could be recovered from the response: {feedback_text[:200]}")
+    record_outcome("feedback", "salvaged" if repaired or set(feedback_result) - set(data) else "clean")
+    return feedback_result
+
 
 def generate_feedback_from_results(topic, total_score, total_questions, correct_count, incorrect_count, difficulty, difficulty_performance):
     """Generate feedback based on quiz results."""
     try:
-        # Generate a unique seed for feedback generation to introduce variety in responses
-        seed = random.randint(1, 100000)
-        
-        # Invoke the feedback generation chain
-        feedback_result = feedback_chain.invoke({
-            "topic": topic,
-            "total_score": total_score,
-            "total_questions": total_questions,
-            "correct_count": correct_count,
-            "incorrect_count": incorrect_count,
-            "difficulty": difficulty,
-            "difficulty_performance": difficulty_performance,
-            "seed": seed
-        })
-        
+        feedback_result = request_feedback_from_results(
+            topic, total_score, total_questions, correct_count, incorrect_count, difficulty, difficulty_performance
+        )
+
         if feedback_result:
             print("\n\n\nGenerated Feedback Response:", feedback_result)  # Debugging output
         return feedback_result
@@ -0,0 +1,129 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from db import quiz_results_collection
+from pages.modules.config import get_setting
+
+FEEDBACK_PENDING = "pending"
+FEEDBACK_READY = "ready"
+FEEDBACK_FAILED = "failed"
+
+# Worker settings, configurable through Streamlit secrets or environment variables
+FEEDBACK_WORKERS = get_setting("FEEDBACK_WORKERS", 2, int)
+FEEDBACK_MAX_ATTEMPTS = get_setting("FEEDBACK_MAX_ATTEMPTS", 3, int)
+FEEDBACK_RETRY_DELAY = get_setting("FEEDBACK_RETRY_DELAY", 5, float)
+# A pending job claimed longer ago than this is assumed lost (e.g. the process restarted) and is picked up again
+FEEDBACK_STALE_SECONDS = get_setting("FEEDBACK_STALE_SECONDS", 300, float)
+
+# Shared across all sessions in this Streamlit process
+_executor = ThreadPoolExecutor(max_workers=FEEDBACK_WORKERS, thread_name_prefix="feedback")
+
+_stats = {"submitted": 0, "completed": 0, "failed": 0, "retries": 0, "resumed": 0, "generation_seconds": 0.0}
+_stats_lock = threading.Lock()
+_resume_lock = threading.Lock()
+_resumed = False
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def pending_result_fields(feedback_inputs, feedback=None):
+    """Fields stored on a new quiz result whose feedback will be filled in (or upgraded) by the worker."""
+    return {
+        "feedback": feedback,
+        "feedback_status": FEEDBACK_PENDING,
+        "feedback_inputs": feedback_inputs,
+        "feedback_claimed_at": datetime.now(),
+    }
+
+
+def _generate(result_id, feedback_inputs):
+    # The LLM stack is only loaded once there is feedback to generate
+    from pages.modules.feedback_cache import upgrade_feedback
+    started = time.perf_counter()
+    for attempt in range(1, FEEDBACK_MAX_ATTEMPTS + 1):
+        try:
+            feedback = upgrade_feedback(feedback_inputs)
+            break
+        except Exception as e:
+            print(f"Feedback generation for {result_id} failed (attempt {attempt}/{FEEDBACK_MAX_ATTEMPTS}): {e}")
+            if attempt == FEEDBACK_MAX_ATTEMPTS:
+                quiz_results_collection.update_one(
+                    {"_id": result_id, "feedback_status": FEEDBACK_PENDING},
+                    {"$set": {"feedback_status": FEEDBACK_FAILED, "feedback_error": str(e)}},
+                )
+                _count("failed")
+                return
+            _count("retries")
+            time.sleep(FEEDBACK_RETRY_DELAY * attempt)
+
+    # Only a still-pending result is filled in, so a resumed duplicate job cannot overwrite newer feedback
+    quiz_results_collection.update_one(
+        {"_id": result_id, "feedback_status": FEEDBACK_PENDING},
+        {
+            "$set": {"feedback": feedback, "feedback_status": FEEDBACK_READY, "feedback_source": "llm", "feedback_completed_at": datetime.now()},
+            "$unset": {"feedback_inputs": "", "feedback_claimed_at": ""},
+        },
+    )
+    _count("completed")
+    _count("generation_seconds", time.perf_counter() - started)
+
+
+def start_feedback_resume():
+    """Run resume_pending_feedback on the feedback executor, so no page waits for the lost jobs to be claimed."""
+    if not _resumed:
+        _executor.submit(resume_pending_feedback)
+
+
+def submit_feedback(result_id, feedback_inputs):
+    """Generate feedback for a stored quiz result in the background."""
+    start_feedback_resume()
+    _count("submitted")
+    return _executor.submit(_generate, result_id, feedback_inputs)
+
+
+def resume_replayed_result(doc):
+    """Queue feedback for a quiz result replayed from the write-behind log, whose job was lost with its process."""
+    if doc.get("feedback_status") == FEEDBACK_PENDING and doc.get("feedback_inputs"):
+        submit_feedback(doc["_id"], doc["feedback_inputs"])
+
+
+def resume_pending_feedback():
+    """Pick up pending feedback jobs that were lost, once per process. Each job is claimed atomically."""
+    global _resumed
+    with _resume_lock:
+        if _resumed:
+            return 0
+        _resumed = True
+
+    resumed = 0
+    stale_before = datetime.now() - timedelta(seconds=FEEDBACK_STALE_SECONDS)
+    while True:
+        doc = quiz_results_collection.find_one_and_update(
+            {"feedback_status": FEEDBACK_PENDING, "feedback_claimed_at": {"$lt": stale_before}},
+            {"$set": {"feedback_claimed_at": datetime.now()}},
+            projection={"feedback_inputs": 1},
+        )
+        if doc is None:
+            break
+        if not doc.get("feedback_inputs"):
+            quiz_results_collection.update_one({"_id": doc["_id"]}, {"$set": {"feedback_status": FEEDBACK_FAILED}})
+            continue
+        _executor.submit(_generate, doc["_id"], doc["feedback_inputs"])
+        resumed += 1
+
+    _count("resumed", resumed)
+    if resumed:
+        print(f"Resumed {resumed} pending feedback jobs")
+    return resumed
+
+
+def get_feedback_stats():
+    """Background feedback counters for this process."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["avg_generation_seconds"] = stats["generation_seconds"] / stats["completed"] if stats["completed"] else 0.0
+    return stats
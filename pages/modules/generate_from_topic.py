@@ -1,33 +1,48 @@
 from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.exceptions import OutputParserException
-from langchain_groq import ChatGroq
-from dotenv import load_dotenv
+from langchain_core.utils.json import parse_partial_json
+from pydantic import ValidationError
+from pages.modules.llm_service import register_chain, invoke_chain, request_errors, stream_chain
+from pages.modules.config import get_setting
+from pages.modules.dedup import index_scenario_set, split_duplicates
+from pages.modules.metrics import record_parse_result
+from pages.modules.output_repair import clean_json_text, parse_questions, parse_scenario_set, record, record_outcome, repair_json, validate_question
+from pages.modules.schemas import Scenario
+from pages.modules.quiz_format import normalize_topic, normalize_difficulty, shuffle_choices, shuffle_scenario_set
+from pages.modules.singleflight import SingleFlight
 import streamlit as st
+import copy
 import random
+import threading
+import time
 
-# Load environment variables
-load_dotenv()
+# Define the output parser; responses are repaired and validated locally instead of by a strict JSON parser
+text_parser = StrOutputParser()
 
-# Get the Groq API key from Streamlit secrets
-groq_api_key = st.secrets["GROQ_API_KEY"]
+# Questions each scenario set should contain, and how many follow-up calls may fill a short set
+EXPECTED_QUESTIONS = 5
+MAX_TOPUP_ROUNDS = get_setting("MCQ_MAX_TOPUP_ROUNDS", 1, int)
 
-# Initialize Groq LLM
-llm = ChatGroq(temperature=0.7, groq_api_key=groq_api_key, model_name="llama-3.3-70b-versatile")
+# Identical concurrent generations share one LLM call; sharers get their own (optionally shuffled) copy
+COALESCE_SHUFFLE_QUESTIONS = get_setting("COALESCE_SHUFFLE_QUESTIONS", False, bool)
+COALESCE_SHUFFLE_CHOICES = get_setting("COALESCE_SHUFFLE_CHOICES", True, bool)
+_flights = SingleFlight()
 
-# Define the output parser
-json_parser = JsonOutputParser()
+# Time-to-first-question for streamed generations
+_stream_stats = {"streams": 0, "first_question_seconds": 0.0}
+_stream_stats_lock = threading.Lock()
 
 # Updated prompt template with scenario-based adaptive learning
 prompt_template = PromptTemplate(
-    input_variables=["topic", "difficulty"],
+    input_variables=["topic", "difficulty", "count"],
     template="""
     You are an advanced quiz generator focused on scenario-based adaptive learning.
 
     ### Task:
     - Present a **real-world problem or scenario** relevant to the specified topic.
     - The scenario should be engaging and **realistically applicable in an industrial or daily life setting**.
-    - Following the scenario, generate **5 multiple-choice questions (MCQs)** based on it.
+    - Following the scenario, generate **{count} multiple-choice questions (MCQs)** based on it.
     - The questions should progress in difficulty and align with the level specified.
 
     ### Difficulty Levels:
@@ -52,7 +67,7 @@ prompt_template = PromptTemplate(
                     ],
                     "answer": "[Full text of the correct option, e.g., 'a) Option A text']"
                 }},
-                // Repeat for 4 more questions
+                // Repeat for the remaining questions
             ]
         }}
     ]
@@ -76,22 +91,310 @@ prompt_template = PromptTemplate(
     """
 )
 
+# Follow-up prompt that asks only for the questions a salvaged response is missing
+topup_prompt_template = PromptTemplate(
+    input_variables=["topic", "difficulty", "scenario", "existing_questions", "count"],
+    template="""
+    You are an advanced quiz generator focused on scenario-based adaptive learning.
+
+    ### Task:
+    - Write exactly {count} additional multiple-choice questions (MCQs) for the scenario below.
+    - Do not repeat any of the existing questions.
+    - Every question must have exactly four choices labelled a) to d).
+    - The answer must be the full text of the correct choice.
+
+    ### Existing Questions:
+    {existing_questions}
+
+    ### Output Format:
+    The response must be a JSON array of questions only:
+    ```json
+    [
+        {{
+            "question": "[MCQ Question text]",
+            "choices": [
+                "a) [Option A text]",
+                "b) [Option B text]",
+                "c) [Option C text]",
+                "d) [Option D text]"
+            ],
+            "answer": "[Full text of the correct option, e.g., 'a) Option A text']"
+        }}
+    ]
+    ```
+
+    **Scenario:** {scenario}
+    **Topic:** {topic} | **Difficulty:** {difficulty}
+    """
+)
+
+# Chains are compiled once by the shared LLM service
+register_chain("mcq_text", prompt_template, text_parser)
+register_chain("mcq_topup", topup_prompt_template, text_parser)
+
+
+def _generation_key(kind, topic, difficulty, count):
+    return kind, normalize_topic(topic), normalize_difficulty(difficulty), count
+
+
+def _top_up(scenario_text, questions, topic, difficulty, avoid=(), expected=EXPECTED_QUESTIONS):
+    """Request only the questions a scenario is missing. Returns the new questions, possibly fewer than needed.
+
+    Near-duplicates of stored questions are rejected and listed in the next round's prompt as ones to avoid.
+    """
+    added = []
+    avoid = list(avoid)
+    for _ in range(MAX_TOPUP_ROUNDS):
+        missing = expected - len(questions) - len(added)
+        if missing <= 0:
+            break
+        existing = "\n".join(f"- {question['question']}" for question in questions + added + avoid) or "- None"
+        record("topup_calls")
+        try:
+            text = invoke_chain("mcq_topup", {
+                "topic": topic,
+                "difficulty": difficulty,
+                "scenario": scenario_text,
+                "existing_questions": existing,
+                "count": missing,
+                "seed": random.randint(1, 100000),
+            })
+        except request_errors() as e:
+            record("topup_failures")
+            print(f"Question top-up failed: {e}")
+            break
+        parsed = parse_questions(text)
+        record_parse_result("mcq_topup", "clean" if len(parsed) >= missing else "salvaged" if parsed else "failed")
+        new_questions, rejected = split_duplicates(parsed[:missing], existing=questions + added)
+        record("questions_topped_up", len(new_questions))
+        added.extend(new_questions)
+        avoid.extend(rejected)
+    return added
+
+
+def build_scenario_set(text, topic, difficulty, expected=EXPECTED_QUESTIONS):
+    """Repair and validate a raw MCQ response, topping up missing or repeated questions instead of regenerating the set.
+
+    Raises OutputParserException only if no scenario with at least one question could be recovered.
+    """
+    record("responses")
+    scenario_set, clean = parse_scenario_set(text)
+
+    total = sum(len(scenario["questions"]) for scenario in scenario_set)
+    if total < expected:
+        clean = False
+
+    # Near-duplicates of previously generated questions are replaced like invalid ones
+    rejected = []
+    accepted = []
+    for scenario in scenario_set:
+        scenario["questions"], repeats = split_duplicates(scenario["questions"], existing=accepted)
+        accepted.extend(scenario["questions"])
+        rejected.extend(repeats)
+
+    if scenario_set and len(accepted) < expected:
+        # Truncation and dropped questions hit the last scenario
+        last = scenario_set[-1]
+        last["questions"].extend(_top_up(last["scenario"], last["questions"], topic, difficulty, rejected, expected))
+        # A repeated question still beats a short quiz
+        shortfall = expected - sum(len(scenario["questions"]) for scenario in scenario_set)
+        last["questions"].extend(rejected[:max(shortfall, 0)])
+
+    # The repaired set is checked as a whole; scenarios left without questions are dropped
+    valid = []
+    for scenario in scenario_set:
+        try:
+            valid.append(Scenario.model_validate(scenario).model_dump())
+        except ValidationError:
+            clean = False
+    scenario_set = valid
+    if not scenario_set:
+        record_outcome("mcq_text", "failed")
+        raise OutputParserException(f"No usable questions could be recovered from the response: {text[:200]}")
+    record_outcome("mcq_text", "clean" if clean else "salvaged")
+    index_scenario_set(scenario_set, {"collection": "generated", "topic": normalize_topic(topic), "difficulty": normalize_difficulty(difficulty)})
+    return scenario_set
+
+
+def request_mcqs_from_topic(topic, difficulty, coalesce=True, count=EXPECTED_QUESTIONS):
+    """Invoke the MCQ chain and return the validated scenario set, raising on failure.
+
+    Concurrent identical requests are coalesced into one LLM call unless `coalesce` is False
+    (the question bank refill wants genuinely distinct sets).
+    """
+    def invoke():
+        # Introduce randomness in question generation
+        seed = random.randint(1, 100000)
+        text = invoke_chain("mcq_text", {"topic": topic, "difficulty": difficulty, "count": count, "seed": seed})
+        return build_scenario_set(text, topic, difficulty, count)
+
+    if not coalesce:
+        return invoke()
+
+    result, shared = _flights.do(_generation_key("mcq", topic, difficulty, count), invoke)
+    if shared:
+        return shuffle_scenario_set(result, COALESCE_SHUFFLE_QUESTIONS, COALESCE_SHUFFLE_CHOICES)
+    return copy.deepcopy(result)
+
 
 def generate_mcqs_from_topic(topic, difficulty):
     """Generates MCQs with different seed values to avoid repetition."""
-    chain = prompt_template | llm | json_parser
-
     try:
-        # Introduce randomness in question generation
-        seed = random.randint(1, 100000)  
-        result = chain.invoke({"topic": topic, "difficulty": difficulty, "seed": seed})
-        
-        if result:
-            print("\n\n\nGenerated MCQs Response!!!")  # Debugging output
-        return result
+        return request_mcqs_from_topic(topic, difficulty)
     except OutputParserException as e:
         st.error(f"Error parsing output: {e}")
         return None
     except Exception as e:
         st.error(f"Unexpected error: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def _parse_partial(text):
+    """Parse a possibly incomplete JSON document, returning None if nothing usable has arrived yet."""
+    try:
+        return parse_partial_json(clean_json_text(text))
+    except Exception:
+        return None
+
+
+def _settled_events(scenarios, cursor, final):
+    """Yield events for every scenario and question that can no longer change.
+
+    A scenario's text is settled once its "questions" array has started, and a question is
+    settled once the next one has started. When `final` is set everything left is settled.
+    """
+    while cursor["scenario"] < len(scenarios):
+        scenario = scenarios[cursor["scenario"]]
+        if not isinstance(scenario, dict):
+            return
+        closed = final or cursor["scenario"] < len(scenarios) - 1
+        questions = scenario.get("questions")
+
+        if not cursor["scenario_sent"]:
+            if questions is None and not closed:
+                return
+            yield "scenario", scenario.get("scenario", "No scenario provided.")
+            cursor["scenario_sent"] = True
+
+        questions = questions if isinstance(questions, list) else []
+        settled = len(questions) if closed else len(questions) - 1
+        while cursor["questions_sent"] < settled:
+            question = questions[cursor["questions_sent"]]
+            cursor["questions_sent"] += 1
+            if isinstance(question, dict):
+                yield "question", question
+
+        if not closed:
+            return
+        cursor.update(scenario=cursor["scenario"] + 1, scenario_sent=False, questions_sent=0)
+
+
+def stream_mcqs_from_topic(topic, difficulty, count=EXPECTED_QUESTIONS):
+    """Stream a scenario set, yielding ("scenario", text) and then ("question", mcq) as each object completes.
+
+    Invalid questions are dropped and missing ones topped up at the end. Concurrent identical
+    streams share one LLM call. Raises OutputParserException if no usable question was recovered.
+    """
+    key = _generation_key("mcq_stream", topic, difficulty, count)
+    events = _flights.stream(key, lambda: _stream_mcqs(topic, difficulty, count))
+    for (kind, payload), shared in events:
+        if kind == "question":
+            payload = shuffle_choices(payload) if shared and COALESCE_SHUFFLE_CHOICES else copy.deepcopy(payload)
+        yield kind, payload
+
+
+def _stream_mcqs(topic, difficulty, count):
+    seed = random.randint(1, 100000)
+    started = time.perf_counter()
+    cursor = {"scenario": 0, "scenario_sent": False, "questions_sent": 0}
+    state = {"scenario": None, "questions": [], "rejected": [], "dropped": 0, "first_question_at": None}
+    served = []
+    buffer = ""
+    scenarios = []
+    record("responses")
+
+    def release(batch):
+        # The questions settled by one chunk are de-duplicated with a single fingerprint lookup
+        if not batch:
+            return
+        fresh, repeats = split_duplicates(batch, existing=state["questions"])
+        state["rejected"].extend(repeats)
+        for question in fresh:
+            state["questions"].append(question)
+            if state["first_question_at"] is None:
+                state["first_question_at"] = time.perf_counter() - started
+            yield "question", question
+
+    def accept(events):
+        # Forward settled events, validating and de-duplicating each question before it reaches the quiz
+        batch = []
+        for kind, payload in events:
+            if kind == "scenario":
+                yield from release(batch)
+                batch = []
+                state["scenario"] = payload
+                state["questions"] = []
+                served.append({"scenario": payload, "questions": state["questions"]})
+                yield kind, payload
+                continue
+            question = validate_question(payload)
+            if question is None:
+                record("questions_dropped")
+                state["dropped"] += 1
+                continue
+            batch.append(question)
+        yield from release(batch)
+
+    for chunk in stream_chain("mcq_text", {"topic": topic, "difficulty": difficulty, "count": count, "seed": seed}):
+        buffer += chunk
+        # Events only settle when a new object or array opens. Parsing up to that opener keeps
+        # the partial parser on its fast path (it only has to append closers).
+        last_open = max(chunk.rfind("{"), chunk.rfind("["))
+        if last_open == -1:
+            continue
+        parsed = _parse_partial(buffer[:len(buffer) - len(chunk) + last_open + 1])
+        if parsed is None:
+            continue
+        scenarios = parsed if isinstance(parsed, list) else [parsed]
+        yield from accept(_settled_events(scenarios, cursor, final=False))
+
+    parsed, repaired = repair_json(buffer)
+    if parsed is not None:
+        scenarios = parsed if isinstance(parsed, list) else [parsed]
+    yield from accept(_settled_events(scenarios, cursor, final=True))
+
+    # Fill a short set with just the missing questions rather than regenerating all of them
+    topped_up = False
+    if state["scenario"] is not None and len(state["questions"]) < count:
+        topped_up = len(state["questions"]) + len(state["rejected"]) < count
+        replacements = _top_up(state["scenario"], list(state["questions"]), topic, difficulty, state["rejected"], count)
+        # A repeated question still beats a short quiz
+        shortfall = count - len(state["questions"]) - len(replacements)
+        for question in replacements + state["rejected"][:max(shortfall, 0)]:
+            state["questions"].append(question)
+            if state["first_question_at"] is None:
+                state["first_question_at"] = time.perf_counter() - started
+            yield "question", question
+
+    if state["first_question_at"] is None:
+        record_outcome("mcq_text", "failed")
+        raise OutputParserException(f"No questions could be parsed from the streamed response: {buffer[:200]}")
+    record_outcome("mcq_text", "salvaged" if repaired or state["dropped"] or topped_up else "clean")
+    index_scenario_set(served, {"collection": "generated", "topic": normalize_topic(topic), "difficulty": normalize_difficulty(difficulty)})
+
+    with _stream_stats_lock:
+        _stream_stats["streams"] += 1
+        _stream_stats["first_question_seconds"] += state["first_question_at"]
+
+
+def get_coalescing_stats():
+    """How many generation requests were served by another caller's in-flight LLM call."""
+    return _flights.stats()
+
+
+def get_stream_stats():
+    """Average time-to-first-question across streamed generations."""
+    with _stream_stats_lock:
+        stats = dict(_stream_stats)
+    stats["avg_first_question_seconds"] = stats["first_question_seconds"] / stats["streams"] if stats["streams"] else 0.0
+    return stats
@@ -0,0 +1,182 @@
+import argparse
+import sys
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+# Every index the app relies on, per collection. Key specs and options must stay stable:
+# create_indexes() is a no-op for an identical index but fails if an index with the same keys
+# exists with different options, so change an index by adding a new one and dropping the old.
+INDEXES = {
+    "users": [
+        IndexModel([("username", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+        # Role and status filters keyset-paginated by username in the admin lists
+        IndexModel([("role", ASCENDING), ("username", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("username", ASCENDING)]),
+    ],
+    "quiz_results": [
+        # A learner's results, newest first; also streams old results to compaction user by user
+        IndexModel([("username", ASCENDING), ("quiz_started_at", DESCENDING)]),
+        IndexModel([("archived_in", ASCENDING)], sparse=True),  # Results of a compaction part not yet applied
+        IndexModel([("feedback_status", ASCENDING), ("feedback_claimed_at", ASCENDING)]),  # Pending feedback jobs
+    ],
+    "quiz_result_summaries": [
+        IndexModel([("username", ASCENDING), ("month", DESCENDING)]),  # A learner's compacted history
+    ],
+    "quizzes": [
+        # Dashboard catalog pages, newest first, filtered by topic and/or difficulty
+        IndexModel([("selected_topic", ASCENDING), ("difficulty", ASCENDING), ("_id", DESCENDING)]),
+        IndexModel([("selected_topic", ASCENDING), ("_id", DESCENDING)]),
+        IndexModel([("difficulty", ASCENDING), ("_id", DESCENDING)]),
+    ],
+    "challenges": [
+        # Each branch of the challenger/opponent $or gets its own index
+        IndexModel([("challenger", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("opponent", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("quiz_id", ASCENDING)]),
+    ],
+    "challenge_attempts": [
+        IndexModel([("quiz_id", ASCENDING), ("attempted_by", ASCENDING)]),
+    ],
+    "quiz_attempts": [
+        IndexModel([("quiz_id", ASCENDING), ("attempted_by", ASCENDING)]),
+    ],
+    "question_bank": [
+        IndexModel([("topic", ASCENDING), ("difficulty", ASCENDING), ("created_at", ASCENDING)]),
+    ],
+    "question_fingerprints": [
+        IndexModel([("kind", ASCENDING), ("bands", ASCENDING)]),  # Multikey index over the LSH band keys
+    ],
+}
+
+# Indexes to drop where they still exist: {collection: [index name]}
+RETIRED_INDEXES = {
+    # The 24-hour TTL on quiz_started_at; old results are compacted by pages.modules.retention instead
+    "quiz_results": ["quiz_started_at_1"],
+}
+
+# The hot queries, with representative values: (name, collection, filter, sort).
+# Each must be answered from an index; check_query_plans() fails on any collection scan.
+HOT_QUERIES = [
+    ("login", "users", {"$or": [{"username": "learner"}, {"email": "learner"}]}, None),
+    ("signup uniqueness check", "users", {"$or": [{"username": "learner"}, {"email": "learner@example.com"}]}, None),
+    ("profile lookup", "users", {"username": "learner"}, None),
+    ("users by role", "users", {"role": "User", "username": {"$gt": "learner"}}, [("username", ASCENDING)]),
+    ("users by status", "users", {"status": "pending", "username": {"$gt": "learner"}}, [("username", ASCENDING)]),
+    ("user search", "users", {"$or": [{"username": {"$regex": "^lea"}}, {"email": {"$regex": "^lea"}}]}, None),
+    ("quiz results by user", "quiz_results", {"username": "learner"}, [("quiz_started_at", DESCENDING)]),
+    ("results due for compaction", "quiz_results", {"quiz_started_at": {"$lt": datetime(2000, 1, 1)}, "archived_in": {"$exists": False}, "feedback_status": {"$ne": "pending"}}, [("username", ASCENDING), ("quiz_started_at", DESCENDING)]),
+    ("results of a compaction part", "quiz_results", {"archived_in": "2000-01/learner-0.parquet"}, None),
+    ("monthly summaries by user", "quiz_result_summaries", {"username": "learner"}, [("month", DESCENDING)]),
+    ("stale feedback jobs", "quiz_results", {"feedback_status": "pending", "feedback_claimed_at": {"$lt": datetime(2000, 1, 1)}}, None),
+    ("pending challenges", "challenges", {"$or": [{"challenger": "learner"}, {"opponent": "learner"}], "status": "pending"}, None),
+    ("completed challenges", "challenges", {"status": "completed", "$or": [{"challenger": "learner"}, {"opponent": "learner"}]}, None),
+    ("challenge by quiz", "challenges", {"quiz_id": "quiz"}, None),
+    ("challenge attempts by quiz", "challenge_attempts", {"quiz_id": "quiz"}, None),
+    ("challenge attempt by user", "challenge_attempts", {"quiz_id": "quiz", "attempted_by": "learner"}, None),
+    ("quiz attempt by user", "quiz_attempts", {"quiz_id": "quiz", "attempted_by": "learner"}, None),
+    ("attempted quizzes on a page", "quiz_attempts", {"quiz_id": {"$in": ["quiz1", "quiz2"]}, "attempted_by": "learner"}, None),
+    ("quiz catalog page", "quizzes", {"_id": {"$lt": "quiz"}}, [("_id", DESCENDING)]),
+    ("quiz catalog by topic", "quizzes", {"selected_topic": "Networking"}, [("_id", DESCENDING)]),
+    ("quiz catalog by topic and difficulty", "quizzes", {"selected_topic": "Networking", "difficulty": "Medium"}, [("_id", DESCENDING)]),
+    ("quiz catalog by difficulty", "quizzes", {"difficulty": "Medium"}, [("_id", DESCENDING)]),
+    ("question bank pool", "question_bank", {"topic": "python", "difficulty": "easy"}, [("created_at", ASCENDING)]),
+]
+
+
+def ensure_indexes(db, collections=None):
+    """Create any missing declared indexes and drop retired ones. Safe to run repeatedly; returns {collection: error or None}.
+
+    A failure on one collection (e.g. duplicate usernames blocking a unique index) is reported
+    and does not stop the others.
+    """
+    results = {}
+    for name in collections or INDEXES:
+        try:
+            existing = db[name].index_information()
+            for index in RETIRED_INDEXES.get(name, []):
+                if index in existing:
+                    db[name].drop_index(index)
+            db[name].create_indexes(INDEXES[name])
+            results[name] = None
+        except PyMongoError as e:
+            results[name] = str(e)
+            print(f"Index creation failed for {name}: {e}")
+    return results
+
+
+def _plan_stages(plan):
+    """Every stage name in an explain plan tree, for both the classic and the SBE plan layouts."""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan", "winningPlan"):
+        yield from _plan_stages(plan.get(key))
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+def explain_query(db, collection, query, sort=None):
+    """Return the stage names of the winning plan for a find()."""
+    cursor = db[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+    return list(_plan_stages(plan))
+
+
+def explain_pipeline(db, collection, pipeline):
+    """Return the stage names of the winning plan for an aggregation, and the collection scans its $lookup stages made."""
+    explain = db.command("explain", {"aggregate": collection, "pipeline": pipeline, "cursor": {}}, verbosity="executionStats")
+    stages = list(_plan_stages(explain.get("queryPlanner", {}).get("winningPlan")))
+    lookup_scans = 0
+    for stage in explain.get("stages", []):
+        if "$cursor" in stage:
+            stages.extend(_plan_stages(stage["$cursor"].get("queryPlanner", {}).get("winningPlan")))
+        if "$lookup" in stage:
+            lookup_scans += stage.get("collectionScans", 0)
+    return stages, lookup_scans
+
+
+def hot_pipelines():
+    """The hot aggregations, with representative values: (name, collection, pipeline)."""
+    # Imported here: the repository modules import db, which imports this module
+    from pages.modules.challenge_repo import pending_pipeline
+    from pages.modules.dedup import candidate_pipeline
+    return [
+        ("pending challenges with quizzes", "challenges", pending_pipeline("learner")),
+        ("near-duplicate candidates", "question_fingerprints", candidate_pipeline("question", [1, 2, 3])),
+    ]
+
+
+def check_query_plans(db):
+    """Explain every hot query and aggregation. Returns [(name, collection, stages, collection_scan)]."""
+    report = []
+    for name, collection, query, sort in HOT_QUERIES:
+        stages = explain_query(db, collection, query, sort)
+        report.append((name, collection, stages, "COLLSCAN" in stages))
+    for name, collection, pipeline in hot_pipelines():
+        stages, lookup_scans = explain_pipeline(db, collection, pipeline)
+        report.append((name, collection, stages, "COLLSCAN" in stages or lookup_scans > 0))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the declared MongoDB indexes and verify the hot queries use them.")
+    parser.add_argument("--check-only", action="store_true", help="only explain the hot queries, without creating indexes")
+    args = parser.parse_args()
+
+    from db import db
+
+    failed = False
+    if not args.check_only:
+        for name, error in ensure_indexes(db).items():
+            print(f"{name:<24} {'ok' if error is None else 'FAILED: ' + error}")
+            failed |= error is not None
+
+    for name, collection, stages, collection_scan in check_query_plans(db):
+        print(f"{'COLLSCAN' if collection_scan else 'ok':<9} {collection:<24} {name:<28} {' > '.join(stages)}")
+        failed |= collection_scan
+    sys.exit(1 if failed else 0)
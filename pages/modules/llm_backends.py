@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Rough characters-per-token ratio used for synthetic token counts and pacing
+CHARS_PER_TOKEN = 4
+
+_TOPIC_DIFFICULTY_RE = re.compile(r"\*\*Topic:\*\*\s*(.+?)\s*\|\s*\*\*Difficulty:\*\*\s*([^\n|]+)")
+_TOPUP_COUNT_RE = re.compile(r"exactly (\d+) additional")
+_QUESTION_COUNT_RE = re.compile(r"generate \*\*(\d+) multiple-choice")
+_SCORE_RE = re.compile(r"\*\*Correct Answers:\*\*\s*(\d+)\s*\|\s*\*\*Incorrect Answers:\*\*\s*(\d+)")
+
+
+def _prompt_text(messages):
+    return "\n".join(str(message.content) for message in messages)
+
+
+def _usage(prompt, completion):
+    input_tokens = max(len(prompt) // CHARS_PER_TOKEN, 1)
+    output_tokens = max(len(completion) // CHARS_PER_TOKEN, 1)
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+def _token_pieces(text):
+    """Split text into roughly token-sized pieces for paced streaming."""
+    return [text[i:i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)]
+
+
+class SimulatedChatModel(BaseChatModel):
+    """Base for offline chat models that emit a canned response with synthetic latency and throughput."""
+
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+
+    def _respond(self, prompt):
+        raise NotImplementedError
+
+    def _pace(self, pieces):
+        """Sleep for the time-to-first-token, then yield pieces at the configured token rate."""
+        if self.latency > 0:
+            time.sleep(self.latency)
+        delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        for piece in pieces:
+            if delay:
+                time.sleep(delay)
+            yield piece
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = _prompt_text(messages)
+        content = self._respond(prompt)
+        for _ in self._pace(_token_pieces(content)):
+            pass
+        message = AIMessage(content=content, usage_metadata=_usage(prompt, content))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        prompt = _prompt_text(messages)
+        content = self._respond(prompt)
+        for piece in self._pace(_token_pieces(content)):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=_usage(prompt, content)))
+
+
+class FakeQuizChatModel(SimulatedChatModel):
+    """Fully local model that answers the MCQ and feedback prompts with schema-valid JSON."""
+
+    seed: Optional[int] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-quiz"
+
+    def _respond(self, prompt):
+        rng = random.Random(self.seed if self.seed is not None else hashlib.sha256(prompt.encode()).hexdigest())
+        if "learning assistant" in prompt:
+            payload = self._feedback(prompt)
+        elif _TOPUP_COUNT_RE.search(prompt):
+            payload = self._questions(prompt, rng, int(_TOPUP_COUNT_RE.search(prompt).group(1)))
+        else:
+            payload = self._scenario_set(prompt, rng)
+        return "```json\n" + json.dumps(payload, indent=4) + "\n```"
+
+    def _questions(self, prompt, rng, count):
+        matches = _TOPIC_DIFFICULTY_RE.findall(prompt)
+        topic, difficulty = matches[-1] if matches else ("General Knowledge", "Medium")
+        questions = []
+        for number in range(1, count + 1):
+            choices = [f"{label}) Option {label.upper()} for {topic} question {number}" for label in "abcd"]
+            questions.append({
+                "question": f"[{difficulty.strip()}] Question {number} about {topic}: which option applies to the scenario?",
+                "choices": choices,
+                "answer": rng.choice(choices),
+            })
+        return questions
+
+    def _scenario_set(self, prompt, rng):
+        count = _QUESTION_COUNT_RE.search(prompt)
+        matches = _TOPIC_DIFFICULTY_RE.findall(prompt)
+        topic, difficulty = matches[-1] if matches else ("General Knowledge", "Medium")
+        return [{
+            "scenario": f"A team working on {topic} faces a realistic {difficulty.strip().lower()} level problem that needs to be solved.",
+            "questions": self._questions(prompt, rng, int(count.group(1)) if count else 5),
+        }]
+
+    def _feedback(self, prompt):
+        matches = _SCORE_RE.findall(prompt)
+        correct, incorrect = (int(v) for v in matches[-1]) if matches else (0, 0)
+        total = correct + incorrect
+        ratio = correct / total if total else 0
+        summary = "Excellent" if ratio >= 0.8 else "Good" if ratio >= 0.5 else "Needs Improvement"
+        return {
+            "overall_performance": f"{summary}: you answered {correct} out of {total} questions correctly.",
+            "correct_vs_incorrect": {
+                "correct_count": str(correct),
+                "incorrect_count": str(incorrect),
+                "analysis": "Incorrect answers were concentrated on the harder, application-focused questions.",
+            },
+            "areas_of_improvement": "Practise applying the core concepts to multi-step scenarios.",
+            "topic_specific_feedback": "Review the fundamentals of the selected topics and work through worked examples.",
+            "next_steps": "Retake the adaptive quiz after revising the topics you found difficult.",
+        }
+
+
+class Cassette:
+    """On-disk store of prompt -> recorded responses, keyed by a hash of the prompt text."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+        self._replay_positions = {}
+
+    @staticmethod
+    def key(prompt):
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        if self._entries is None:
+            if os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            else:
+                self._entries = {}
+        return self._entries
+
+    def record(self, prompt, response):
+        with self._lock:
+            entries = self._load()
+            entry = entries.setdefault(self.key(prompt), {"prompt": prompt, "responses": []})
+            entry["responses"].append(response)
+
+            # Write atomically so a crash never leaves a half-written cassette
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def replay(self, prompt):
+        """Return the next recorded response for this prompt (cycling through recordings), or None."""
+        with self._lock:
+            entry = self._load().get(self.key(prompt))
+            if not entry or not entry["responses"]:
+                return None
+            key = self.key(prompt)
+            position = self._replay_positions.get(key, 0)
+            self._replay_positions[key] = position + 1
+            return entry["responses"][position % len(entry["responses"])]
+
+
+class ReplayChatModel(SimulatedChatModel):
+    """Replays recorded responses with synthetic latency; unknown prompts fall back to the fake model or fail."""
+
+    cassette: Any = None
+    fallback: Optional[BaseChatModel] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-replay"
+
+    def _respond(self, prompt):
+        response = self.cassette.replay(prompt)
+        if response is not None:
+            return response
+        if self.fallback is not None:
+            return self.fallback._respond(prompt)
+        raise KeyError(f"No recorded response in {self.cassette.path} for prompt {Cassette.key(prompt)[:12]}")
+
+
+class RecordingChatModel(BaseChatModel):
+    """Passes calls through to a real model and appends every response to the cassette."""
+
+    inner: BaseChatModel
+    cassette: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-record"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        message = self.inner.invoke(messages, stop=stop, **kwargs)
+        self.cassette.record(_prompt_text(messages), message.content)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        content = ""
+        for message_chunk in self.inner.stream(messages, stop=stop, **kwargs):
+            content += str(message_chunk.content)
+            chunk = ChatGenerationChunk(message=message_chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(str(message_chunk.content), chunk=chunk)
+            yield chunk
+        self.cassette.record(_prompt_text(messages), content)
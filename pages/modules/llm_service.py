@@ -0,0 +1,230 @@
+import collections
+import queue
+import threading
+import time
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+from pages.modules.config import get_setting
+from pages.modules.metrics import llm_errors, llm_first_token_seconds, llm_request_seconds, record_token_usage
+
+# Load environment variables
+load_dotenv()
+
+# Client and limiter settings, configurable through Streamlit secrets or environment variables
+MODEL_NAME = get_setting("LLM_MODEL", "llama-3.3-70b-versatile")
+TEMPERATURE = get_setting("LLM_TEMPERATURE", 0.7, float)
+MAX_CONCURRENCY = get_setting("LLM_MAX_CONCURRENCY", 4, int)
+QUEUE_TIMEOUT = get_setting("LLM_QUEUE_TIMEOUT", 120, float)
+REQUEST_TIMEOUT = get_setting("LLM_REQUEST_TIMEOUT", 60, float)
+
+# Backend selection: "groq" (live), "record" (live, saved to the cassette), "replay" (cassette only) or "fake" (fully local)
+BACKEND = get_setting("LLM_BACKEND", "groq")
+CASSETTE_PATH = get_setting("LLM_CASSETTE_PATH", "cassettes/llm_cassette.json")
+CASSETTE_MISS = get_setting("LLM_CASSETTE_MISS", "error")
+SIMULATED_LATENCY = get_setting("LLM_SIMULATED_LATENCY", 0.5, float)
+SIMULATED_TOKENS_PER_SECOND = get_setting("LLM_SIMULATED_TOKENS_PER_SECOND", 250, float)
+
+
+class FairLimiter:
+    """Counting semaphore that admits waiters strictly in arrival order."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._in_flight = 0
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """Take a slot, waiting in FIFO order. Returns False if the timeout expires first."""
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return True
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+
+        if waiter.wait(timeout):
+            return True
+
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+                return False
+            except ValueError:
+                # release() handed us the slot just as we timed out
+                return True
+
+    def release(self):
+        """Free a slot, handing it directly to the oldest waiter if there is one."""
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self._in_flight, "waiting": len(self._waiters), "limit": self.limit}
+
+    def __enter__(self):
+        if not self.acquire(QUEUE_TIMEOUT):
+            raise TimeoutError(f"Timed out after {QUEUE_TIMEOUT}s waiting for an LLM slot")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+# Process-wide state shared by every Streamlit session
+limiter = FairLimiter(MAX_CONCURRENCY)
+_llm = None
+_llm_lock = threading.Lock()
+_prompts = {}
+_chains = {}
+_chains_lock = threading.Lock()
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """Adds the prompt and completion tokens the model reported for one chain call to the exported metrics."""
+
+    def __init__(self, chain):
+        self.chain = chain
+
+    def on_llm_end(self, response, **kwargs):
+        record_token_usage(self.chain, response)
+
+
+def llm_callbacks(chain):
+    """Run config that attaches token accounting to a chain call."""
+    return {"callbacks": [TokenUsageHandler(chain)]}
+
+
+def _build_groq():
+    # The provider SDK is only imported when the live backend is actually built
+    import httpx
+    from langchain_groq import ChatGroq
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=MAX_CONCURRENCY, max_keepalive_connections=MAX_CONCURRENCY),
+        timeout=REQUEST_TIMEOUT,
+    )
+    return ChatGroq(
+        temperature=TEMPERATURE,
+        groq_api_key=get_setting("GROQ_API_KEY"),
+        model_name=MODEL_NAME,
+        http_client=http_client,
+    )
+
+
+def request_errors():
+    """Exceptions a single LLM request is expected to raise: provider and network errors, or no free LLM slot in time."""
+    if BACKEND in ("groq", "record"):
+        # Imported only with the live backend, like the SDK itself; it wraps httpx's network errors
+        from groq import GroqError
+        return (GroqError, TimeoutError)
+    return (TimeoutError,)
+
+
+def build_llm(backend=BACKEND):
+    """Build the chat model for a backend; offline backends never touch the network or the API key."""
+    from pages.modules.llm_backends import Cassette, FakeQuizChatModel, RecordingChatModel, ReplayChatModel
+    if backend == "groq":
+        return _build_groq()
+    if backend == "record":
+        return RecordingChatModel(inner=_build_groq(), cassette=Cassette(CASSETTE_PATH))
+
+    fake = FakeQuizChatModel(latency=SIMULATED_LATENCY, tokens_per_second=SIMULATED_TOKENS_PER_SECOND)
+    if backend == "fake":
+        return fake
+    if backend == "replay":
+        return ReplayChatModel(
+            cassette=Cassette(CASSETTE_PATH),
+            fallback=fake if CASSETTE_MISS == "fake" else None,
+            latency=SIMULATED_LATENCY,
+            tokens_per_second=SIMULATED_TOKENS_PER_SECOND,
+        )
+    raise ValueError(f"Unknown LLM_BACKEND {backend!r}; expected groq, record, replay or fake")
+
+
+def get_llm():
+    """Build the shared chat model on first use. The live backend uses one pooled keep-alive HTTP client."""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = build_llm()
+    return _llm
+
+
+def register_chain(name, prompt, parser):
+    """Declare a named prompt | llm | parser chain. It is compiled once, on first use."""
+    _prompts[name] = (prompt, parser)
+
+
+def get_chain(name):
+    """Return the compiled chain for `name`, building it the first time it is requested."""
+    chain = _chains.get(name)
+    if chain is None:
+        with _chains_lock:
+            chain = _chains.get(name)
+            if chain is None:
+                prompt, parser = _prompts[name]
+                chain = prompt | get_llm() | parser
+                _chains[name] = chain
+    return chain
+
+
+def invoke_chain(name, inputs):
+    """Run a registered chain while holding one of the process-wide LLM slots."""
+    chain = get_chain(name)
+    started = time.perf_counter()
+    try:
+        with limiter:
+            return chain.invoke(inputs, config=llm_callbacks(name))
+    except Exception:
+        llm_errors.labels(chain=name).inc()
+        raise
+    finally:
+        llm_request_seconds.labels(chain=name, mode="invoke").observe(time.perf_counter() - started)
+
+
+def stream_chain(name, inputs):
+    """Stream a registered chain's output chunks.
+
+    The provider stream is drained by a pump thread that holds the LLM slot, so a consumer that
+    pauses (e.g. an interrupted Streamlit rerun) never keeps a slot or connection checked out.
+    """
+    chain = get_chain(name)
+    chunks = queue.Queue()
+
+    def pump():
+        started = time.perf_counter()
+        first = True
+        try:
+            with limiter:
+                for chunk in chain.stream(inputs, config=llm_callbacks(name)):
+                    if first:
+                        llm_first_token_seconds.labels(chain=name).observe(time.perf_counter() - started)
+                        first = False
+                    chunks.put(("chunk", chunk))
+        except Exception as e:
+            llm_errors.labels(chain=name).inc()
+            chunks.put(("error", e))
+        finally:
+            llm_request_seconds.labels(chain=name, mode="stream").observe(time.perf_counter() - started)
+            chunks.put(("done", None))
+
+    threading.Thread(target=pump, name=f"llm-stream-{name}", daemon=True).start()
+
+    while True:
+        kind, value = chunks.get()
+        if kind == "chunk":
+            yield value
+        elif kind == "error":
+            raise value
+        else:
+            return
+
+
+def get_limiter_stats():
+    """Current in-flight and queued LLM requests for this process."""
+    return limiter.stats()
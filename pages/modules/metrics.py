@@ -0,0 +1,176 @@
+import threading
+import time
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from pymongo import monitoring
+from pages.modules.config import get_setting
+
+# Exporter settings, configurable through Streamlit secrets or environment variables
+METRICS_ENABLED = get_setting("METRICS_ENABLED", True, bool)
+METRICS_PORT = get_setting("METRICS_PORT", 9464, int)
+METRICS_ADDR = get_setting("METRICS_ADDR", "127.0.0.1")
+# A session counts as active if it reran a script within this many seconds
+SESSION_WINDOW = get_setting("METRICS_SESSION_WINDOW", 300, float)
+
+# LLM calls take seconds, Mongo operations milliseconds and page reruns anything in between
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+MONGO_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+PAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+llm_request_seconds = Histogram(
+    "aiquizzer_llm_request_seconds", "LLM chain call latency, including time queued for a slot",
+    ["chain", "mode"], buckets=LLM_BUCKETS,
+)
+llm_first_token_seconds = Histogram(
+    "aiquizzer_llm_first_token_seconds", "Time to the first streamed chunk of an LLM chain call",
+    ["chain"], buckets=LLM_BUCKETS,
+)
+llm_errors = Counter("aiquizzer_llm_errors_total", "LLM chain calls that raised", ["chain"])
+llm_tokens = Counter("aiquizzer_llm_tokens_total", "Tokens reported by the model", ["chain", "kind"])
+llm_parse_results = Counter(
+    "aiquizzer_llm_parse_results_total", "Parsed LLM responses by outcome (clean, salvaged or failed)",
+    ["chain", "outcome"],
+)
+mongo_operation_seconds = Histogram(
+    "aiquizzer_mongo_operation_seconds", "MongoDB command latency",
+    ["collection", "command"], buckets=MONGO_BUCKETS,
+)
+mongo_errors = Counter("aiquizzer_mongo_errors_total", "MongoDB commands that failed", ["collection", "command"])
+page_rerun_seconds = Histogram(
+    "aiquizzer_page_rerun_seconds", "Script rerun duration per page",
+    ["page"], buckets=PAGE_BUCKETS,
+)
+write_behind_queue_depth = Gauge(
+    "aiquizzer_write_behind_queue_depth", "Submissions logged locally and not yet written to MongoDB",
+)
+write_behind_log_seconds = Histogram(
+    "aiquizzer_write_behind_log_seconds", "Time to durably log one submission before it is acknowledged",
+    buckets=MONGO_BUCKETS,
+)
+write_behind_flush_seconds = Histogram(
+    "aiquizzer_write_behind_flush_seconds", "Time to write one buffered batch to MongoDB",
+    buckets=MONGO_BUCKETS,
+)
+write_behind_documents = Counter(
+    "aiquizzer_write_behind_documents_total", "Documents written to MongoDB from the write-behind log",
+    ["collection", "source"],
+)
+write_behind_dead_lettered = Counter(
+    "aiquizzer_write_behind_dead_lettered_total", "Documents MongoDB rejected, moved from the write-behind log to the dead-letter directory",
+    ["collection"],
+)
+write_behind_flush_errors = Counter("aiquizzer_write_behind_flush_errors_total", "Write-behind flushes that failed and will be retried")
+active_sessions = Gauge("aiquizzer_active_sessions", "Browser sessions that reran a script within the session window")
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_server_lock = threading.Lock()
+_server_started = False
+
+
+def start_metrics_server():
+    """Serve /metrics on METRICS_ADDR:METRICS_PORT, once per process. Returns True if the exporter is running."""
+    global _server_started
+    if not METRICS_ENABLED:
+        return False
+    with _server_lock:
+        if not _server_started:
+            try:
+                start_http_server(METRICS_PORT, addr=METRICS_ADDR)
+                _server_started = True
+            except OSError as e:
+                print(f"Metrics server not started on {METRICS_ADDR}:{METRICS_PORT}: {e}")
+    return _server_started
+
+
+def _count_active_sessions():
+    cutoff = time.monotonic() - SESSION_WINDOW
+    with _sessions_lock:
+        for session_id in [sid for sid, seen in _sessions.items() if seen < cutoff]:
+            del _sessions[session_id]
+        return len(_sessions)
+
+
+active_sessions.set_function(_count_active_sessions)
+
+
+def mark_session_active(session_id):
+    """Record that a session just reran a script."""
+    if session_id:
+        with _sessions_lock:
+            _sessions[session_id] = time.monotonic()
+
+
+def _current_session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+
+class track_page_rerun:
+    """Context manager timing one script rerun of a page and marking its session active."""
+
+    def __init__(self, page):
+        self.page = page
+
+    def __enter__(self):
+        mark_session_active(_current_session_id())
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # st.rerun() and st.stop() end a run by raising, so every exit is timed
+        page_rerun_seconds.labels(page=self.page).observe(time.perf_counter() - self.started)
+
+
+def record_parse_result(chain, outcome):
+    llm_parse_results.labels(chain=chain, outcome=outcome).inc()
+
+
+def record_token_usage(chain, response):
+    """Add the prompt and completion tokens a model reported in an LLMResult."""
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+    if not prompt and not completion:
+        # Providers that only report usage in llm_output
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt = usage.get("prompt_tokens", 0)
+        completion = usage.get("completion_tokens", 0)
+    if prompt:
+        llm_tokens.labels(chain=chain, kind="prompt").inc(prompt)
+    if completion:
+        llm_tokens.labels(chain=chain, kind="completion").inc(completion)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command by collection and command name."""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        collection = target if isinstance(target, str) else "-"
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event):
+        with self._lock:
+            collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        return collection
+
+    def succeeded(self, event):
+        collection = self._finish(event)
+        mongo_operation_seconds.labels(collection=collection, command=event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        mongo_operation_seconds.labels(collection=collection, command=event.command_name).observe(event.duration_micros / 1e6)
+        mongo_errors.labels(collection=collection, command=event.command_name).inc()
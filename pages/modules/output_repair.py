@@ -0,0 +1,262 @@
+import difflib
+import json
+import re
+import threading
+from langchain_core.utils.json import parse_partial_json
+from pydantic import ValidationError
+from pages.modules.metrics import record_parse_result
+from pages.modules.schemas import MCQ, Feedback
+
+# Markdown code fences around the JSON document
+_FENCE_RE = re.compile(r"^\s*```(?:json)?|```\s*$")
+
+# Option labels such as "a) ", "(B) " or "c. "
+_LABEL_RE = re.compile(r"^\s*\(?([a-dA-D])\s*[\).:]\s*")
+
+# Bare answers such as "b", "B)", "(c)" or "Option D"
+_BARE_LABEL_RE = re.compile(r"^(?:option\s*)?\(?([a-d])\)?[\).:]?$")
+
+# Minimum similarity for a fuzzy answer-to-choice match
+FUZZY_ANSWER_CUTOFF = 0.85
+
+_stats = {
+    "responses": 0,
+    "clean": 0,
+    "salvaged": 0,
+    "failed": 0,
+    "questions_dropped": 0,
+    "answers_matched": 0,
+    "topup_calls": 0,
+    "questions_topped_up": 0,
+    "topup_failures": 0,
+}
+_stats_lock = threading.Lock()
+
+
+def record(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def record_outcome(chain, outcome):
+    """Count a parsed response as clean, salvaged or failed, per process and per chain in the exported metrics."""
+    record(outcome)
+    record_parse_result(chain, outcome)
+
+
+def get_repair_stats():
+    """Salvage counters; every salvaged response is a full regeneration that did not have to happen."""
+    with _stats_lock:
+        stats = dict(_stats)
+    attempted = stats["salvaged"] + stats["failed"]
+    stats["salvage_rate"] = stats["salvaged"] / attempted if attempted else 0.0
+    stats["regenerations_saved"] = stats["salvaged"]
+    return stats
+
+
+def clean_json_text(text):
+    """Strip code fences, // and /* */ comments and trailing commas, leaving string contents untouched."""
+    text = _FENCE_RE.sub("", text)
+    out = []
+    i, n = 0, len(text)
+    in_string = escaped = False
+
+    while i < n:
+        c = text[i]
+        if in_string:
+            out.append(c)
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+            i += 1
+            continue
+
+        if c == '"':
+            in_string = True
+        elif text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        elif c in "]}":
+            # Drop a trailing comma before the closing bracket
+            k = len(out) - 1
+            while k >= 0 and out[k].isspace():
+                k -= 1
+            if k >= 0 and out[k] == ",":
+                del out[k]
+
+        out.append(c)
+        i += 1
+
+    return "".join(out)
+
+
+def repair_json(text):
+    """Parse LLM JSON output, repairing fences, comments, trailing commas and truncation.
+
+    Returns (data, repaired); data is None if nothing could be recovered.
+    """
+    stripped = _FENCE_RE.sub("", text).strip()
+    try:
+        return json.loads(stripped, strict=False), False
+    except json.JSONDecodeError:
+        pass
+
+    cleaned = clean_json_text(stripped)
+    try:
+        return json.loads(cleaned, strict=False), True
+    except json.JSONDecodeError:
+        pass
+
+    # Truncated output: close any open strings, arrays and objects
+    try:
+        return parse_partial_json(cleaned), True
+    except Exception:
+        return None, True
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", str(text)).strip().strip(".").lower()
+
+
+def match_answer(answer, choices):
+    """Map a model's answer onto the exact text of one of the choices, or None if it matches none."""
+    if answer in choices:
+        return answer
+    if not isinstance(answer, str) or not answer.strip():
+        return None
+
+    normalized = _normalize(answer)
+    for choice in choices:
+        if _normalize(choice) == normalized:
+            return choice
+
+    # A bare label: "b", "B)", "Option C"
+    bare = _BARE_LABEL_RE.match(normalized)
+    if bare:
+        letter = bare.group(1)
+        for choice in choices:
+            label = _LABEL_RE.match(choice)
+            if label and label.group(1).lower() == letter:
+                return choice
+        index = ord(letter) - ord("a")
+        return choices[index] if index < len(choices) else None
+
+    # The option text without (or with a different) label
+    answer_text = _normalize(_LABEL_RE.sub("", answer, count=1))
+    choice_texts = [_normalize(_LABEL_RE.sub("", choice, count=1)) for choice in choices]
+    for choice, text in zip(choices, choice_texts):
+        if text == answer_text:
+            return choice
+
+    close = difflib.get_close_matches(answer_text, choice_texts, n=1, cutoff=FUZZY_ANSWER_CUTOFF)
+    if close:
+        return choices[choice_texts.index(close[0])]
+    return None
+
+
+def validate_question(raw):
+    """Return a clean MCQ dict, fixing near-miss answers, or None if the question is unusable."""
+    if not isinstance(raw, dict):
+        return None
+
+    choices = raw.get("choices")
+    if not isinstance(choices, list):
+        return None
+    choices = [str(choice).strip() for choice in choices if choice not in (None, "")]
+
+    answer = match_answer(raw.get("answer"), choices)
+    if answer is None:
+        return None
+    if answer != raw.get("answer"):
+        record("answers_matched")
+
+    try:
+        return MCQ(question=str(raw.get("question") or ""), choices=choices, answer=answer).model_dump()
+    except ValidationError:
+        return None
+
+
+def validate_questions(raw_questions):
+    """Validate a list of raw questions, dropping the unusable ones."""
+    if not isinstance(raw_questions, list):
+        return []
+    questions = []
+    for raw in raw_questions:
+        question = validate_question(raw)
+        if question is None:
+            record("questions_dropped")
+        else:
+            questions.append(question)
+    return questions
+
+
+def parse_scenario_set(text):
+    """Repair and validate a raw MCQ response.
+
+    Returns (scenario_set, clean). Scenarios keep whatever valid questions survived, possibly none,
+    so callers can request just the missing ones. clean is True when nothing had to be repaired or dropped.
+    """
+    data, repaired = repair_json(text)
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        return [], False
+
+    scenario_set = []
+    clean = not repaired
+    for raw in data:
+        if not isinstance(raw, dict) or not str(raw.get("scenario") or "").strip():
+            clean = False
+            continue
+        raw_questions = raw.get("questions")
+        questions = validate_questions(raw_questions)
+        if not isinstance(raw_questions, list) or len(questions) != len(raw_questions):
+            clean = False
+        scenario_set.append({"scenario": str(raw["scenario"]).strip(), "questions": questions})
+    return scenario_set, clean
+
+
+def parse_questions(text):
+    """Repair and validate a response that should be a list of questions (or scenarios containing them)."""
+    data, _ = repair_json(text)
+    if isinstance(data, dict):
+        data = data.get("questions", [data])
+    if not isinstance(data, list):
+        return []
+
+    raw_questions = []
+    for item in data:
+        if isinstance(item, dict) and isinstance(item.get("questions"), list):
+            raw_questions.extend(item["questions"])
+        else:
+            raw_questions.append(item)
+    return validate_questions(raw_questions)
+
+
+def validate_feedback(data, defaults):
+    """Return a clean feedback dict, filling missing fields from `defaults`, or None if nothing usable came back."""
+    if not isinstance(data, dict):
+        return None
+
+    merged = dict(defaults)
+    merged.update({key: value for key, value in data.items() if value not in (None, "")})
+
+    counts = data.get("correct_vs_incorrect")
+    counts = counts if isinstance(counts, dict) else {}
+    merged["correct_vs_incorrect"] = {
+        **defaults.get("correct_vs_incorrect", {}),
+        **{key: value for key, value in counts.items() if value not in (None, "")},
+    }
+
+    try:
+        return Feedback.model_validate(merged).model_dump()
+    except ValidationError:
+        return None
@@ -0,0 +1,164 @@
+import argparse
+import hashlib
+import io
+from datetime import datetime
+import streamlit as st
+from bson import Binary
+from bson.errors import InvalidDocument
+from pymongo.errors import PyMongoError
+from db import profile_photos_collection, users_collection
+from pages.modules.config import get_setting
+
+# Photo settings, configurable through Streamlit secrets or environment variables
+PHOTO_MAX_BYTES = get_setting("PHOTO_MAX_BYTES", 5 * 1024 * 1024, int)
+# Longest side, in pixels, of the thumbnail shown in the profile expander and on the settings page
+PHOTO_THUMBNAIL_SIZE = get_setting("PHOTO_THUMBNAIL_SIZE", 256, int)
+PHOTO_CACHE_SIZE = get_setting("PHOTO_CACHE_SIZE", 512, int)
+
+DEFAULT_PHOTOS = {"Male": "pages/images/man.png", "Female": "pages/images/woman.png"}
+
+
+def photo_id_for(data):
+    """Content address of a photo: the SHA-256 of its bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_thumbnail(data, size=None):
+    """Downscale an image to fit a size x size box. Returns (bytes, content type); raises ValueError if it is not an image."""
+    # Pillow is only imported once a photo is actually stored
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    size = size or PHOTO_THUMBNAIL_SIZE
+    buffer = io.BytesIO()
+    # Pixels are only decoded by the resize, so truncated or oversized uploads fail there, not at open
+    try:
+        image = Image.open(io.BytesIO(data))
+        image = ImageOps.exif_transpose(image)  # Phone photos carry their rotation in EXIF
+        image.thumbnail((size, size))
+
+        # Keep transparency as PNG; everything else is smaller as JPEG
+        if image.mode in ("RGBA", "LA", "P"):
+            image.save(buffer, format="PNG", optimize=True)
+            return buffer.getvalue(), "image/png"
+        image.convert("RGB").save(buffer, format="JPEG", quality=85)
+        return buffer.getvalue(), "image/jpeg"
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Not a readable image: {e}") from e
+
+
+def _store(data, thumbnail, content_type):
+    profile_photos_collection.update_one(
+        {"_id": photo_id_for(data)},
+        {"$setOnInsert": {
+            "data": Binary(data),
+            "size": len(data),
+            "thumbnail": Binary(thumbnail) if thumbnail else None,
+            "thumbnail_type": content_type,
+            "created_at": datetime.now(),
+        }},
+        upsert=True,
+    )
+    return photo_id_for(data)
+
+
+def save_photo(data):
+    """Store a photo and its thumbnail once per distinct content. Returns the photo id."""
+    if len(data) > PHOTO_MAX_BYTES:
+        raise ValueError(f"Photos must be at most {PHOTO_MAX_BYTES // (1024 * 1024)} MB.")
+    photo_id = photo_id_for(data)
+    # Identical photos share one blob; skip the resize when it is already stored
+    if profile_photos_collection.count_documents({"_id": photo_id}, limit=1):
+        return photo_id
+    return _store(data, *make_thumbnail(data))
+
+
+def save_legacy_photo(data):
+    """Store a photo migrated from a user document as is: no size cap, and no thumbnail if Pillow cannot read it."""
+    try:
+        thumbnail, content_type = make_thumbnail(data)
+    except ValueError:
+        thumbnail, content_type = None, None
+    return _store(data, thumbnail, content_type)
+
+
+@st.cache_resource
+def default_photo_id(gender):
+    """Photo id of the stock avatar for a gender, stored on first use."""
+    with open(DEFAULT_PHOTOS.get(gender, DEFAULT_PHOTOS["Female"]), "rb") as f:
+        return save_photo(f.read())
+
+
+class _MissingPhoto(Exception):
+    pass
+
+
+# Photo ids are content hashes, so a cached thumbnail can never go stale
+@st.cache_data(max_entries=PHOTO_CACHE_SIZE, show_spinner=False)
+def _cached_thumbnail(photo_id):
+    photo = profile_photos_collection.find_one({"_id": photo_id}, {"thumbnail": 1})
+    if not photo or not photo.get("thumbnail"):
+        # Raised rather than returned, so st.cache_data does not remember the miss
+        raise _MissingPhoto(photo_id)
+    return bytes(photo["thumbnail"])
+
+
+def get_thumbnail(photo_id):
+    """Thumbnail bytes for a photo id, or None if it is unknown or has no thumbnail."""
+    if not photo_id:
+        return None
+    try:
+        return _cached_thumbnail(photo_id)
+    except _MissingPhoto:
+        return None
+
+
+def _migrate(user):
+    # Returns the stored photo id, or None if the inline photo could not be stored and was left in place
+    inline = user.get("profile_photo")
+    if inline is None:
+        inline = (users_collection.find_one({"_id": user["_id"]}, {"profile_photo": 1}) or {}).get("profile_photo")
+    if not inline:
+        photo_id = default_photo_id(user.get("gender"))
+        users_collection.update_one({"_id": user["_id"]}, {"$set": {"photo_id": photo_id}, "$unset": {"profile_photo": ""}})
+        return photo_id
+    try:
+        photo_id = save_legacy_photo(bytes(inline))
+    except (PyMongoError, InvalidDocument) as e:
+        print(f"Profile photo of user {user['_id']} was not migrated, will retry: {e}")
+        return None
+    # The inline copy is only removed once the photo is safely in the store
+    users_collection.update_one({"_id": user["_id"]}, {"$set": {"photo_id": photo_id}, "$unset": {"profile_photo": ""}})
+    return photo_id
+
+
+def migrate_user_photo(user):
+    """Move a user's inline profile photo into the store. Returns the user's photo id.
+
+    If the photo cannot be stored it stays on the user document and the stock avatar is returned
+    for this session; the next login or migrate_all run tries again.
+    """
+    if user.get("photo_id"):
+        return user["photo_id"]
+    return _migrate(user) or default_photo_id(user.get("gender"))
+
+
+def migrate_all(batch_size=100):
+    """Migrate every user still holding an inline photo. Returns the number of users migrated."""
+    migrated = 0
+    after = None
+    while True:
+        # Paged by _id, so users whose photo could not be stored are skipped rather than retried forever
+        query = {"photo_id": {"$exists": False}}
+        if after is not None:
+            query["_id"] = {"$gt": after}
+        batch = list(users_collection.find(query, {"profile_photo": 1, "gender": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            return migrated
+        migrated += sum(_migrate(user) is not None for user in batch)
+        after = batch[-1]["_id"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move inline profile photos out of user documents into the photo store.")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    print(f"Migrated {migrate_all(args.batch_size)} users")
@@ -0,0 +1,119 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pages.modules.config import get_setting
+from pages.modules.question_bank import add_scenario_set, get_scenario_set
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+# "likely" prefetches the predicted next difficulty, "all" prefetches every candidate, "off" disables prefetching
+PREFETCH_MODE = get_setting("PREFETCH_MODE", "likely")
+PREFETCH_WORKERS = get_setting("PREFETCH_WORKERS", 4, int)
+
+# Shared across all sessions in this Streamlit process
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+_stats = {"hits": 0, "late_hits": 0, "misses": 0, "discarded": 0, "wait_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+def _record(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _generate_quietly(topic, difficulty):
+    """Live generation for worker threads: failures become None instead of UI errors."""
+    # Imported on first use so pages that only import prefetch's helpers skip the generation stack
+    from pages.modules.fanout import request_batch
+    try:
+        return request_batch(topic, difficulty)
+    except Exception as e:
+        print(f"Prefetch generation failed for {topic} ({difficulty}): {e}")
+        return None
+
+
+def _fetch(topics, difficulty):
+    return get_scenario_set(topics, difficulty, generator=_generate_quietly)
+
+
+def predict_next_difficulty(total_answers, batch_size=5):
+    """Guess the next difficulty from the accuracy so far, using the same thresholds as get_next_difficulty."""
+    if not total_answers:
+        return "medium"
+
+    correct = sum(1 for answer in total_answers if answer["user_answer"] == answer["correct_answer"])
+    expected_correct = round(correct / len(total_answers) * batch_size)
+    if expected_correct >= 4:
+        return "hard"
+    elif expected_correct >= 2:
+        return "medium"
+    return "easy"
+
+
+def start_prefetch(topics, total_answers):
+    """Start generating the candidate next batches in the background. Returns {difficulty: Future}."""
+    if PREFETCH_MODE == "off":
+        return {}
+
+    if PREFETCH_MODE == "all":
+        candidates = DIFFICULTIES
+    else:
+        candidates = [predict_next_difficulty(total_answers)]
+
+    return {difficulty: _executor.submit(_fetch, topics, difficulty) for difficulty in candidates}
+
+
+def take_prefetched(futures, topics, difficulty):
+    """Claim the prefetched batch for the chosen difficulty and discard the rest.
+
+    Returns None when nothing was speculated for that difficulty or the speculative call failed.
+    """
+    chosen = futures.pop(difficulty, None)
+    discard_prefetch(futures, topics)
+
+    if chosen is None:
+        _record("misses")
+        return None
+
+    was_ready = chosen.done()
+    started = time.perf_counter()
+    scenario_set = chosen.result()
+
+    if not scenario_set:
+        _record("misses")
+        return None
+
+    _record("hits" if was_ready else "late_hits")
+    _record("wait_seconds", time.perf_counter() - started)
+    return scenario_set
+
+
+def discard_prefetch(futures, topics):
+    """Drop losing speculative batches. Anything already generated goes back into the question bank."""
+    for difficulty, future in futures.items():
+        if future.cancel():
+            continue
+        _record("discarded")
+        future.add_done_callback(lambda f, d=difficulty: _return_to_bank(topics, d, f))
+    futures.clear()
+
+
+def _return_to_bank(topics, difficulty, future):
+    try:
+        scenario_set = future.result()
+        if scenario_set:
+            add_scenario_set(topics, difficulty, scenario_set)
+    except Exception as e:
+        print(f"Could not bank discarded prefetch for {topics} ({difficulty}): {e}")
+
+
+def get_prefetch_stats():
+    """Speculation hit rate and average time spent waiting on a prefetched batch."""
+    with _stats_lock:
+        stats = dict(_stats)
+    claimed = stats["hits"] + stats["late_hits"]
+    requested = claimed + stats["misses"]
+    stats["hit_rate"] = claimed / requested if requested else 0.0
+    stats["avg_wait_seconds"] = stats["wait_seconds"] / claimed if claimed else 0.0
+    return stats
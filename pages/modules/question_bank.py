@@ -0,0 +1,182 @@
+import copy
+import queue
+import threading
+from datetime import datetime
+from db import question_bank_collection
+from pages.modules.config import get_setting
+from pages.modules.quiz_format import normalize_topic, normalize_difficulty, is_valid_scenario_set, scenario_set_events
+
+# Pool sizing, configurable through Streamlit secrets or environment variables
+LOW_WATER_MARK = get_setting("QUESTION_BANK_LOW_WATER_MARK", 2, int)
+TARGET_POOL_SIZE = get_setting("QUESTION_BANK_TARGET_SIZE", 5, int)
+REFILL_ENABLED = get_setting("QUESTION_BANK_REFILL_ENABLED", True, bool)
+
+# Process-wide hit/miss counters
+_stats = {"hits": 0, "misses": 0, "refilled": 0, "refill_failures": 0}
+_stats_lock = threading.Lock()
+
+# Background refill state
+_refill_queue = queue.Queue()
+_queued_keys = set()
+_worker_lock = threading.Lock()
+_worker = None
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def pool_size(topic, difficulty):
+    """Number of banked scenario sets for a (topic, difficulty) pair."""
+    return question_bank_collection.count_documents({
+        "topic": normalize_topic(topic),
+        "difficulty": normalize_difficulty(difficulty),
+    })
+
+
+def add_scenario_set(topic, difficulty, scenario_set):
+    """Store a validated scenario set in the bank. Returns True if it was stored."""
+    if not is_valid_scenario_set(scenario_set):
+        return False
+
+    question_bank_collection.insert_one({
+        "topic": normalize_topic(topic),
+        "difficulty": normalize_difficulty(difficulty),
+        "scenario_set": scenario_set,
+        "created_at": datetime.now(),
+    })
+    return True
+
+
+def take_scenario_set(topic, difficulty):
+    """Atomically remove and return the oldest banked scenario set, or None on a miss."""
+    doc = question_bank_collection.find_one_and_delete(
+        {"topic": normalize_topic(topic), "difficulty": normalize_difficulty(difficulty)},
+        sort=[("created_at", 1)],
+    )
+    if doc is None:
+        return None
+    return doc["scenario_set"]
+
+
+def get_scenario_set(topic, difficulty, generator=None):
+    """Serve a scenario set from the bank, falling back to live generation on a miss.
+
+    `generator` overrides the live fallback; background callers pass one that does not touch the UI.
+    """
+    scenario_set = take_scenario_set(topic, difficulty)
+
+    if scenario_set is not None:
+        _count("hits")
+    else:
+        _count("misses")
+        if generator is None:
+            # The generation stack is only loaded on a miss, so bank hits and stats stay cheap to import
+            from pages.modules.generate_from_topic import generate_mcqs_from_topic as generator
+        scenario_set = generator(topic, difficulty)
+
+    # Top the pool back up for the next caller
+    schedule_refill(topic, difficulty)
+    return copy.deepcopy(scenario_set)
+
+
+def stream_scenario_set(topic, difficulty):
+    """Like get_scenario_set, but yields scenario/question events so pages can render progressively.
+
+    Bank hits replay instantly; misses stream from the LLM as each question completes.
+    """
+    scenario_set = take_scenario_set(topic, difficulty)
+
+    if scenario_set is not None:
+        _count("hits")
+        events = scenario_set_events(scenario_set)
+    else:
+        _count("misses")
+        from pages.modules.fanout import stream_batch
+        events = stream_batch(topic, difficulty)
+
+    try:
+        yield from events
+    finally:
+        schedule_refill(topic, difficulty)
+
+
+def schedule_refill(topic, difficulty):
+    """Queue a background check of the pool, which refills it if it has dropped below the low-water mark.
+
+    The pool is counted on the refill thread, so serving a question never waits on that query.
+    """
+    if not REFILL_ENABLED:
+        return
+
+    key = (normalize_topic(topic), normalize_difficulty(difficulty))
+    with _worker_lock:
+        if key in _queued_keys:
+            return
+        _queued_keys.add(key)
+        _refill_queue.put(key)
+        _ensure_worker()
+
+
+def _ensure_worker():
+    """Start the refill thread on first use (caller holds _worker_lock)."""
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        _worker = threading.Thread(target=_refill_loop, name="question-bank-refill", daemon=True)
+        _worker.start()
+
+
+def _refill_loop():
+    while True:
+        key = _refill_queue.get()
+        try:
+            _refill(*key)
+        except Exception as e:
+            print(f"Question bank refill failed for {key}: {e}")
+        finally:
+            with _worker_lock:
+                _queued_keys.discard(key)
+            _refill_queue.task_done()
+
+
+def _refill(topic, difficulty):
+    """Generate scenario sets until the pool reaches its target size, once it has dropped below the low-water mark."""
+    size = pool_size(topic, difficulty)
+    if size >= LOW_WATER_MARK:
+        return
+    from pages.modules.fanout import request_batch
+    for _ in range(TARGET_POOL_SIZE - size):
+        try:
+            scenario_set = request_batch(topic, difficulty, coalesce=False)
+        except Exception as e:
+            _count("refill_failures")
+            print(f"Question bank generation failed for {topic} ({difficulty}): {e}")
+            continue
+
+        if add_scenario_set(topic, difficulty, scenario_set):
+            _count("refilled")
+        else:
+            _count("refill_failures")
+
+
+def get_bank_stats():
+    """Snapshot of the hit/miss counters plus the derived hit rate."""
+    with _stats_lock:
+        stats = dict(_stats)
+    served = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / served if served else 0.0
+    stats["refill_queue"] = _refill_queue.qsize()  # Pools waiting to be checked or refilled
+    return stats
+
+
+def get_pool_sizes():
+    """Per (topic, difficulty) pool sizes, for the admin dashboard."""
+    pipeline = [
+        {"$group": {"_id": {"topic": "$topic", "difficulty": "$difficulty"}, "count": {"$sum": 1}}},
+        {"$sort": {"_id.topic": 1, "_id.difficulty": 1}},
+    ]
+    return [
+        {"topic": row["_id"]["topic"], "difficulty": row["_id"]["difficulty"], "count": row["count"]}
+        for row in question_bank_collection.aggregate(pipeline)
+    ]
@@ -0,0 +1,54 @@
+import streamlit as st
+from db import db, quiz_collection
+from pages.modules.config import get_setting
+
+attempts_collection = db["quiz_attempts"]
+
+# Quizzes per dashboard page; a multiple of the four cards per row keeps the grid full
+CATALOG_PAGE_SIZE = get_setting("CATALOG_PAGE_SIZE", 24, int)
+
+# Fields shown on a quiz card; the questions are only loaded once a quiz is opened
+CARD_FIELDS = {"selected_topic": 1, "difficulty": 1, "total_questions": 1, "created_at": 1}
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_catalog_options():
+    """Topics and difficulties present in the catalog, for the dashboard filters."""
+    # Both answered from the (selected_topic, ...) and (difficulty, ...) indexes
+    topics = sorted(topic for topic in quiz_collection.distinct("selected_topic") if topic)
+    difficulties = sorted(difficulty for difficulty in quiz_collection.distinct("difficulty") if difficulty)
+    return topics, difficulties
+
+
+def get_quiz_page(topic=None, difficulty=None, before=None, limit=CATALOG_PAGE_SIZE):
+    """Fetch one page of quiz cards, newest first.
+
+    Returns (quizzes, next_before); pass next_before back as `before` for the following page. It is None on the last page.
+    """
+    query = {}
+    if topic:
+        query["selected_topic"] = topic
+    if difficulty:
+        query["difficulty"] = difficulty
+    if before is not None:
+        query["_id"] = {"$lt": before}
+    quizzes = list(quiz_collection.find(query, CARD_FIELDS).sort("_id", -1).limit(limit + 1))
+    if len(quizzes) > limit:
+        return quizzes[:limit], quizzes[limit - 1]["_id"]
+    return quizzes, None
+
+
+def get_attempted_quiz_ids(username, quiz_ids):
+    """The subset of quiz_ids the user has attempted, in one query covered by the (quiz_id, attempted_by) index."""
+    if not quiz_ids:
+        return set()
+    attempts = attempts_collection.find(
+        {"quiz_id": {"$in": list(quiz_ids)}, "attempted_by": username},
+        {"_id": 0, "quiz_id": 1}
+    )
+    return {attempt["quiz_id"] for attempt in attempts}
+
+
+def load_quiz(quiz_id):
+    """The full quiz, questions included, for a quiz being attempted."""
+    return quiz_collection.find_one({"_id": quiz_id})
@@ -0,0 +1,97 @@
+import copy
+import random
+import re
+
+# Matches option labels such as "a) ", "B. " or "c: "
+_CHOICE_LABEL_RE = re.compile(r"^\s*([a-dA-D])\s*[\).:]\s*")
+
+
+def normalize_topic(topic):
+    """Build a stable key from a single topic or a list of topics."""
+    if isinstance(topic, (list, tuple, set)):
+        return " + ".join(sorted(str(t).strip() for t in topic))
+    return str(topic).strip()
+
+
+def normalize_difficulty(difficulty):
+    """Difficulties arrive as 'Easy' from admin forms and 'easy' from the adaptive quiz."""
+    return str(difficulty).strip().lower()
+
+
+def is_valid_scenario_set(scenario_set):
+    """Check that generated data has the scenario/questions shape the quiz pages expect."""
+    if not isinstance(scenario_set, list) or not scenario_set:
+        return False
+
+    for scenario in scenario_set:
+        if not isinstance(scenario, dict) or not scenario.get("scenario"):
+            return False
+        questions = scenario.get("questions")
+        if not isinstance(questions, list) or not questions:
+            return False
+        for question in questions:
+            if not isinstance(question, dict) or not question.get("question"):
+                return False
+            choices = question.get("choices")
+            if not isinstance(choices, list) or len(choices) != 4:
+                return False
+            if question.get("answer") not in choices:
+                return False
+    return True
+
+
+def shuffle_choices(question, rng=random):
+    """Return a copy of an MCQ with its choices reordered and relabelled a)-d), keeping the answer in sync.
+
+    Questions whose answer cannot be located among the choices are returned unchanged.
+    """
+    question = copy.deepcopy(question)
+    choices = question.get("choices")
+    answer = question.get("answer")
+    if not isinstance(choices, list) or answer not in choices:
+        return question
+
+    texts = [_CHOICE_LABEL_RE.sub("", choice, count=1) for choice in choices]
+    labelled = all(_CHOICE_LABEL_RE.match(choice) for choice in choices)
+
+    order = list(range(len(choices)))
+    rng.shuffle(order)
+    answer_idx = choices.index(answer)
+
+    if labelled:
+        new_choices = [f"{chr(ord('a') + pos)}) {texts[old]}" for pos, old in enumerate(order)]
+    else:
+        new_choices = [choices[old] for old in order]
+
+    question["choices"] = new_choices
+    question["answer"] = new_choices[order.index(answer_idx)]
+    return question
+
+
+def shuffle_scenario_set(scenario_set, shuffle_questions=False, shuffle_choice_order=True, rng=random):
+    """Return a copy of a scenario set with question and/or choice order shuffled."""
+    shuffled = copy.deepcopy(scenario_set)
+    for scenario in shuffled:
+        questions = scenario.get("questions", [])
+        if shuffle_questions:
+            rng.shuffle(questions)
+        if shuffle_choice_order:
+            scenario["questions"] = [shuffle_choices(question, rng) for question in questions]
+    return shuffled
+
+
+def scenario_set_events(scenario_set):
+    """Replay a complete scenario set as the same events stream_mcqs_from_topic produces."""
+    for scenario in scenario_set:
+        yield "scenario", scenario.get("scenario", "No scenario provided.")
+        for question in scenario.get("questions", []):
+            yield "question", question
+
+
+def flatten_scenario_set(scenario_set):
+    """List every question of a scenario set, each tagged with the text of its scenario."""
+    return [
+        dict(question, scenario=scenario.get("scenario", "No scenario provided."))
+        for scenario in scenario_set
+        for question in scenario.get("questions", [])
+    ]
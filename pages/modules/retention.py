@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
+from db import quiz_result_summaries_collection, quiz_results_collection
+from pages.modules.config import get_setting
+from pages.modules.feedback_worker import FEEDBACK_PENDING
+
+# Retention settings, configurable through Streamlit secrets or environment variables
+# Results stay in quiz_results for at least this many days; a month is compacted once all of it is older
+RETENTION_HOT_DAYS = get_setting("RETENTION_HOT_DAYS", 90, int)
+# Directory of the Parquet archive; shared by the compaction job and the report page
+RETENTION_ARCHIVE_DIR = get_setting("RETENTION_ARCHIVE_DIR", "results_archive")
+RETENTION_BATCH_SIZE = get_setting("RETENTION_BATCH_SIZE", 500, int)
+
+DIFFICULTIES = ("easy", "medium", "hard")
+RESULT_FIELDS = ("question", "user_answer", "correct_answer", "difficulty")
+_UNSAFE_NAME_RE = re.compile(r"[^\w.-]+")
+
+
+def month_of(started_at):
+    return f"{started_at:%Y-%m}"
+
+
+def compaction_cutoff(now=None, hot_days=None):
+    """Start of the newest month that is entirely older than RETENTION_HOT_DAYS; results before it are compacted."""
+    oldest_hot = (now or datetime.now()) - timedelta(days=RETENTION_HOT_DAYS if hot_days is None else hot_days)
+    return datetime(oldest_hot.year, oldest_hot.month, 1)
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+def _archive_schema():
+    # pyarrow is imported on first use, so the report page only loads it when an archive is opened
+    import pyarrow as pa
+    result = pa.struct([(field, pa.string()) for field in RESULT_FIELDS])
+    return pa.schema([
+        ("_id", pa.string()),
+        ("username", pa.string()),
+        ("quiz_started_at", pa.timestamp("ms")),
+        ("selected_topics", pa.list_(pa.string())),
+        ("total_correct", pa.int64()),
+        ("total_questions", pa.int64()),
+        ("feedback_source", pa.string()),
+        ("feedback", pa.string()),  # JSON; its shape differs between rule-based and LLM feedback
+        ("results", pa.list_(result)),
+    ])
+
+
+def _archive_row(doc):
+    results = doc.get("results") or []
+    return {
+        "_id": str(doc["_id"]),
+        "username": doc["username"],
+        "quiz_started_at": doc["quiz_started_at"],
+        "selected_topics": [str(topic) for topic in doc.get("selected_topics") or []],
+        "total_correct": doc.get("total_correct", 0),
+        "total_questions": doc.get("total_questions") or len(results),
+        "feedback_source": doc.get("feedback_source"),
+        "feedback": json.dumps(doc["feedback"]) if doc.get("feedback") else None,
+        "results": [{field: _text(result.get(field)) for field in RESULT_FIELDS} for result in results],
+    }
+
+
+def part_path(username, month, docs):
+    """Archive file for a group of results, relative to RETENTION_ARCHIVE_DIR; the same results always map to the same file."""
+    digest = hashlib.sha1(",".join(sorted(str(doc["_id"]) for doc in docs)).encode()).hexdigest()[:16]
+    return f"{month}/{_UNSAFE_NAME_RE.sub('_', username)}-{digest}.parquet"
+
+
+def write_part(path, docs):
+    """Write results to a zstd-compressed Parquet file. Returns its size in bytes."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    full_path = os.path.join(RETENTION_ARCHIVE_DIR, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    table = pa.Table.from_pylist([_archive_row(doc) for doc in docs], schema=_archive_schema())
+    # Written aside and renamed, so a reader never sees a partial file
+    pq.write_table(table, full_path + ".tmp", compression="zstd")
+    os.replace(full_path + ".tmp", full_path)
+    return os.path.getsize(full_path)
+
+
+def read_parts(paths):
+    """Archived results stored in the given parts, newest first, shaped like quiz_results documents."""
+    import pyarrow.parquet as pq
+    results = {}
+    for path in paths:
+        full_path = os.path.join(RETENTION_ARCHIVE_DIR, path)
+        if not os.path.exists(full_path):
+            print(f"Archive part {path} is missing")
+            continue
+        for row in pq.read_table(full_path).to_pylist():
+            row["feedback"] = json.loads(row["feedback"]) if row["feedback"] else None
+            # A part cut short before all its results were tagged is archived again with the rest
+            results[row["_id"]] = row
+    return sorted(results.values(), key=lambda row: row["quiz_started_at"], reverse=True)
+
+
+def _summary_update(docs, path):
+    counts = {"attempts": len(docs), "total_correct": 0, "total_questions": 0}
+    for difficulty in DIFFICULTIES:
+        counts[f"by_difficulty.{difficulty}.correct"] = 0
+        counts[f"by_difficulty.{difficulty}.total"] = 0
+    topics = set()
+    for doc in docs:
+        results = doc.get("results") or []
+        counts["total_correct"] += doc.get("total_correct", 0)
+        counts["total_questions"] += doc.get("total_questions") or len(results)
+        topics.update(doc.get("selected_topics") or [])
+        for result in results:
+            if result.get("difficulty") in DIFFICULTIES:
+                counts[f"by_difficulty.{result['difficulty']}.total"] += 1
+                counts[f"by_difficulty.{result['difficulty']}.correct"] += result.get("user_answer") == result.get("correct_answer")
+    started = [doc["quiz_started_at"] for doc in docs]
+    return {
+        "$inc": counts,
+        "$min": {"first_attempt_at": min(started)},
+        "$max": {"last_attempt_at": max(started), "best_correct": max(doc.get("total_correct", 0) for doc in docs)},
+        "$addToSet": {"topics": {"$each": sorted(topics)}},
+        "$push": {"parts": path},
+    }
+
+
+def _apply_part(username, month, path, docs):
+    """Fold archived results into their monthly summary, then drop them from quiz_results. Safe to repeat."""
+    try:
+        # Each part is counted once: a summary that already lists it does not match, and the upsert collides on _id
+        quiz_result_summaries_collection.update_one(
+            {"_id": f"{username}/{month}", "parts": {"$ne": path}},
+            {**_summary_update(docs, path), "$setOnInsert": {"username": username, "month": month}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        pass
+    quiz_results_collection.delete_many({"archived_in": path})
+
+
+def _compact_group(username, month, docs, stats):
+    path = part_path(username, month, docs)
+    stats["bytes"] += write_part(path, docs)
+    # Tagged only once the part is on disk, so a rerun can finish the part from the tagged results alone
+    quiz_results_collection.update_many({"_id": {"$in": [doc["_id"] for doc in docs]}}, {"$set": {"archived_in": path}})
+    _apply_part(username, month, path, docs)
+    stats["results"] += len(docs)
+    stats["parts"] += 1
+
+
+def compact_results(now=None, hot_days=None, batch_size=None):
+    """Move results from months older than RETENTION_HOT_DAYS into monthly summaries and the Parquet archive.
+
+    Results are grouped per user and month. Each group is written to one Parquet part, tagged with
+    it, folded into the user's summary for that month and deleted from quiz_results. Parts left
+    half-applied by an interrupted run are finished first. Results whose feedback is still being
+    generated wait for the next run. Returns the compaction counters.
+    """
+    stats = {"results": 0, "parts": 0, "resumed": 0, "bytes": 0}
+    started = time.perf_counter()
+    for path in quiz_results_collection.distinct("archived_in"):
+        docs = list(quiz_results_collection.find({"archived_in": path}))
+        if docs:
+            _apply_part(docs[0]["username"], month_of(docs[0]["quiz_started_at"]), path, docs)
+            stats["resumed"] += 1
+
+    cutoff = compaction_cutoff(now, hot_days)
+    query = {
+        "quiz_started_at": {"$lt": cutoff},
+        "archived_in": {"$exists": False},
+        "feedback_status": {"$ne": FEEDBACK_PENDING},
+    }
+    # Served by the (username, quiz_started_at) index, so each user's months arrive together
+    cursor = quiz_results_collection.find(query).sort([("username", 1), ("quiz_started_at", DESCENDING)])
+    group_key, group = None, []
+    for doc in cursor.batch_size(batch_size or RETENTION_BATCH_SIZE):
+        key = (doc["username"], month_of(doc["quiz_started_at"]))
+        if key != group_key and group:
+            _compact_group(*group_key, group, stats)
+            group = []
+        group_key = key
+        group.append(doc)
+    if group:
+        _compact_group(*group_key, group, stats)
+
+    stats["cutoff"] = cutoff
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def get_monthly_summaries(username):
+    """A user's compacted history, one summary per month, newest first."""
+    return list(quiz_result_summaries_collection.find({"username": username}).sort("month", DESCENDING))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact old quiz results into monthly summaries and a Parquet archive.")
+    parser.add_argument("--hot-days", type=int, default=RETENTION_HOT_DAYS, help="keep results at least this many days")
+    parser.add_argument("--batch-size", type=int, default=RETENTION_BATCH_SIZE)
+    args = parser.parse_args()
+
+    result = compact_results(hot_days=args.hot_days, batch_size=args.batch_size)
+    print(
+        f"Archived {result['results']} results from before {result['cutoff']:%Y-%m-%d} into {result['parts']} parts "
+        f"({result['bytes'] / 1024:.1f} KiB, {result['resumed']} interrupted parts finished) in {result['seconds']:.1f}s"
+    )
@@ -0,0 +1,69 @@
+from typing import List
+from pydantic import BaseModel, ConfigDict, field_validator
+
+
+class MCQ(BaseModel):
+    """A single multiple-choice question; `answer` is the full text of one of the four choices."""
+
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
+    question: str
+    choices: List[str]
+    answer: str
+
+    @field_validator("question", "answer")
+    @classmethod
+    def not_blank(cls, value):
+        if not value:
+            raise ValueError("must not be blank")
+        return value
+
+    @field_validator("choices")
+    @classmethod
+    def four_choices(cls, value):
+        if len(value) != 4 or any(not choice for choice in value):
+            raise ValueError("expected exactly four non-empty choices")
+        return value
+
+
+class Scenario(BaseModel):
+    """A scenario description and the questions generated for it."""
+
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
+    scenario: str
+    questions: List[MCQ]
+
+    @field_validator("scenario")
+    @classmethod
+    def not_blank(cls, value):
+        if not value:
+            raise ValueError("must not be blank")
+        return value
+
+    @field_validator("questions")
+    @classmethod
+    def has_questions(cls, value):
+        if not value:
+            raise ValueError("expected at least one question")
+        return value
+
+
+class CorrectVsIncorrect(BaseModel):
+    model_config = ConfigDict(extra="ignore", coerce_numbers_to_str=True)
+
+    correct_count: str
+    incorrect_count: str
+    analysis: str
+
+
+class Feedback(BaseModel):
+    """Personalised feedback returned by the feedback chain and stored on quiz results."""
+
+    model_config = ConfigDict(extra="ignore")
+
+    overall_performance: str
+    correct_vs_incorrect: CorrectVsIncorrect
+    areas_of_improvement: str
+    topic_specific_feedback: str
+    next_steps: str
@@ -0,0 +1,125 @@
+import threading
+
+
+class _Call:
+    """One in-flight call and everything its callers need to share its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.callers = 1
+
+
+class _Broadcast:
+    """An in-flight stream whose items are replayed to every caller as they arrive."""
+
+    def __init__(self):
+        self.items = []
+        self.finished = False
+        self.error = None
+        self.callers = 1
+        self.condition = threading.Condition()
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls so only one of them does the work.
+
+    Callers that arrive while a call for the same key is running wait for it and receive
+    its outcome instead of starting their own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self._stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def do(self, key, fn):
+        """Run fn() once per key at a time. Returns (result, shared) where shared means another caller ran it."""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.callers += 1
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats["executed"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stream(self, key, fn):
+        """Iterate fn() once per key at a time, replaying every item to all concurrent callers.
+
+        Yields (item, shared) pairs. The source is drained by a background thread so a slow
+        caller never holds up the others.
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            broadcast = self._streams.get(key)
+            if broadcast is not None:
+                broadcast.callers += 1
+                self._stats["coalesced"] += 1
+                shared = True
+            else:
+                broadcast = self._streams[key] = _Broadcast()
+                self._stats["executed"] += 1
+                shared = False
+                threading.Thread(target=self._pump, args=(key, broadcast, fn), name="singleflight-stream", daemon=True).start()
+
+        position = 0
+        while True:
+            with broadcast.condition:
+                while position >= len(broadcast.items) and not broadcast.finished:
+                    broadcast.condition.wait()
+                pending = broadcast.items[position:]
+                finished = broadcast.finished
+            for item in pending:
+                yield item, shared
+            position += len(pending)
+            if finished and position >= len(broadcast.items):
+                break
+
+        if broadcast.error is not None:
+            raise broadcast.error
+
+    def _pump(self, key, broadcast, fn):
+        try:
+            for item in fn():
+                with broadcast.condition:
+                    broadcast.items.append(item)
+                    broadcast.condition.notify_all()
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            # Late arrivals after this point start a fresh call
+            with self._lock:
+                del self._streams[key]
+            with broadcast.condition:
+                broadcast.finished = True
+                broadcast.condition.notify_all()
+
+    def stats(self):
+        """Counters for how many calls ran versus were served by another caller's work."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["coalesced_rate"] = stats["coalesced"] / stats["calls"] if stats["calls"] else 0.0
+        return stats
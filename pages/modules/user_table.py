@@ -0,0 +1,50 @@
+import streamlit as st
+from db import find_users, USER_LIST_FIELDS
+
+COLUMNS = [field for field in USER_LIST_FIELDS if field != "_id"]
+
+
+def _pages(key, filters):
+    # Stack of `after` cursors for the pages visited so far; reset whenever the filters change
+    state = st.session_state.setdefault(key, {"filters": None, "cursors": [None]})
+    if state["filters"] != filters:
+        state["filters"] = filters
+        state["cursors"] = [None]
+    return state["cursors"]
+
+
+def user_page_loader(key, role=None, status=None, search=None):
+    """A zero-argument read of the page the table `key` is showing, for db.parallel_reads."""
+    after = _pages(key, (role, status, search))[-1]
+    return lambda: find_users(role=role, status=status, search=search, after=after)
+
+
+def paged_user_table(key, page, selectable=False):
+    """Show a page from user_page_loader with Previous/Next buttons. Returns the users on the page and the selected ones."""
+    cursors = st.session_state[key]["cursors"]
+    users, next_after = page
+
+    if not users:
+        st.info("No users found.")
+        return users, []
+
+    rows = [{column: user.get(column) for column in COLUMNS} for user in users]
+    if selectable:
+        event = st.dataframe(rows, use_container_width=True, key=f"{key}_table", on_select="rerun", selection_mode="multi-row")
+        selected = [users[index] for index in event.selection["rows"]]
+    else:
+        st.dataframe(rows, use_container_width=True)
+        selected = []
+
+    col1, col2, col3 = st.columns([0.15, 0.15, 1])
+    with col1:
+        if st.button("Previous", key=f"{key}_previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if st.button("Next", key=f"{key}_next", disabled=next_after is None):
+            cursors.append(next_after)
+            st.rerun()
+    with col3:
+        st.caption(f"Page {len(cursors)}")
+    return users, selected
@@ -0,0 +1,307 @@
+import atexit
+import fcntl
+import glob
+import os
+import threading
+import time
+import uuid
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError, PyMongoError
+from db import db
+from pages.modules.config import get_setting
+from pages.modules.metrics import (
+    write_behind_dead_lettered,
+    write_behind_documents,
+    write_behind_flush_errors,
+    write_behind_flush_seconds,
+    write_behind_log_seconds,
+    write_behind_queue_depth,
+)
+
+# Write-behind settings, configurable through Streamlit secrets or environment variables
+WRITE_BEHIND_ENABLED = get_setting("WRITE_BEHIND_ENABLED", True, bool)
+# Directory of the local submission log; must be on persistent storage for crash replay to work
+WRITE_BEHIND_DIR = get_setting("WRITE_BEHIND_DIR", "write_behind_log")
+# Longest time, in seconds, an acknowledged submission waits before it is written to MongoDB
+WRITE_BEHIND_FLUSH_INTERVAL = get_setting("WRITE_BEHIND_FLUSH_INTERVAL", 1.0, float)
+# A flush starts early once this many submissions are waiting; also the insert_many batch size
+WRITE_BEHIND_BATCH_SIZE = get_setting("WRITE_BEHIND_BATCH_SIZE", 500, int)
+
+DUPLICATE_KEY = 11000
+# Documents MongoDB rejects are moved here, one file per collection; replay does not look in subdirectories
+DEAD_LETTER_DIR = os.path.join(WRITE_BEHIND_DIR, "dead_letter")
+# Logged datetimes come back naive, exactly as the submitting page created them
+_LOAD_OPTIONS = json_util.JSONOptions(tz_aware=False)
+
+_cond = threading.Condition()
+_flush_lock = threading.Lock()
+_active = None  # Segment new submissions are appended to
+_sealed = []  # Segments waiting to be written to MongoDB, oldest first
+_replay_hooks = {}  # collection -> called with each document replayed into it
+_started = False
+
+_stats = {"logged": 0, "flushed": 0, "replayed": 0, "dead_lettered": 0, "flushes": 0, "flush_errors": 0, "flush_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _open_segment():
+    # Unique per process, so concurrent Streamlit processes can share the directory
+    path = os.path.join(WRITE_BEHIND_DIR, f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl")
+    # Created under a name replay ignores and only renamed once locked, so replay never sees it unlocked
+    file = open(path + ".tmp", "a", encoding="utf-8")
+    # Held until the segment is deleted; replay skips segments whose owner is still alive
+    fcntl.flock(file, fcntl.LOCK_EX)
+    os.rename(path + ".tmp", path)
+    return {"path": path, "file": file, "records": []}
+
+
+def _close_segment(segment):
+    try:
+        os.remove(segment["path"])
+    except FileNotFoundError:
+        pass
+    segment["file"].close()
+
+
+def _depth():
+    with _cond:
+        segments = _sealed + ([_active] if _active else [])
+        return sum(len(segment["records"]) for segment in segments)
+
+
+write_behind_queue_depth.set_function(_depth)
+
+
+def start_write_behind(replay_hooks=None):
+    """Open this process's log and start the flusher thread, once per process. Returns True if write-behind is on.
+
+    `replay_hooks` maps a collection to a function called with each document replayed into it
+    after a crash, standing in for the `on_flushed` callbacks that were lost with the process.
+    """
+    global _active, _started
+    if not WRITE_BEHIND_ENABLED:
+        return False
+    with _cond:
+        _replay_hooks.update(replay_hooks or {})
+        if _started:
+            return True
+        os.makedirs(WRITE_BEHIND_DIR, exist_ok=True)
+        _active = _open_segment()
+        _started = True
+    threading.Thread(target=_run, name="write-behind", daemon=True).start()
+    # Best effort on a clean shutdown; anything left over is replayed on the next start
+    atexit.register(flush)
+    return True
+
+
+def enqueue(collection, doc, on_flushed=None):
+    """Durably log a document for insertion into `collection` and return its _id.
+
+    The _id is assigned here, so callers can refer to the document straight away, and the log is
+    fsynced before returning. The insert itself happens within WRITE_BEHIND_FLUSH_INTERVAL, batched
+    with other submissions; `on_flushed` is then called on the flusher thread. Callbacks are lost
+    with a crashed process, so replayed documents go to the start_write_behind `replay_hooks` instead.
+    """
+    doc.setdefault("_id", ObjectId())
+    if not start_write_behind():
+        db[collection].insert_one(doc)
+        if on_flushed:
+            on_flushed()
+        return doc["_id"]
+
+    line = json_util.dumps({"collection": collection, "doc": doc}, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n"
+    started = time.perf_counter()
+    with _cond:
+        file = _active["file"]
+        file.write(line)
+        file.flush()
+        os.fsync(file.fileno())
+        _active["records"].append((collection, doc, on_flushed))
+        if len(_active["records"]) >= WRITE_BEHIND_BATCH_SIZE:
+            _cond.notify()
+    write_behind_log_seconds.observe(time.perf_counter() - started)
+    _count("logged")
+    return doc["_id"]
+
+
+def _dead_letter(collection, rejected):
+    """Append documents MongoDB rejected, with the reason, to the collection's dead-letter file."""
+    os.makedirs(DEAD_LETTER_DIR, exist_ok=True)
+    lines = "".join(
+        json_util.dumps(
+            {"collection": collection, "doc": doc, "code": error.get("code"), "error": error.get("errmsg")},
+            json_options=json_util.RELAXED_JSON_OPTIONS,
+        ) + "\n"
+        for doc, error in rejected
+    )
+    with open(os.path.join(DEAD_LETTER_DIR, f"{collection}.jsonl"), "a", encoding="utf-8") as file:
+        # Shared with the other processes logging into the same directory
+        fcntl.flock(file, fcntl.LOCK_EX)
+        file.write(lines)
+        file.flush()
+        os.fsync(file.fileno())
+    write_behind_dead_lettered.labels(collection=collection).inc(len(rejected))
+    _count("dead_lettered", len(rejected))
+    print(f"Write-behind moved {len(rejected)} rejected {collection} documents to {DEAD_LETTER_DIR}")
+
+
+def _insert(records, source):
+    """Write records to MongoDB. Returns the _ids of documents MongoDB rejected, which were dead-lettered instead.
+
+    Connection and write concern errors are raised, so the caller keeps the whole log for a retry.
+    """
+    by_collection = {}
+    for collection, doc, _ in records:
+        by_collection.setdefault(collection, []).append(doc)
+    rejected_ids = set()
+    for collection, docs in by_collection.items():
+        for start in range(0, len(docs), WRITE_BEHIND_BATCH_SIZE):
+            batch = docs[start:start + WRITE_BEHIND_BATCH_SIZE]
+            started = time.perf_counter()
+            rejected = []
+            try:
+                db[collection].insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                if e.details.get("writeConcernErrors"):
+                    raise
+                # Documents written by an earlier flush or replay that was cut short are already there;
+                # anything else (a failed validator, an oversized document) would fail on every retry
+                rejected = [
+                    (batch[error["index"]], error)
+                    for error in e.details.get("writeErrors", [])
+                    if error.get("code") != DUPLICATE_KEY
+                ]
+            if rejected:
+                _dead_letter(collection, rejected)
+                rejected_ids.update(doc["_id"] for doc, _ in rejected)
+            write_behind_flush_seconds.observe(time.perf_counter() - started)
+            write_behind_documents.labels(collection=collection, source=source).inc(len(batch) - len(rejected))
+    return rejected_ids
+
+
+def flush():
+    """Write every logged submission to MongoDB. Returns the number written.
+
+    If MongoDB cannot be reached the submissions are kept for the next flush; documents it rejects
+    are moved to the dead-letter directory so they cannot hold up the rest of the log.
+    """
+    global _active
+    with _flush_lock:
+        with _cond:
+            if _active and _active["records"]:
+                _sealed.append(_active)
+                _active = _open_segment()
+            segments = list(_sealed)
+        records = [record for segment in segments for record in segment["records"]]
+        if not records:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            rejected = _insert(records, "live")
+        except PyMongoError as e:
+            write_behind_flush_errors.inc()
+            _count("flush_errors")
+            print(f"Write-behind flush of {len(records)} documents failed, will retry: {e}")
+            return 0
+
+        with _cond:
+            del _sealed[:len(segments)]
+        for segment in segments:
+            _close_segment(segment)
+        _count("flushed", len(records) - len(rejected))
+        _count("flushes")
+        _count("flush_seconds", time.perf_counter() - started)
+
+    for _, doc, on_flushed in records:
+        if on_flushed and doc["_id"] not in rejected:
+            try:
+                on_flushed()
+            except Exception as e:
+                print(f"Write-behind callback failed: {e}")
+    return len(records) - len(rejected)
+
+
+def _read_segment(file):
+    records = []
+    for line in file:
+        try:
+            record = json_util.loads(line, json_options=_LOAD_OPTIONS)
+        except ValueError:
+            # A torn last line was never fsynced, so its submission was never acknowledged
+            continue
+        records.append((record["collection"], record["doc"], None))
+    return records
+
+
+def replay_orphaned_segments():
+    """Insert the submissions logged by processes that died before flushing them. Returns True once none are left."""
+    with _cond:
+        own = {segment["path"] for segment in _sealed + ([_active] if _active else [])}
+    for path in sorted(glob.glob(os.path.join(WRITE_BEHIND_DIR, "*.jsonl"))):
+        if path in own:
+            continue
+        try:
+            file = open(path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            continue  # Flushed by its owner in the meantime
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            file.close()  # Its owner is still running
+            continue
+
+        records = _read_segment(file)
+        try:
+            rejected = _insert(records, "replay")
+        except PyMongoError as e:
+            file.close()
+            write_behind_flush_errors.inc()
+            _count("flush_errors")
+            print(f"Write-behind replay of {path} failed, will retry: {e}")
+            return False
+        _close_segment({"path": path, "file": file})
+        _count("replayed", len(records) - len(rejected))
+        if records:
+            print(f"Replayed {len(records)} logged submissions from {path}")
+        for collection, doc, _ in records:
+            if collection in _replay_hooks and doc["_id"] not in rejected:
+                try:
+                    _replay_hooks[collection](doc)
+                except Exception as e:
+                    print(f"Write-behind replay hook failed: {e}")
+    return True
+
+
+def _run():
+    replayed = False
+    while True:
+        with _cond:
+            if _active is None or len(_active["records"]) < WRITE_BEHIND_BATCH_SIZE:
+                _cond.wait(WRITE_BEHIND_FLUSH_INTERVAL)
+        try:
+            if not replayed:
+                replayed = replay_orphaned_segments()
+            if not flush() and _depth():
+                # MongoDB is unreachable; back off rather than spinning on a full buffer
+                time.sleep(WRITE_BEHIND_FLUSH_INTERVAL)
+        except Exception as e:
+            # Anything else (a full disk, an unencodable document) must not stop the flusher for good
+            write_behind_flush_errors.inc()
+            _count("flush_errors")
+            print(f"Write-behind flusher failed, will retry: {type(e).__name__}: {e}")
+            time.sleep(WRITE_BEHIND_FLUSH_INTERVAL)
+
+
+def get_write_behind_stats():
+    """Write-behind counters for this process."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["depth"] = _depth()
+    stats["avg_flush_seconds"] = stats["flush_seconds"] / stats["flushes"] if stats["flushes"] else 0.0
+    return stats
@@ -1,14 +1,18 @@
 import streamlit as st
-import json
 from datetime import datetime
-from pages.modules.generate_from_topic import generate_mcqs_from_topic
-from db import db
-
-# MongoDB collections
-quiz_collection = db["challenge_quiz"]  # Quiz collection
-challenges_collection = db["challenges"]  # Challenges collection
-attempts_collection = db["challenge_attempts"]  # Challenge attempts collection
-users_collection = db["users"]  # Users collection
+from pages.modules.question_bank import stream_scenario_set
+from db import parallel_reads
+from pages.modules.challenge_repo import (
+    attempts_collection,
+    challenge_quiz_collection as quiz_collection,
+    challenges_collection,
+    get_completed_challenges,
+    get_opponent_names,
+    get_pending_challenges,
+    load_challenge_quiz,
+    record_challenge_completion,
+)
+from pages.modules.write_behind import enqueue
 
 # Initialize session state
 if "selected_quiz" not in st.session_state:
@@ -28,58 +32,61 @@ def reset_quiz_state():
     st.session_state.quiz_id = None
     st.rerun()  # Refresh the page to reset the state
 
-# Function to generate and store MCQs
-def generate_and_store_mcqs(selected_topic, selected_difficulty):
-    if selected_topic and selected_difficulty:
-        with st.spinner(f"Generating MCQs for '{selected_topic}' at '{selected_difficulty}' level. Please wait..."):
-            mcq_data = generate_mcqs_from_topic(selected_topic, difficulty=selected_difficulty)
-
-        if mcq_data:
-            if isinstance(mcq_data, list):
-                quiz_data = mcq_data
-            else:
-                quiz_data = json.loads(mcq_data)  # Assuming MCQ data might be a JSON string
-
-            total_questions = sum(len(scenario.get("questions", [])) for scenario in quiz_data)
+# Function to store a generated quiz
+def store_challenge_quiz(selected_topic, selected_difficulty, quiz_data):
+    total_questions = sum(len(scenario.get("questions", [])) for scenario in quiz_data)
 
-            quiz_doc = {
-                "selected_topic": selected_topic,
-                "difficulty": selected_difficulty,
-                "created_at": datetime.now(),
-                "total_questions": total_questions,
-                "quiz_data": quiz_data
-            }
+    quiz_doc = {
+        "selected_topic": selected_topic,
+        "difficulty": selected_difficulty,
+        "created_at": datetime.now(),
+        "total_questions": total_questions,
+        "quiz_data": quiz_data
+    }
 
-            result = quiz_collection.insert_one(quiz_doc)
+    result = quiz_collection.insert_one(quiz_doc)
 
-            if result.inserted_id:
-                return result.inserted_id  # Return the generated quiz's ID
-            else:
-                st.toast("Failed to generate MCQs. Please try again.", icon="❌")
-        else:
-            st.toast("Failed to generate MCQs. Please try again.", icon="❌")
-    else:
-        st.toast("Please select both a topic and a difficulty level before generating a quiz.", icon="⚠️")
+    if result.inserted_id:
+        return result.inserted_id  # Return the generated quiz's ID
+    st.toast("Failed to generate MCQs. Please try again.", icon="❌")
     return None
 
-def attempt_challenge_tab():
-    username = st.session_state.username  # Get the current username from session state
-    
-    # Fetch challenges where the current user is either the challenger or opponent and status is "pending"
-    pending_challenges = list(challenges_collection.find({
-        "$or": [
-            {"challenger": username},
-            {"opponent": username}
-        ],
-        "status": "pending"
-    }))
-
-    # Filter out challenges that the user has already completed
-    pending_challenges = [
-        challenge for challenge in pending_challenges
-        if username not in challenge.get("completed_by", [])
-    ]
-
+# Function to generate and store MCQs, previewing the questions as they stream in
+def generate_and_store_mcqs(selected_topic, selected_difficulty):
+    if not (selected_topic and selected_difficulty):
+        st.toast("Please select both a topic and a difficulty level before generating a quiz.", icon="⚠️")
+        return None
+
+    # Imported here: it loads the generation stack, which is only needed once a challenge is created
+    from pages.modules.generate_from_topic import EXPECTED_QUESTIONS
+
+    quiz_data = []
+    preview = st.status(f"Generating MCQs for '{selected_topic}' at '{selected_difficulty}' level. Please wait...", expanded=True)
+    try:
+        with preview:
+            for kind, payload in stream_scenario_set(selected_topic, selected_difficulty):
+                if kind == "scenario":
+                    quiz_data.append({"scenario": payload, "questions": []})
+                    st.write(f"**Scenario {len(quiz_data)}:** {payload}")
+                    continue
+                if not quiz_data:
+                    quiz_data.append({"scenario": "No scenario description", "questions": []})
+                quiz_data[-1]["questions"].append(payload)
+                st.write(f"Q{len(quiz_data[-1]['questions'])}: {payload['question']}")
+    except Exception as e:
+        preview.update(label=f"Failed to generate MCQs: {e}", state="error")
+        return None
+
+    # A partial quiz would make for an unfair challenge, so only a complete one is stored
+    total_questions = sum(len(scenario["questions"]) for scenario in quiz_data)
+    if total_questions < EXPECTED_QUESTIONS:
+        preview.update(label=f"Only {total_questions} of {EXPECTED_QUESTIONS} questions were generated", state="error")
+        return None
+    preview.update(label=f"Generated {total_questions} questions", state="complete", expanded=False)
+    return store_challenge_quiz(selected_topic, selected_difficulty, quiz_data)
+
+def attempt_challenge_tab(pending_challenges):
+    # Pending challenges the user hasn't completed yet, with their quiz details
     if pending_challenges:
         st.subheader("Your Pending Challenges")
         
@@ -97,24 +104,26 @@ def attempt_challenge_tab():
                     challenger = challenge["challenger"]
                     opponent = challenge["opponent"]
                     quiz_id = challenge["quiz_id"]
-                    
-                    # Fetch quiz details based on quiz_id
-                    quiz = quiz_collection.find_one({"_id": quiz_id})
-
-                    if quiz:
-                        with cols[col_idx]:
-                            with st.container(border=True):
-                                st.subheader(f"Challenge: {challenger} vs {opponent}")
-                                st.write(f"**Topic:** {quiz.get('selected_topic', 'N/A')}")
-                                st.write(f"**Difficulty:** {quiz.get('difficulty', 'N/A')}")
-                                st.write(f"**Created At:** {challenge['created_at']}")
-                                
-                                # Button to attempt the challenge
-                                if st.button(f"Attempt Challenge with {opponent}", key=f"attempt_{quiz_id}"):
-                                    st.session_state.selected_quiz = quiz
+                    quiz = challenge["quiz"]
+
+                    with cols[col_idx]:
+                        with st.container(border=True):
+                            st.subheader(f"Challenge: {challenger} vs {opponent}")
+                            st.write(f"**Topic:** {quiz.get('selected_topic', 'N/A')}")
+                            st.write(f"**Difficulty:** {quiz.get('difficulty', 'N/A')}")
+                            st.write(f"**Created At:** {challenge['created_at']}")
+                            
+                            # Button to attempt the challenge
+                            if st.button(f"Attempt Challenge with {opponent}", key=f"attempt_{quiz_id}"):
+                                # The questions are only fetched for the challenge being attempted
+                                full_quiz = load_challenge_quiz(quiz_id)
+                                if full_quiz:
+                                    st.session_state.selected_quiz = full_quiz
                                     st.session_state.quiz_status = "pending"
                                     st.session_state.quiz_id = quiz_id  # Store quiz_id for score calculation
                                     st.rerun()  # Refresh the page to load the quiz attempt
+                                else:
+                                    st.error("This challenge's quiz is no longer available.")
     else:
         st.info("No pending challenges found.")
 
@@ -196,36 +205,14 @@ def attempt_quiz(quiz):
                     "total_questions": total_questions  # Store the total questions count
                 }
 
-                # Insert attempt data into MongoDB
-                result = attempts_collection.insert_one(attempt_data)
+                # Log the attempt durably; it is written to MongoDB in the next batch
+                attempt_id = enqueue(attempts_collection.name, attempt_data)
 
-                if result.inserted_id:
+                if attempt_id:
                     st.success(f"Your answers have been submitted successfully!\nYou got {correct_answers} out of {total_questions} correct!")
                     
-                    # Mark the challenge as completed for the user
-                    challenge = challenges_collection.find_one({"quiz_id": quiz["_id"]})
-                    if challenge:
-                        # Add the current user to the completed_by list
-                        completed_by = challenge.get("completed_by", [])
-                        if st.session_state.username not in completed_by:
-                            completed_by.append(st.session_state.username)
-                        
-                        # Check if both challenger and opponent have completed
-                        challenger = challenge["challenger"]
-                        opponent = challenge["opponent"]
-                        
-                        if challenger in completed_by and opponent in completed_by:
-                            # If both users completed the challenge, set the status to "completed"
-                            challenges_collection.update_one(
-                                {"quiz_id": quiz["_id"]},
-                                {"$set": {"completed_by": completed_by, "status": "completed"}}
-                            )
-                        else:
-                            # If either user hasn't completed, leave it as "pending"
-                            challenges_collection.update_one(
-                                {"quiz_id": quiz["_id"]},
-                                {"$set": {"completed_by": completed_by, "status": "pending"}}
-                            )
+                    # Record the score and, once both players are done, complete the challenge in one atomic update
+                    record_challenge_completion(quiz["_id"], st.session_state.username, correct_answers, total_questions)
 
                     reset_quiz_state()  # Reset quiz state
                 else:
@@ -235,18 +222,8 @@ def attempt_quiz(quiz):
 
 
 
-def results_tab():
-
-    username = st.session_state.username  # Get the current logged-in username
-
-    # Fetch completed challenges where the logged-in user is either the challenger or opponent
-    completed_challenges = list(challenges_collection.find({
-        "status": "completed",
-        "$or": [
-            {"challenger": username},
-            {"opponent": username}
-        ]
-    }))
+def results_tab(completed_challenges):
+    # Completed challenges with their topic, both players' scores and the winner
 
     if completed_challenges:
         st.subheader("Your Completed Challenges and Results")
@@ -264,41 +241,24 @@ def results_tab():
                     challenge = completed_challenges[challenge_idx]
                     challenger = challenge["challenger"]
                     opponent = challenge["opponent"]
-                    quiz_id = challenge["quiz_id"]
-                    
-                    # Fetch the quiz details (optional but to display quiz topic, etc.)
-                    quiz = quiz_collection.find_one({"_id": quiz_id})
-                    quiz_topic = quiz.get("selected_topic", "Unknown Topic") if quiz else "Unknown Topic"
+                    quiz_topic = challenge.get("selected_topic") or "Unknown Topic"
 
                     with cols[col_idx]:
                         with st.container(border=True):
                             st.subheader(f"Quiz: {quiz_topic}")
                             
-                            # Fetch the attempt data for both the challenger and the opponent from attempts_collection
-                            attempts = list(attempts_collection.find({"quiz_id": quiz_id}))
-
-                            # Get the attempt data for the challenger
-                            challenger_attempt = next((attempt for attempt in attempts if attempt["attempted_by"] == challenger), None)
-                            # Get the attempt data for the opponent
-                            opponent_attempt = next((attempt for attempt in attempts if attempt["attempted_by"] == opponent), None)
-
-                            if challenger_attempt and opponent_attempt:
-                                challenger_score = challenger_attempt.get("correct_answers_count", 0)
-                                opponent_score = opponent_attempt.get("correct_answers_count", 0)
-                                challenger_total = challenger_attempt.get("total_questions", 0)
-                                opponent_total = opponent_attempt.get("total_questions", 0)
+                            # Scores and winner were stored on the challenge when it completed
+                            challenger_attempt = challenge.get("challenger_score")
+                            opponent_attempt = challenge.get("opponent_score")
 
+                            if challenger_attempt and opponent_attempt and "winner" in challenge:
                                 # Display scores for both users
-                                st.write(f"**{challenger}**: {challenger_score} / {challenger_total} correct")
-                                st.write(f"**{opponent}**: {opponent_score} / {opponent_total} correct")
-
-                                # Determine and display the winner
-                                if challenger_score > opponent_score:
-                                    winner = challenger
-                                    st.success(f"**Winner**: {winner}")
-                                elif opponent_score > challenger_score:
-                                    winner = opponent
-                                    st.success(f"**Winner**: {winner}")
+                                st.write(f"**{challenger}**: {challenger_attempt['correct_answers_count']} / {challenger_attempt['total_questions']} correct")
+                                st.write(f"**{opponent}**: {opponent_attempt['correct_answers_count']} / {opponent_attempt['total_questions']} correct")
+
+                                # Display the winner
+                                if challenge["winner"]:
+                                    st.success(f"**Winner**: {challenge['winner']}")
                                 else:
                                     st.write("It's a **tie**!")
                             else:
@@ -313,16 +273,14 @@ def results_tab():
 
 
 # Function to create a challenge
-def create_challenge_form():
-    # Get all users except the current user
-    users = list(users_collection.find({"username": {"$ne": st.session_state.username}}))
+def create_challenge_form(opponents):
 
     # Select topic, difficulty level, and opponent
     with st.form("create_challenge_form"):
         st.subheader("Create a Challenge")
         selected_topic = st.selectbox("Select a topic for the quiz:", ["Cybersecurity", "Data Science", "Artificial Intelligence", "Networking", "Python Programming"])
         selected_difficulty = st.selectbox("Select a difficulty level:", ["Easy", "Medium", "Hard"])
-        opponent = st.selectbox("Select opponent:", [user["username"] for user in users])
+        opponent = st.selectbox("Select opponent:", opponents)
 
         # Submit button
         submit_button = st.form_submit_button("Create Challenge")
@@ -336,6 +294,8 @@ def create_challenge_form():
                 "challenger": st.session_state.username,
                 "opponent": opponent,
                 "quiz_id": quiz_id,
+                "selected_topic": selected_topic,  # Stored on the challenge for the results tab
+                "difficulty": selected_difficulty,
                 "status": "pending",  # Initially, the challenge is pending
                 "created_at": datetime.now(),
             }
@@ -352,17 +312,23 @@ def main():
         # Show the quiz attempt form if a quiz is selected
         attempt_quiz(st.session_state.selected_quiz)
     else:
-        # If no quiz is selected, display the normal tabs
+        # If no quiz is selected, display the normal tabs; every tab renders, so load their data at once
+        username = st.session_state.username
+        reads = parallel_reads(
+            opponents=lambda: get_opponent_names(username),
+            pending=lambda: get_pending_challenges(username),
+            completed=lambda: get_completed_challenges(username),
+        )
         tab1, tab2, tab3 = st.tabs(['Create Challenge', 'Attempt Challenge', 'Results'])
 
         with tab1:
-            create_challenge_form()  # Create challenge content
+            create_challenge_form(reads["opponents"])  # Create challenge content
 
         with tab2:
-            attempt_challenge_tab()  # Show pending challenges content
+            attempt_challenge_tab(reads["pending"])  # Show pending challenges content
 
         with tab3:
-            results_tab()  # Show results content
+            results_tab(reads["completed"])  # Show results content
 
 
 # Run the main function
@@ -1,16 +1,85 @@
 import streamlit as st
 from pymongo import MongoClient
-from db import quiz_results_collection
+from db import parallel_reads, quiz_results_collection
 from datetime import datetime
+from pages.modules.feedback_worker import FEEDBACK_PENDING, start_feedback_resume
+from pages.modules.pdf_export import generate_pdf_with_feedback_and_analytics, track_performance_by_difficulty
+from pages.modules.retention import get_monthly_summaries, read_parts
 
-# Fetch all quiz results for a specific user
+# Fetch the quiz results still held in MongoDB for a specific user; older ones are in the monthly archive
 def fetch_user_results(username):
-    return quiz_results_collection.find({"username": username}).sort("quiz_started_at", -1)
+    return list(quiz_results_collection.find({"username": username}).sort("quiz_started_at", -1))
+
+# Archived attempts of one month, read from Parquet only when asked for; parts never change once written
+@st.cache_data(max_entries=32, show_spinner="Loading archived attempts...")
+def load_archived_results(parts):
+    return read_parts(parts)
+
+# Display the feedback for one quiz attempt
+def display_feedback(quiz_result):
+    feedback = quiz_result.get('feedback')
+    status = quiz_result.get('feedback_status')
+
+    # Rule-based feedback is shown straight away while the personalised version is generated
+    if status == FEEDBACK_PENDING:
+        wait_for_feedback(quiz_result['_id'], has_feedback=bool(feedback))
+        if not feedback:
+            return
+    if not feedback:
+        st.warning("Feedback could not be generated for this attempt.")
+        return
+
+    st.write("**Overall Performance:**")
+    st.write(feedback['overall_performance'])
+    
+    st.write("**Correct vs Incorrect:**")
+    st.write(feedback['correct_vs_incorrect']['analysis'])
+    
+    st.write("**Areas of Improvement:**")
+    st.write(feedback['areas_of_improvement'])
+    
+    st.write("**Topic-Specific Feedback:**")
+    st.write(feedback['topic_specific_feedback'])
+    
+    st.write("**Next Steps:**")
+    st.write(feedback['next_steps'])
+
+# Render a downloadable PDF report; bounded so reruns reuse recent reports without growing memory
+@st.cache_data(max_entries=64, show_spinner=False)
+def build_pdf_report(result_id, total_correct, total_questions, feedback, difficulty_scores=None):
+    quiz_results = {"total_correct": total_correct, "total_questions": total_questions, "difficulty_scores": difficulty_scores}
+    return generate_pdf_with_feedback_and_analytics(quiz_results, feedback)
+
+# Offer the PDF report for an attempt whose feedback is final
+def pdf_download_button(quiz_result):
+    feedback = quiz_result.get('feedback')
+    if not feedback or quiz_result.get('feedback_status') == FEEDBACK_PENDING:
+        return
+    results = quiz_result.get('results', [])
+    total_questions = quiz_result.get('total_questions') or len(results)
+    difficulty_scores = track_performance_by_difficulty(results) if results else None
+    st.download_button(
+        "Download PDF report",
+        data=build_pdf_report(str(quiz_result['_id']), quiz_result['total_correct'], total_questions, feedback, difficulty_scores),
+        file_name=f"quiz_report_{quiz_result['quiz_started_at']:%Y%m%d_%H%M%S}.pdf",
+        mime="application/pdf",
+        icon=":material/download:",
+        key=f"pdf_{quiz_result['_id']}",
+    )
+
+# Poll for feedback that is still being generated, rerunning only this placeholder
+@st.fragment(run_every=5)
+def wait_for_feedback(result_id, has_feedback=False):
+    quiz_result = quiz_results_collection.find_one({"_id": result_id}, {"feedback_status": 1})
+    if quiz_result and quiz_result.get('feedback_status') != FEEDBACK_PENDING:
+        st.rerun()
+    if has_feedback:
+        st.caption("⏳ More personalised feedback is being generated and will replace this summary automatically.")
+    else:
+        st.info("Your personalised feedback is being generated. It will appear here automatically.", icon="⏳")
 
 # Display results for the quiz
 def display_quiz_results(user_data):
-    st.title(f"Quiz Results for {user_data[0]['username']}")
-    
     current_time = datetime.now()
 
     # Display results for each quiz attempt
@@ -45,20 +114,8 @@ def display_quiz_results(user_data):
             
             # Display feedback
             st.write("### Feedback")
-            st.write("**Overall Performance:**")
-            st.write(quiz_result['feedback']['overall_performance'])
-            
-            st.write("**Correct vs Incorrect:**")
-            st.write(quiz_result['feedback']['correct_vs_incorrect']['analysis'])
-            
-            st.write("**Areas of Improvement:**")
-            st.write(quiz_result['feedback']['areas_of_improvement'])
-            
-            st.write("**Topic-Specific Feedback:**")
-            st.write(quiz_result['feedback']['topic_specific_feedback'])
-            
-            st.write("**Next Steps:**")
-            st.write(quiz_result['feedback']['next_steps'])
+            display_feedback(quiz_result)
+            pdf_download_button(quiz_result)
             
             # Display quiz results in a table format
             st.write("### Quiz Results")
@@ -70,6 +127,23 @@ def display_quiz_results(user_data):
                 st.write(f"- **Difficulty:** {result['difficulty'].capitalize()}")
                 st.write("---")
 
+# Display the compacted history: one summary per month, with its attempts loaded from the archive on demand
+def display_monthly_history(summaries):
+    st.subheader("Earlier Months")
+    for summary in summaries:
+        month = datetime.strptime(summary['month'], "%Y-%m")
+        score = summary['total_correct'] / summary['total_questions'] if summary['total_questions'] else 0
+        # A bordered container rather than an expander, since the attempts inside are expanders
+        with st.container(border=True):
+            st.write(f"**{month:%B %Y}** - {summary['attempts']} attempt{'s' if summary['attempts'] > 1 else ''}, {score:.0%} correct")
+            st.write(f"**Best score:** {summary['best_correct']}")
+            st.write(f"**Topics:** {', '.join(summary.get('topics', []))}")
+            for difficulty, counts in summary['by_difficulty'].items():
+                if counts['total']:
+                    st.write(f"- **{difficulty.capitalize()}:** {counts['correct']}/{counts['total']} correct")
+            if st.toggle("Show attempts", key=f"archive_{summary['_id']}"):
+                display_quiz_results(load_archived_results(tuple(summary['parts'])))
+
 def main():
     """Main function to display user quiz results."""
     
@@ -77,11 +151,18 @@ def main():
     username = st.session_state.username
     
     if username:
-        user_data_cursor = fetch_user_results(username)
-        user_data = list(user_data_cursor)  # Convert cursor to list
+        # Pick up any feedback jobs lost to a restart, in the background
+        start_feedback_resume()
+
+        # Recent results and the monthly summaries are independent reads
+        reads = parallel_reads(results=lambda: fetch_user_results(username), summaries=lambda: get_monthly_summaries(username))
+        user_data = reads["results"]
         
-        if user_data:
+        if user_data or reads["summaries"]:
+            st.title(f"Quiz Results for {username}")
             display_quiz_results(user_data)
+            if reads["summaries"]:
+                display_monthly_history(reads["summaries"])
         else:
             st.error(f"No quiz results found for user: {username}")
 
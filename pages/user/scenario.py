@@ -1,9 +1,23 @@
 import streamlit as st
-from pages.modules.generate_from_topic import generate_mcqs_from_topic  # Assuming this supports difficulty levels
-from pages.modules.pdf_export import generate_feedback_from_results, generate_pdf_with_feedback_and_analytics
+from pages.modules.question_bank import stream_scenario_set
+from pages.modules.quiz_format import flatten_scenario_set
+from pages.modules.prefetch import start_prefetch, take_prefetched, discard_prefetch
+from pages.modules.feedback_worker import FEEDBACK_READY, pending_result_fields, submit_feedback
+from pages.modules.feedback_cache import feedback_for_quiz
+from pages.modules.write_behind import enqueue
 from db import quiz_results_collection
 from datetime import datetime
-import time
+
+BATCH_SIZE = 5
+RESULT_FIELDS = ("question", "user_answer", "correct_answer", "difficulty")
+
+
+def start_batch_stream(selected_topics, difficulty):
+    """Queue a streamed batch; display_mcq renders the scenario and questions as they arrive."""
+    st.session_state.pop('scenario', None)
+    st.session_state.mcqs = []
+    st.session_state.mcq_stream = stream_scenario_set(selected_topics, difficulty)
+
 
 def get_next_difficulty(correct_count):
     """Determine next difficulty based on correct count."""
@@ -15,26 +29,62 @@ def get_next_difficulty(correct_count):
         return "easy"
 
 
-def display_mcq(mcqs, current_level, question_batch, total_answers):
-    """Display multiple-choice questions (MCQs)."""
-    st.title("Multiple Choice Questions")
+def stream_into_batch(mcqs, stream):
+    """Yield ("scenario", text) and ("question", mcq) items for the batch, pulling new questions from the stream.
 
-    # Display scenario if available
-    if 'scenario' in st.session_state:
-        st.write("### Scenario:")
-        st.info(st.session_state.scenario)
+    Multi-topic batches hold one scenario per topic, so each question carries the scenario it belongs to.
+    """
+    scenario = None
+    for mcq in list(mcqs):
+        if mcq.get("scenario") and mcq["scenario"] != scenario:
+            scenario = mcq["scenario"]
+            yield "scenario", scenario
+        yield "question", mcq
+
+    if stream is None:
+        return
+
+    try:
+        for kind, payload in stream:
+            if kind == "scenario":
+                st.session_state.scenario = payload
+            else:
+                mcqs.append(dict(payload, scenario=st.session_state.get("scenario")))
+            # An interrupted rerun may already have consumed the scenario event, so headers follow the questions
+            current = st.session_state.get("scenario")
+            if current and current != scenario:
+                scenario = current
+                yield "scenario", scenario
+            if kind != "scenario":
+                yield "question", mcqs[-1]
+    except Exception as e:
+        st.error(f"Error while generating questions: {e}")
+
+    # Only clear on completion; an interrupted rerun resumes the same stream next time
+    st.session_state.mcq_stream = None
+
+
+def display_mcq(mcqs, current_level, question_batch, total_answers, stream=None):
+    """Display multiple-choice questions (MCQs), rendering streamed questions as they arrive."""
+    st.title("Multiple Choice Questions")
 
-    # Initialize session state for user answers if not already set
-    if f'user_answers_{question_batch}' not in st.session_state:
-        st.session_state[f'user_answers_{question_batch}'] = [None] * len(mcqs)
-    
     # Initialize session state for submitted flag if not already set
     if f'submitted_{question_batch}' not in st.session_state:
         st.session_state[f'submitted_{question_batch}'] = False
 
     # Display questions in a form
+    user_answers = []
     with st.form(f"mcq_form_{question_batch}"):
-        for idx, mcq in enumerate(mcqs):
+        for kind, item in stream_into_batch(mcqs, stream):
+            # Each scenario is shown above its questions
+            if kind == "scenario":
+                st.write("### Scenario:")
+                st.info(item)
+                continue
+
+            idx = len(user_answers)
+            mcq = item
+            choice = None
             if 'question' in mcq:
                 st.subheader(f"{mcq['question']} (Difficulty: {current_level.capitalize()})")
                 options = mcq.get('choices', [])
@@ -44,7 +94,8 @@ def display_mcq(mcqs, current_level, question_batch, total_answers):
                     key=f"q_{idx}_{question_batch}",
                     index=None  # Ensures no answer is pre-selected
                 )
-                st.session_state[f'user_answers_{question_batch}'][idx] = choice
+            user_answers.append(choice)
+        st.session_state[f'user_answers_{question_batch}'] = user_answers
 
         submitted = st.form_submit_button("Submit Answers")
         
@@ -76,31 +127,35 @@ def display_mcq(mcqs, current_level, question_batch, total_answers):
 
     return correct_count
 
-def store_quiz_results_in_mongo(username, selected_topics, total_correct, total_questions, feedback):
-    """Store the quiz results in MongoDB with a timestamp and user identifier."""
+def store_quiz_results_in_mongo(username, selected_topics, total_correct, total_questions, feedback, feedback_source, upgrade_inputs=None):
+    """Store the quiz results in MongoDB with a timestamp and user identifier.
+
+    When `upgrade_inputs` is given the stored feedback is upgraded with LLM text in the background,
+    once the result has been written.
+    """
     quiz_data = {
         "username": username,  # Store the username for user-specific results
         "selected_topics": selected_topics,
         "total_correct": total_correct,
         "total_questions": total_questions,
         "feedback": feedback,
+        "feedback_status": FEEDBACK_READY,
+        "feedback_source": feedback_source,
         "quiz_started_at": datetime.now(),  # Store the current time as timestamp
-        "results": []  # Store the question-answer results here
+        # Each question's data (question, user_answer, correct_answer, difficulty)
+        "results": [{field: answer[field] for field in RESULT_FIELDS} for answer in st.session_state.total_answers]
     }
+    on_flushed = None
+    if upgrade_inputs:
+        quiz_data.update(pending_result_fields(upgrade_inputs, feedback))
+        # The worker fills in the stored result, so it starts once the result is in MongoDB
+        on_flushed = lambda: submit_feedback(quiz_data["_id"], upgrade_inputs)
 
-    # Add each question's data (question, user_answer, correct_answer) to 'results'
-    for answer in st.session_state.total_answers:
-        quiz_data["results"].append({
-            "question": answer["question"],
-            "user_answer": answer["user_answer"],
-            "correct_answer": answer["correct_answer"],
-            "difficulty": answer["difficulty"]
-        })
+    # Log the result durably; it is written to MongoDB in the next batch
+    result_id = enqueue(quiz_results_collection.name, quiz_data, on_flushed)
+    print(f"Quiz results for {username} logged for MongoDB.")
+    return result_id
 
-    # Insert the result into MongoDB
-    quiz_results_collection.insert_one(quiz_data)
-    print(f"Quiz results for {username} stored in MongoDB.")
-    return True
 
 def simplified_results_and_reset(selected_topics):
     """Display simplified quiz results, save to DB and automatically reset."""
@@ -110,24 +165,18 @@ def simplified_results_and_reset(selected_topics):
     # Only show the grand total
     st.toast(f"Quiz completed! Your score: {total_correct}/{total_questions}", icon='🎉')
     
-    # Generate feedback based on results
-    feedback = generate_feedback_from_results(
-        topic=selected_topics,
-        total_score=total_correct,
-        total_questions=total_questions,
-        correct_count=total_correct,
-        incorrect_count=total_questions - total_correct,
-        difficulty=st.session_state.difficulty,
-        difficulty_performance="Moderate performance on hard questions"
+    # Cached or rule-based feedback is instant; a rule-based one is upgraded by the LLM in the background
+    feedback, feedback_source, upgrade_inputs = feedback_for_quiz(
+        selected_topics, st.session_state.total_answers, st.session_state.difficulty
     )
-    
+
     # Store results in database
-    if store_quiz_results_in_mongo(st.session_state.username, selected_topics, total_correct, total_questions, feedback):
+    result_id = store_quiz_results_in_mongo(
+        st.session_state.username, selected_topics, total_correct, total_questions, feedback, feedback_source, upgrade_inputs
+    )
+    if result_id:
         st.toast("Results have been stored successfully. The quiz will reset automatically...", icon='🎉')
     
-    # Wait briefly to show the message
-    time.sleep(2)
-    
     # Set flag to reset on next rerun
     st.session_state.should_reset = True
     st.rerun()
@@ -143,8 +192,13 @@ def reset_quiz_state():
         'total_answers', 'question_batch', 'difficulty', 
         'correct_count', 'quiz_started', 'mcqs', 
         'scenario', 'selected_topics', 'previous_score',
-        'should_reset'
+        'should_reset', 'prefetch', 'prefetch_batch',
+        'mcq_stream'
     ]
+
+    # Abandon any speculative batches still in flight
+    if st.session_state.get('prefetch'):
+        discard_prefetch(st.session_state.prefetch, st.session_state.selected_topics)
     
     # Delete all keys with prefixes
     keys_to_delete = []
@@ -214,19 +268,9 @@ def main():
                 st.session_state.selected_topics = selected_topics  # Store the selected topics in session state
                 st.session_state.quiz_started = True
 
-                with st.spinner(f"Generating MCQs for the topics: {', '.join(selected_topics)}..."):
-                    mcq_data = generate_mcqs_from_topic(selected_topics, difficulty=st.session_state.difficulty)
-                
-                if mcq_data:
-                    # Get scenario and questions from generated data
-                    scenario = mcq_data[0].get("scenario", "No scenario provided.")
-                    questions = mcq_data[0].get("questions", [])
-                    
-                    # Store the scenario and questions in session state
-                    st.session_state.scenario = scenario
-                    st.session_state.mcqs = questions
-                    st.session_state[f'user_answers_{st.session_state.question_batch}'] = [None] * len(questions)
-                    st.rerun()
+                # Questions are rendered by display_mcq as they stream in
+                start_batch_stream(selected_topics, st.session_state.difficulty)
+                st.rerun()
             else:
                 st.error("Please select at least one topic.")
     else:
@@ -235,13 +279,20 @@ def main():
             reset_quiz_state()
             st.rerun()
 
-        # Only process questions if MCQs exist in the session state
-        if 'mcqs' in st.session_state and st.session_state.mcqs:
+        # Only process questions if MCQs exist in the session state or are still streaming in
+        if st.session_state.get('mcqs') or st.session_state.get('mcq_stream'):
+            # Speculatively start generating the next batch while this one is being answered
+            questions_after_batch = len(st.session_state.total_answers) + max(len(st.session_state.mcqs), BATCH_SIZE)
+            if st.session_state.get('prefetch_batch') != st.session_state.question_batch and questions_after_batch < 20:
+                st.session_state.prefetch = start_prefetch(st.session_state.selected_topics, st.session_state.total_answers)
+                st.session_state.prefetch_batch = st.session_state.question_batch
+
             correct_count = display_mcq(
                 st.session_state.mcqs,
                 current_level=st.session_state.difficulty,
                 question_batch=st.session_state.question_batch,
                 total_answers=st.session_state.total_answers,
+                stream=st.session_state.get('mcq_stream'),
             )
             
             # Only update difficulty and generate new questions if this batch was submitted
@@ -261,19 +312,18 @@ def main():
                 if len(st.session_state.total_answers) < 20:
                     next_difficulty = st.session_state.difficulty
                     with st.spinner(f"Fetching next batch of questions for difficulty: {next_difficulty}..."):
-                        mcq_data = generate_mcqs_from_topic(st.session_state.selected_topics, difficulty=next_difficulty)
+                        # Use the speculative batch if we guessed right, otherwise stream a fresh one
+                        mcq_data = take_prefetched(st.session_state.get('prefetch', {}), st.session_state.selected_topics, next_difficulty)
                     if mcq_data:
-                        scenario = mcq_data[0].get("scenario", "No scenario provided.")
-                        questions = mcq_data[0].get("questions", [])
-                        st.session_state.scenario = scenario
-                        st.session_state.mcqs = questions
-                        st.session_state[f'user_answers_{st.session_state.question_batch}'] = [None] * len(questions)
+                        st.session_state.mcqs = flatten_scenario_set(mcq_data)
+                        st.session_state.mcq_stream = None
+                    else:
+                        start_batch_stream(st.session_state.selected_topics, next_difficulty)
                     st.rerun()
                 else:
                     # Clear the submitted flag to avoid auto-advancing
                     st.session_state[f'submitted_{submitted_batch}'] = False
                     st.toast("Quiz completed! Processing your results...",icon='🎉')
-                    time.sleep(2)
                     st.rerun()  # This will trigger simplified_results_and_reset on the next run
 
 
@@ -1,16 +1,23 @@
 import streamlit as st
-from db import db
 from datetime import datetime
-
-# MongoDB collections
-quiz_collection = db["quizzes"]  # Quiz collection
-attempts_collection = db["quiz_attempts"]  # Quiz attempts collection
+from pages.modules.quiz_catalog import (
+    attempts_collection,
+    get_attempted_quiz_ids,
+    get_catalog_options,
+    get_quiz_page,
+    load_quiz,
+)
+from pages.modules.write_behind import enqueue
 
 # Initialize session state
 if "selected_quiz" not in st.session_state:
     st.session_state.selected_quiz = None
 if "submitted" not in st.session_state:
     st.session_state.submitted = False
+if "submitted_quiz_ids" not in st.session_state:
+    st.session_state.submitted_quiz_ids = set()  # Attempts that may not have reached MongoDB yet
+if "catalog_pages" not in st.session_state:
+    st.session_state.catalog_pages = {"filters": None, "cursors": [None]}
 
 # Function to reset the quiz attempt state
 def reset_quiz_state():
@@ -18,21 +25,43 @@ def reset_quiz_state():
     st.session_state.submitted = False
     st.rerun()
 
-# Function to check if the quiz has been attempted
-def is_quiz_attempted(quiz_id):
-    # Check if there is a record in the attempts collection for the current user and quiz_id
-    result = attempts_collection.find_one({
-        "quiz_id": quiz_id,
-        "attempted_by": st.session_state.username
-    })
-    return result is not None
+# Cursors of the catalog pages visited so far; reset whenever the filters change
+def catalog_cursors(filters):
+    pages = st.session_state.catalog_pages
+    if pages["filters"] != filters:
+        pages["filters"] = filters
+        pages["cursors"] = [None]
+    return pages["cursors"]
+
+# Function to page through the catalog
+def catalog_pager(cursors, next_before):
+    col1, col2, col3 = st.columns([0.15, 0.15, 1])
+    with col1:
+        if st.button("Previous", key="catalog_previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if st.button("Next", key="catalog_next", disabled=next_before is None):
+            cursors.append(next_before)
+            st.rerun()
+    with col3:
+        st.caption(f"Page {len(cursors)}")
 
 # Function to display available quizzes
 def display_quizzes():
     st.title("Available Quizzes")
-    
-    # Fetch quizzes from the database
-    quizzes = list(quiz_collection.find({}))
+
+    topics, difficulties = get_catalog_options()
+    filter1, filter2 = st.columns(2)
+    topic = filter1.selectbox("Topic", ["All"] + topics)
+    difficulty = filter2.selectbox("Difficulty", ["All"] + difficulties)
+    filters = (None if topic == "All" else topic, None if difficulty == "All" else difficulty)
+
+    # One page of quiz cards, and which of them the user has attempted, in two queries
+    cursors = catalog_cursors(filters)
+    quizzes, next_before = get_quiz_page(*filters, before=cursors[-1])
+    attempted_ids = get_attempted_quiz_ids(st.session_state.username, [quiz["_id"] for quiz in quizzes])
+    attempted_ids |= st.session_state.submitted_quiz_ids
 
     if quizzes:
         columns_per_row = 4
@@ -55,7 +84,7 @@ def display_quizzes():
                             st.write("**Total Questions:**", total_questions)
 
                             # Check if the quiz has been attempted by the current user
-                            attempted = is_quiz_attempted(quiz["_id"])
+                            attempted = quiz["_id"] in attempted_ids
 
                             # Generate a unique key for the button based on the quiz_id
                             button_key = f"attempt_{quiz['_id']}"
@@ -66,12 +95,16 @@ def display_quizzes():
                             else:
                                 # Otherwise, show the "Attempt Quiz" button
                                 if st.button("Attempt Quiz", key=button_key):
-                                    # Store the entire quiz object in session state
-                                    st.session_state.selected_quiz = quiz
-                                    st.session_state.quiz_status = "pending"
-                                    st.rerun()
-                                    return  # Exit to show the quiz once it's selected
-
+                                    # Load the questions only for the quiz being opened
+                                    full_quiz = load_quiz(quiz["_id"])
+                                    if full_quiz:
+                                        st.session_state.selected_quiz = full_quiz
+                                        st.session_state.quiz_status = "pending"
+                                        st.rerun()
+                                        return  # Exit to show the quiz once it's selected
+                                    st.error("This quiz is no longer available.")
+
+        catalog_pager(cursors, next_before)
     else:
         st.warning("No quizzes available.")
 
@@ -144,8 +177,10 @@ def attempt_quiz(quiz):
                     "correct_answers_count": correct_answers,
                     "total_questions": total_answers  # Use total_answers here
                 }
-                result = attempts_collection.insert_one(attempt_data)  # Insert into MongoDB
-                if result.inserted_id:
+                # Logged durably here and written to MongoDB in the next batch
+                attempt_id = enqueue(attempts_collection.name, attempt_data)
+                if attempt_id:
+                    st.session_state.submitted_quiz_ids.add(quiz["_id"])
                     st.toast("Your answers have been submitted successfully!", icon='🎉')
                     reset_quiz_state() 
                 else:
@@ -1,5 +1,7 @@
 import streamlit as st
+from pymongo.errors import DuplicateKeyError
 from db import users_collection
+from pages.modules.photo_store import PHOTO_MAX_BYTES, get_thumbnail, save_photo
 
 st.header("Settings")
 st.write(f"You are logged in as {st.session_state.role}.")
@@ -10,9 +12,6 @@ if "username" not in st.session_state:
     st.warning("You must be logged in to update your profile photo.")
     st.stop()
 
-# Fetch user data
-user = users_collection.find_one({"username": st.session_state["username"]})
-
 # Display user information in disabled text inputs
 st.text_input("Username", value=st.session_state["username"], disabled=True)
 st.text_input("Email", value=st.session_state["email"], disabled=True)
@@ -20,10 +19,12 @@ st.text_input("Role", value=st.session_state["role"], disabled=True)
 st.text_input("Gender", value=st.session_state["gender"], disabled=True)
 
 # Display current profile photo
-st.image(user["profile_photo"], caption="Current Profile Photo", width=200)
+thumbnail = get_thumbnail(st.session_state.get("photo_id"))
+if thumbnail:
+    st.image(thumbnail, caption="Current Profile Photo", width=200)
 
 # File uploader for new profile photo
-profile_photo = st.file_uploader("Upload a new profile photo", type=["jpg", "png", "jpeg"])
+profile_photo = st.file_uploader("Upload a new profile photo", type=["jpg", "png", "jpeg"], help=f"Up to {PHOTO_MAX_BYTES // (1024 * 1024)} MB")
 
 # Toggle button for editing profile details
 edit_toggle = st.toggle("Edit Profile")
@@ -37,27 +38,40 @@ if edit_toggle:
         new_gender = st.selectbox("Gender", ["Male", "Female", "Other"], index=["Male", "Female", "Other"].index(st.session_state["gender"]), key="new_gender")
 
         if st.button("Save Changes", key="save_changes"):
-            # Update the user data in the database
-            users_collection.update_one(
-                {"username": st.session_state["username"]},
-                {"$set": {"username": new_username, "email": new_email, "gender": new_gender}}
-            )
-            # Update session state
-            st.session_state["username"] = new_username
-            st.session_state["email"] = new_email
-            st.session_state["gender"] = new_gender
-            st.success("Profile updated successfully!")
+            try:
+                # Update the user data in the database
+                users_collection.update_one(
+                    {"username": st.session_state["username"]},
+                    {"$set": {"username": new_username, "email": new_email, "gender": new_gender}}
+                )
+            except DuplicateKeyError:
+                # The unique indexes reject a username or email that another account already uses
+                st.error("Username or Email already exists!")
+            else:
+                # Update session state
+                st.session_state["username"] = new_username
+                st.session_state["email"] = new_email
+                st.session_state["gender"] = new_gender
+                st.success("Profile updated successfully!")
 
-            # Refresh the page to reflect changes
-            st.rerun()
+                # Refresh the page to reflect changes
+                st.rerun()
 
 # Button to update the profile photo
 if st.button("Update Photo"):
     if profile_photo:
-        photo_bytes = profile_photo.read()
-        users_collection.update_one({"username": st.session_state["username"]}, {"$set": {"profile_photo": photo_bytes}})
-        st.session_state["profile_photo"] = photo_bytes
-        st.success("Profile photo updated successfully!")
-        st.rerun()
+        try:
+            # The photo and its thumbnail are stored once per distinct image; the user only keeps the id
+            photo_id = save_photo(profile_photo.read())
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            users_collection.update_one(
+                {"username": st.session_state["username"]},
+                {"$set": {"photo_id": photo_id}, "$unset": {"profile_photo": ""}}
+            )
+            st.session_state["photo_id"] = photo_id
+            st.success("Profile photo updated successfully!")
+            st.rerun()
     else:
         st.error("Please select an image to upload.")